@@ -1,18 +1,123 @@
-from flask import Flask, render_template, request, jsonify, session, send_file
+from flask import Flask, render_template, request, jsonify, session, send_file, make_response, redirect
+from markupsafe import Markup, escape
+import click
+import hashlib
 import pandas as pd
 import json
 from modules.financial_agent import FinancialManagementAgent
 from modules.data_processor import DataProcessor
 from modules.visualization import ChartGenerator
-from modules.storage import DataStorage
+from modules.storage import DataStorage, migrate_transactions, is_valid_user_id
+from modules.sqlite_storage import SQLiteStorage, migrate_to_sqlite
+from modules.sample_data import generate_transactions
+from modules.ingest import TransactionImporter
+from modules.aggregates import MonthlyAggregates
+from modules.query import TransactionQuery, DateWindow
+from modules.agent_cache import AgentCache
+from modules.model_registry import ModelRegistry, ModelNotReady
+from modules.jobs import JobRunner, JobLimitExceeded
+from modules.forecasting import ExponentialSmoothingForecaster
+from modules.snapshots import SnapshotStore, SnapshotScheduler
+from modules.reports import ReportGenerator
+from modules.batch_analytics import SummaryStore, run_batch_analytics
+from modules.alerts import AlertFeed, BudgetAlertMonitor
+from modules.instrumentation import RequestInstrumentation
+from modules import lazy
 import io
 import os
+import time
 
 app = Flask(__name__)
 app.secret_key = 'financial_management_secret_key_2025'
 
-# Initialize data storage
-storage = DataStorage()
+# scikit-learn, joblib and Plotly load on the first request that needs them.
+# Pre-fork servers (gunicorn --preload) set PRELOAD_MODULES=1 to import them
+# once in the master so workers share the loaded code copy-on-write.
+if os.environ.get('PRELOAD_MODULES', '0') == '1':
+    lazy.preload()
+
+# Request timing, Server-Timing headers, /metrics and the opt-in slow-request
+# profiler (PROFILE_MODE=sampling|cprofile, PROFILE_SLOW_MS, PROFILE_SAMPLE_RATE)
+instrumentation = RequestInstrumentation(app)
+
+# Initialize data storage: files per user ('csv' or the typed, memory-mapped
+# 'feather' backend) or one indexed SQLite database ('sqlite')
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'csv')
+if STORAGE_BACKEND == 'sqlite':
+    storage = SQLiteStorage()
+else:
+    storage = DataStorage(backend=STORAGE_BACKEND)
+
+# Loaded agents are kept in-process so warm requests skip reloading from disk
+agent_cache = AgentCache(storage)
+
+# Slow work runs in the background: model fits in a process pool, reports on
+# threads, at most JOB_USER_LIMIT unfinished jobs per user
+job_runner = JobRunner()
+
+# Trained expense models are persisted per user and retrained only on data drift
+model_registry = ModelRegistry(os.path.join(storage.data_dir, 'models'), runner=job_runner)
+
+# Forecast, insights, model score and report are precomputed per data version
+# once writes settle (see build_snapshot); routes fall back to computing them
+snapshot_store = SnapshotStore(os.path.join(storage.data_dir, 'snapshots'))
+
+# Budget threshold alerts raised by new expenses, streamed from /alerts/stream;
+# idle streams send a comment every ALERT_KEEPALIVE_SECONDS. A stream holds a
+# worker thread, so it ends after ALERT_STREAM_SECONDS and the browser
+# reconnects (resuming from Last-Event-ID) ALERT_RETRY_SECONDS later.
+alert_feed = AlertFeed()
+budget_alerts = BudgetAlertMonitor(alert_feed)
+ALERT_KEEPALIVE_SECONDS = float(os.environ.get('ALERT_KEEPALIVE_SECONDS', 15))
+ALERT_STREAM_SECONDS = float(os.environ.get('ALERT_STREAM_SECONDS', 300))
+ALERT_RETRY_SECONDS = float(os.environ.get('ALERT_RETRY_SECONDS', 5))
+
+# Charts are sent as compact figure JSON and drawn with Plotly.react ('json'),
+# or as server-rendered HTML fragments ('html')
+CHART_OUTPUT = os.environ.get('CHART_OUTPUT', 'json')
+
+# Part of every ETag so a deploy with changed templates never serves a stale 304
+ETAG_SALT = str(max(os.path.getmtime(os.path.join(app.root_path, 'templates', name))
+                    for name in os.listdir(os.path.join(app.root_path, 'templates'))))
+
+@app.template_global()
+def render_chart(chart):
+    """Embed a chart produced by ChartGenerator in the configured output mode"""
+    if CHART_OUTPUT == 'json':
+        return Markup(f'<div class="plotly-chart" data-figure="{escape(chart)}"></div>')
+    return Markup(chart)
+
+def data_etag(user_id, *parts):
+    """ETag for a response derived only from a user's data version and parts"""
+    version = agent_cache.version(user_id)
+    if version is None:
+        return None
+    return hashlib.sha1(repr((ETAG_SALT, user_id, version, parts)).encode('utf-8')).hexdigest()
+
+def not_modified(etag):
+    """A 304 response when the client already holds this ETag, else None"""
+    if etag is not None and etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+def with_etag(body, etag):
+    response = make_response(body)
+    if etag is not None:
+        response.set_etag(etag)
+        # Clients must revalidate, which costs a cheap ETag comparison
+        response.cache_control.no_cache = True
+        response.cache_control.private = True
+    return response
+
+# The /budget page compares this period's spending with the monthly budgets
+BUDGET_PERIODS = [('1m', 'This month'), ('3m', 'Last 3 months'), ('12m', 'Last 12 months'), ('all', 'All time')]
+
+def request_window(default=None):
+    """DateWindow from the request's period or date_from/date_to arguments;
+    raises ValueError for invalid ones"""
+    return DateWindow.from_args(request.args, default)
 
 # Add custom Jinja2 filters
 @app.template_filter('min')
@@ -24,214 +129,702 @@ def max_filter(a, b):
     return max(a, b)
 
 def get_agent(user_id='default'):
-    """Get or create financial agent with persistent storage"""
+    """Get or create financial agent, served from the in-process cache when warm"""
+    return agent_cache.get(user_id, load_agent)
+
+def load_agent(user_id='default'):
+    """Load financial agent from persistent storage"""
     agent = FinancialManagementAgent()
     
     # Load data from storage
-    agent.transactions = storage.load_transactions(user_id)
+    if hasattr(storage, 'monthly_aggregates'):
+        # The store answers aggregate and page queries; rows load on demand
+        agent.use_store(storage, user_id)
+    else:
+        agent.transactions = storage.load_transactions(user_id)
     agent.budget_categories = storage.load_budgets(user_id)
     agent.income_sources = storage.load_income_sources(user_id)
+    agent.alert_thresholds = storage.load_alert_thresholds(user_id)
     
     # If no transactions exist, generate sample data
-    if agent.transactions.empty:
+    if not agent.has_transactions():
         agent.generate_sample_data()
         save_agent(agent, user_id)
     
     return agent
 
 def save_agent(agent, user_id='default'):
-    """Save agent data to persistent storage"""
-    storage.save_transactions(agent.transactions, user_id)
-    storage.save_budgets(agent.budget_categories, user_id)
-    storage.save_income_sources(agent.income_sources, user_id)
+    """Save agent data to persistent storage and write it through to the cache"""
+    # One write section, so no reader sees transactions and budgets out of step
+    with storage.lock(user_id).write():
+        storage.save_transactions(agent.transactions, user_id)
+        storage.save_budgets(agent.budget_categories, user_id)
+        storage.save_income_sources(agent.income_sources, user_id)
+        agent_cache.put(user_id, agent)
+
+def current_user_id():
+    """User the current session works on, chosen with /switch_user"""
+    user_id = session.get('user_id', 'default')
+    return user_id if is_valid_user_id(user_id) else 'default'
+
+def reading_agent(user_id):
+    """Context manager yielding the user's agent under a shared read lock"""
+    return agent_cache.read(user_id, load_agent)
+
+def writing_agent(user_id):
+    """Context manager yielding the user's agent under an exclusive write lock;
+    changes made inside must also be written to storage"""
+    return agent_cache.write(user_id, load_agent)
+
+@app.context_processor
+def inject_user():
+    return {'current_user': current_user_id()}
+
+def build_snapshot(user_id, agent):
+    """Everything the forecast, insights and report views compute from the
+    agent's data, tagged with the data version it was computed from"""
+    return {
+        'version': agent_cache.version(user_id),
+        'computed_at': time.time(),
+        'forecast': agent.forecast_budget(),
+        'insights': agent.analyze_savings(),
+        # Does not wait for a fit; a due retrain runs in the background
+        'model_score': model_registry.ensure_model(agent, user_id),
+        'report': agent.generate_report()
+    }
+
+def compute_snapshot(user_id):
+    with reading_agent(user_id) as agent:
+        return build_snapshot(user_id, agent)
+
+def data_version(user_id):
+    """Version of the user's stored data, read from the store without loading
+    the agent; None when nothing is stored for the user"""
+    signature = storage.signature(user_id)
+    if not any(signature):
+        return None
+    return AgentCache.version_token(signature)
+
+snapshots = SnapshotScheduler(snapshot_store, compute_snapshot, data_version, job_runner)
+
+def user_snapshot(user_id, agent):
+    """The user's precomputed snapshot. An outdated one is served while a
+    refresh is queued; one is only computed on the request (and stored)
+    when none exists or no refresh could be queued.
+    Call with the agent's read lock held."""
+    # The periodic sweep runs from the first request on
+    snapshots.start()
+    version = agent_cache.version(user_id)
+    snapshot = snapshots.fresh(user_id, version)
+    if snapshot is None:
+        snapshot = snapshot_store.get(user_id)
+        if snapshot is not None and snapshots.refresh(user_id, version) is not None:
+            return snapshot
+        snapshot = build_snapshot(user_id, agent)
+        snapshot_store.put(user_id, snapshot)
+    return snapshot
 
 @app.route('/')
 def dashboard():
     try:
-        agent = get_agent()
-        summary = agent.get_summary_stats()
-        
-        # Generate charts
-        expense_summary = agent.categorize_expenses()
-        expense_data = DataProcessor.expense_summary_to_json(expense_summary)
-        pie_chart = ChartGenerator.create_expense_pie_chart(expense_data)
-        trends_chart = ChartGenerator.create_monthly_trends_chart(agent.transactions)
-        
-        return render_template('dashboard.html', 
-                             summary=summary,
-                             pie_chart=pie_chart,
-                             trends_chart=trends_chart)
+        user_id = current_user_id()
+        window = request_window()
+        with reading_agent(user_id) as agent:
+            etag = data_etag(user_id, 'dashboard', CHART_OUTPUT, window.key())
+            cached = not_modified(etag)
+            if cached is not None:
+                return cached
+            
+            # Totals and chart data come from one shared analytics result
+            analytics = agent.analytics(*window.bounds)
+            summary = analytics.summary()
+            
+            # Generate charts, reusing renders of the same data version and window
+            chart_key = (user_id, agent_cache.version(user_id), window.key())
+            expense_data = DataProcessor.expense_summary_to_json(analytics.category_matrix)
+            pie_chart = ChartGenerator.create_expense_pie_chart(expense_data, CHART_OUTPUT, chart_key)
+            trends_chart = ChartGenerator.create_monthly_trends_chart(analytics, CHART_OUTPUT, chart_key)
+            
+            return with_etag(render_template('dashboard.html', 
+                                             summary=summary,
+                                             pie_chart=pie_chart,
+                                             trends_chart=trends_chart,
+                                             window=window), etag)
+    except ValueError as e:
+        return f"Invalid date window: {str(e)}", 400
     except Exception as e:
         return f"Error in dashboard: {str(e)}", 500
 
 @app.route('/transactions')
 def transactions():
     try:
-        agent = get_agent()
-        transactions_data = DataProcessor.transactions_to_json(agent.transactions)
-        categories = list(agent.budget_categories.keys()) + list(agent.income_sources.keys())
-        return render_template('transactions.html', 
-                             transactions=transactions_data,
-                             categories=categories)
+        user_id = current_user_id()
+        with reading_agent(user_id) as agent:
+            # Rows are fetched page by page from /api/transactions
+            categories = list(agent.budget_categories.keys()) + list(agent.income_sources.keys())
+            return render_template('transactions.html', 
+                                 categories=categories)
     except Exception as e:
         return f"Error in transactions: {str(e)}", 500
 
+@app.route('/api/transactions')
+def api_transactions():
+    try:
+        user_id = current_user_id()
+        with reading_agent(user_id) as agent:
+            query = TransactionQuery.from_args(request.args)
+            page, next_cursor = agent.query_transactions(query)
+            
+            return jsonify({
+                'success': True,
+                'transactions': DataProcessor.transactions_to_json(page),
+                'next_cursor': next_cursor
+            })
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/add_transaction', methods=['POST'])
 def add_transaction():
     try:
-        agent = get_agent()
+        user_id = current_user_id()
         data = request.json
         
-        agent.add_transaction(
-            data['date'],
-            data['description'],
-            float(data['amount']),
-            data['category'],
-            data['type']
-        )
-        
-        # Save updated data
-        save_agent(agent)
+        transaction = {
+            'Date': data['date'],
+            'Description': data['description'],
+            'Amount': float(data['amount']),
+            'Category': data['category'],
+            'Type': data['type']
+        }
+        # A failed write drops the cached agent (see AgentCache.write)
+        with writing_agent(user_id) as agent:
+            agent.add_transaction(
+                transaction['Date'],
+                transaction['Description'],
+                transaction['Amount'],
+                transaction['Category'],
+                transaction['Type']
+            )
+            
+            # Append only the new row; budgets and income sources are unchanged
+            storage.append_transaction(transaction, user_id)
+            
+            # O(1): reads the month's running total for the category
+            alerts = budget_alerts.check(user_id, agent, transaction['Date'], transaction['Amount'],
+                                         transaction['Category'], transaction['Type'])
+        snapshots.notify(user_id)
         
-        return jsonify({'success': True, 'message': 'Transaction added successfully'})
+        return jsonify({'success': True, 'message': 'Transaction added successfully', 'alerts': alerts})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
-@app.route('/forecast')
-def forecast():
+@app.route('/import_transactions', methods=['POST'])
+def import_transactions():
+    """Bulk import from a multipart CSV upload ('file') or a JSON-lines body"""
+    user_id = current_user_id()
     try:
-        agent = get_agent()
-        forecast_data = agent.forecast_budget()
-        forecast_json = DataProcessor.forecast_to_json(forecast_data)
+        with reading_agent(user_id) as agent:
+            importer = TransactionImporter(storage, dict(agent.budget_categories), dict(agent.income_sources))
+            # Agents with rows in memory take the imported rows; store-backed
+            # agents only need them folded into their aggregate cube
+            keep_rows = agent.loaded_transactions is not None
+        imported = MonthlyAggregates()
+        
+        def collect(batch):
+            if not keep_rows:
+                imported.merge(MonthlyAggregates.from_transactions(batch))
+        
+        def commit(staging_path):
+            # Rows are read back once from staging, outside the lock, rather
+            # than held batch by batch while the upload streams in
+            rows = storage.read_staged(staging_path) if keep_rows else None
+            # Published and folded into the cached agent under its write lock,
+            # so the next request neither reloads nor re-aggregates the history
+            with writing_agent(user_id) as agent:
+                segment = storage.commit_import(staging_path, user_id)
+                if keep_rows and agent.loaded_transactions is not None:
+                    agent.add_transactions(rows)
+                elif keep_rows or not agent.merge_aggregates(imported):
+                    # The agent was reloaded in the other form meanwhile
+                    agent_cache.invalidate(user_id)
+            return segment
         
-        # Build ML model score
-        model_score = agent.build_ml_model()
+        # The import is staged without holding any lock and committed atomically
+        upload = request.files.get('file')
+        if upload is not None:
+            if upload.filename.lower().endswith(('.jsonl', '.ndjson')):
+                result = importer.import_jsonl(upload.stream, user_id, collect, commit)
+            else:
+                result = importer.import_csv(upload.stream, user_id, collect, commit)
+        elif request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines'):
+            result = importer.import_jsonl(request.stream, user_id, collect, commit)
+        else:
+            return jsonify({'success': False, 'message': 'Upload a CSV file or send a JSON-lines body'}), 400
         
-        # Create forecast chart
-        forecast_chart = ChartGenerator.create_forecast_chart(forecast_json)
+        if result['imported']:
+            snapshots.notify(user_id)
         
-        return render_template('forecast.html', 
-                             forecast=forecast_json,
-                             model_score=model_score,
-                             forecast_chart=forecast_chart,
-                             categories=list(agent.budget_categories.keys()))
+        return jsonify({'success': True,
+                        'message': f"Imported {result['imported']} transaction(s), rejected {result['rejected']}",
+                        **result})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/forecast')
+def forecast():
+    try:
+        user_id = current_user_id()
+        window = request_window()
+        with reading_agent(user_id) as agent:
+            
+            # Use the persisted model; retraining, if due, runs in the background
+            model_score = model_registry.ensure_model(agent, user_id)
+            if window.is_open:
+                snapshot = user_snapshot(user_id, agent)
+                version, forecast_data = snapshot['version'], snapshot['forecast']
+            else:
+                # Snapshots hold the all-history forecast only
+                version, forecast_data = agent_cache.version(user_id), None
+            etag = data_etag(user_id, 'forecast', CHART_OUTPUT, agent.model_version, version, window.key())
+            cached = not_modified(etag)
+            if cached is not None:
+                return cached
+            
+            if forecast_data is None:
+                forecast_data = agent.forecast_budget(3, *window.bounds)
+            forecast_json = DataProcessor.forecast_to_json(forecast_data)
+            
+            # Create forecast chart
+            chart_key = (user_id, version, window.key())
+            forecast_chart = ChartGenerator.create_forecast_chart(forecast_json, CHART_OUTPUT, chart_key)
+            
+            # The page shows the last-known model and reloads when a running fit lands
+            training_job = job_runner.active(user_id, 'train_model')
+            response = with_etag(render_template('forecast.html', 
+                                                 forecast=forecast_json,
+                                                 model_score=model_score,
+                                                 training_job=training_job,
+                                                 forecast_chart=forecast_chart,
+                                                 categories=list(agent.budget_categories.keys()),
+                                                 window=window), etag)
+            if training_job is not None:
+                # Not reusable: the model version in the ETag is about to change
+                response.cache_control.no_store = True
+            return response
+    except ValueError as e:
+        return f"Invalid date window: {str(e)}", 400
     except Exception as e:
         return f"Error in forecast: {str(e)}", 500
 
+@app.route('/api/forecast')
+def api_forecast():
+    """Monthly expense forecast with prediction intervals.
+
+    Query parameters: months (1-24, default 3), method ('weighted',
+    'holt' or 'holt_winters'; default FORECAST_METHOD) and the history to
+    fit, as period or date_from/date_to (default all).
+    """
+    try:
+        user_id = current_user_id()
+        months = request.args.get('months', 3, type=int)
+        if not 1 <= months <= 24:
+            raise ValueError('months must be between 1 and 24')
+        method = request.args.get('method')
+        window = request_window()
+        with reading_agent(user_id) as agent:
+            forecaster = ExponentialSmoothingForecaster(method) if method else None
+            forecast = agent.forecast(months, forecaster, *window.bounds)
+            if forecast is None:
+                return jsonify({'success': True, 'forecast': {}, 'lower': {}, 'upper': {}})
+            return jsonify({
+                'success': True,
+                'confidence': forecast.confidence,
+                'forecast': DataProcessor.forecast_to_json(forecast.mean),
+                'lower': DataProcessor.forecast_to_json(forecast.lower),
+                'upper': DataProcessor.forecast_to_json(forecast.upper)
+            })
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/charts/<name>')
+def api_chart(name):
+    """Compact figure JSON for client-side Plotly.react, with ETag revalidation"""
+    try:
+        user_id = current_user_id()
+        window = request_window()
+        with reading_agent(user_id) as agent:
+            etag = data_etag(user_id, 'chart', name, window.key())
+            cached = not_modified(etag)
+            if cached is not None:
+                return cached
+            
+            chart_key = (user_id, agent_cache.version(user_id), window.key())
+            if name == 'expense_pie':
+                expense_data = DataProcessor.expense_summary_to_json(agent.categorize_expenses(*window.bounds))
+                figure = ChartGenerator.create_expense_pie_chart(expense_data, 'json', chart_key)
+            elif name == 'monthly_trends':
+                figure = ChartGenerator.create_monthly_trends_chart(agent.analytics(*window.bounds), 'json', chart_key)
+            elif name == 'forecast':
+                forecast_json = DataProcessor.forecast_to_json(agent.forecast_budget(3, *window.bounds))
+                figure = ChartGenerator.create_forecast_chart(forecast_json, 'json', chart_key)
+            else:
+                return jsonify({'success': False, 'message': f"Unknown chart '{name}'"}), 404
+            
+            response = with_etag(figure or 'null', etag)
+            response.mimetype = 'application/json'
+            return response
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/predict_expense', methods=['POST'])
 def predict_expense():
     try:
-        agent = get_agent()
+        user_id = current_user_id()
         data = request.json
-        
-        prediction = agent.predict_expense(
-            int(data['day_of_week']),
-            int(data['day_of_month']),
-            int(data['month']),
-            int(data['is_weekend']),
-            data['category']
-        )
+        with reading_agent(user_id) as agent:
+            model_registry.ensure_model(agent, user_id, wait=True)
+            
+            prediction = agent.predict_expense(
+                int(data['day_of_week']),
+                int(data['day_of_month']),
+                int(data['month']),
+                int(data['is_weekend']),
+                data['category']
+            )
         
         return jsonify({'success': True, 'prediction': prediction})
+    except ModelNotReady as e:
+        return job_accepted(e.job, success=False, message=str(e))
+    except JobLimitExceeded as e:
+        return jsonify({'success': False, 'message': str(e)}), 429
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+# Bounds the size of one batch prediction request
+MAX_PREDICTION_DAYS = 366
+
+@app.route('/predict_expenses', methods=['POST'])
+def predict_expenses():
+    """Day-by-day expense predictions for a date range and a set of categories.
+
+    JSON body: {"date_from": "YYYY-MM-DD", "date_to": "YYYY-MM-DD",
+    "categories": [...]} (categories default to all the model knows).
+    """
+    try:
+        user_id = current_user_id()
+        data = request.json
+        date_from, date_to = pd.Timestamp(data['date_from']), pd.Timestamp(data['date_to'])
+        if (date_to - date_from).days >= MAX_PREDICTION_DAYS:
+            raise ValueError(f'Predict at most {MAX_PREDICTION_DAYS} days at a time')
+        with reading_agent(user_id) as agent:
+            model_registry.ensure_model(agent, user_id, wait=True)
+            
+            predictions = agent.predict_expenses(date_from, date_to, data.get('categories'))
+        
+        return jsonify({'success': True, **DataProcessor.predictions_to_json(predictions)})
+    except ModelNotReady as e:
+        return job_accepted(e.job, success=False, message=str(e))
+    except JobLimitExceeded as e:
+        return jsonify({'success': False, 'message': str(e)}), 429
+    except KeyError as e:
+        return jsonify({'success': False, 'message': f'Missing field {e}'}), 400
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/build_model', methods=['POST'])
+def build_model():
+    """Start a model fit in the background; poll /jobs/<id> for the outcome"""
+    try:
+        user_id = current_user_id()
+        return submit_job(user_id, 'train_model')
+    except JobLimitExceeded as e:
+        return jsonify({'success': False, 'message': str(e)}), 429
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/insights')
 def insights():
     try:
-        agent = get_agent()
-        savings_insights = agent.analyze_savings()
-        
-        # Generate trends chart
-        trends_chart = ChartGenerator.create_monthly_trends_chart(agent.transactions)
-        
-        return render_template('insights.html', 
-                             insights=savings_insights,
-                             trends_chart=trends_chart)
+        user_id = current_user_id()
+        window = request_window()
+        with reading_agent(user_id) as agent:
+            if window.is_open:
+                snapshot = user_snapshot(user_id, agent)
+                version, savings_insights = snapshot['version'], snapshot['insights']
+            else:
+                # Snapshots hold the all-history insights only
+                version, savings_insights = agent_cache.version(user_id), None
+            etag = data_etag(user_id, 'insights', CHART_OUTPUT, version, window.key())
+            cached = not_modified(etag)
+            if cached is not None:
+                return cached
+            
+            analytics = agent.analytics(*window.bounds)
+            if savings_insights is None:
+                savings_insights = analytics.insights()
+            
+            # Generate trends chart (shared with the dashboard render of this version and window)
+            chart_key = (user_id, agent_cache.version(user_id), window.key())
+            trends_chart = ChartGenerator.create_monthly_trends_chart(analytics, CHART_OUTPUT, chart_key)
+            
+            return with_etag(render_template('insights.html', 
+                                             insights=savings_insights,
+                                             trends_chart=trends_chart,
+                                             window=window), etag)
+    except ValueError as e:
+        return f"Invalid date window: {str(e)}", 400
     except Exception as e:
         return f"Error in insights: {str(e)}", 500
 
 @app.route('/budget')
 def budget():
     try:
-        agent = get_agent()
-        
-        # Calculate spent amounts
-        expenses = agent.transactions[agent.transactions['Type'] == 'Expense']
-        category_totals = expenses.groupby('Category')['Amount'].sum()
-        
-        budget_data = []
-        for category, budget_amount in agent.budget_categories.items():
-            spent = category_totals.get(category, 0)
-            remaining = budget_amount - spent
-            percentage = (spent / budget_amount * 100) if budget_amount > 0 else 0
+        user_id = current_user_id()
+        # Budgets are monthly, so by default this month's spending is shown
+        period = request.args.get('period') or (None if request.args.get('date_from') or
+                                                request.args.get('date_to') else '1m')
+        window = request_window('1m')
+        with reading_agent(user_id) as agent:
             
-            # Ensure percentage doesn't exceed 100 for display
-            display_percentage = min(percentage, 100)
+            # Spent amounts and utilization (against budget x months) come
+            # from the shared analytics result for the window
+            analytics = agent.analytics(*window.bounds)
             
-            budget_data.append({
-                'category': category,
-                'budget': budget_amount,
-                'spent': spent,
-                'remaining': remaining,
-                'percentage': percentage,
-                'display_percentage': display_percentage
-            })
-        
-        return render_template('budget.html', budget_data=budget_data)
+            return render_template('budget.html', budget_data=analytics.budget, months=analytics.months,
+                                   window=window, period=period, periods=BUDGET_PERIODS)
+    except ValueError as e:
+        return f"Invalid date window: {str(e)}", 400
     except Exception as e:
         return f"Error in budget: {str(e)}", 500
 
 @app.route('/update_budgets', methods=['POST'])
 def update_budgets():
     try:
-        agent = get_agent()
+        user_id = current_user_id()
         data = request.json
         
-        for category, budget in data.items():
-            agent.budget_categories[category] = float(budget)
-        
-        # Save updated budgets
-        save_agent(agent)
+        with writing_agent(user_id) as agent:
+            for category, budget in data.items():
+                agent.budget_categories[category] = float(budget)
+            
+            # Save updated budgets; transactions are unchanged
+            storage.save_budgets(agent.budget_categories, user_id)
+        snapshots.notify(user_id)
         
         return jsonify({'success': True, 'message': 'Budgets updated successfully'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/alerts')
+def alerts():
+    """The user's recent budget alerts (newer than ?since=<id>) and alert levels"""
+    user_id = current_user_id()
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'since must be an alert id'}), 400
+    with reading_agent(user_id) as agent:
+        thresholds = list(agent.alert_thresholds)
+    return jsonify({'alerts': alert_feed.since(user_id, since), 'thresholds': thresholds})
+
+@app.route('/alerts/thresholds', methods=['POST'])
+def update_alert_thresholds():
+    """Set the user's alert levels: {"thresholds": [80, 100, 120]} in percent of budget"""
+    user_id = current_user_id()
+    data = request.get_json(silent=True) or {}
+    try:
+        thresholds = sorted({float(level) for level in data.get('thresholds', [])})
+    except (TypeError, ValueError):
+        thresholds = None
+    if not thresholds or not all(0 < level <= 1000 for level in thresholds):
+        return jsonify({'success': False, 'message': 'thresholds must be percentages between 0 and 1000'}), 400
+    thresholds = [int(level) if level.is_integer() else level for level in thresholds]
+    with writing_agent(user_id) as agent:
+        agent.alert_thresholds = thresholds
+        storage.save_alert_thresholds(thresholds, user_id)
+    return jsonify({'success': True, 'thresholds': thresholds})
+
+@app.route('/alerts/stream')
+def alerts_stream():
+    """Server-sent events: one 'budget_alert' event per alert raised for the
+    user from now on (or after Last-Event-ID / ?since=<id> when resuming).
+    The stream ends after ALERT_STREAM_SECONDS; EventSource then reconnects
+    with Last-Event-ID, so no alert is missed."""
+    user_id = current_user_id()
+    resume_from = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        last_id = int(resume_from)
+    except (TypeError, ValueError):
+        last_id = alert_feed.last_id
+    
+    def events(last_id):
+        # The id is where a reconnect resumes even if no alert arrives first
+        yield f"retry: {int(ALERT_RETRY_SECONDS * 1000)}\nid: {last_id}\nevent: ready\ndata: {last_id}\n\n"
+        deadline = time.monotonic() + ALERT_STREAM_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Frees the worker thread; the client reconnects after the retry delay
+                return
+            pending = alert_feed.wait(user_id, last_id, min(ALERT_KEEPALIVE_SECONDS, remaining))
+            if not pending:
+                # Keeps proxies from closing an idle stream
+                yield ': keepalive\n\n'
+                continue
+            for alert in pending:
+                last_id = alert['id']
+                yield f"id: {alert['id']}\nevent: budget_alert\ndata: {json.dumps(alert)}\n\n"
+    
+    response = app.response_class(events(last_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def report_job(user_id):
+    """Background job body: the user's report and the data version it covers"""
+    with reading_agent(user_id) as agent:
+        snapshot = user_snapshot(user_id, agent)
+        return {'version': snapshot['version'], 'report': snapshot['report']}
+
+def report_download(chunks, output_format='text'):
+    """Attachment response streaming a report's chunks as they are produced"""
+    mimetype, extension = ReportGenerator.FORMATS[output_format]
+    response = app.response_class(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=financial_report.{extension}'
+    return response
+
 @app.route('/generate_report')
 def generate_report():
+    """Download the report; query parameters format (text, csv, json or html)
+    and either period (e.g. 3m, ytd) or date_from and date_to (YYYY-MM-DD,
+    either may be omitted)"""
     try:
-        agent = get_agent()
-        report = agent.generate_report()
+        user_id = current_user_id()
+        output_format = request.args.get('format', 'text')
+        if output_format not in ReportGenerator.FORMATS:
+            return f"Unknown report format '{output_format}'", 400
+        try:
+            window = request_window()
+        except ValueError as e:
+            return f"Invalid date window: {str(e)}", 400
+        date_from, date_to = window.bounds
         
-        # Return report as downloadable file
-        output = io.BytesIO()
-        output.write(report.encode('utf-8'))
-        output.seek(0)
+        with reading_agent(user_id) as agent:
+            if output_format == 'text' and window.is_open:
+                # Precomputed for this data version unless writes have not settled yet
+                chunks = [user_snapshot(user_id, agent)['report']]
+            else:
+                # Captures what it needs now, so sections render after the lock is released
+                chunks = ReportGenerator(agent, date_from, date_to).render(output_format)
+        
+        # Return report as downloadable file, streamed section by section
+        return report_download(chunks, output_format)
+    except Exception as e:
+        return f"Error generating report: {str(e)}", 500
+
+def submit_job(user_id, kind):
+    """Submit a background job of a known kind and return the 202 response"""
+    if kind == 'train_model':
+        # Submitting loads a store-backed agent's rows, re-sized on release
+        with reading_agent(user_id) as agent:
+            job = model_registry.train_async(agent, user_id)
+        if job is None:
+            raise JobLimitExceeded(f"User '{user_id}' already has {job_runner.per_user} unfinished job(s)")
+    elif kind == 'report':
+        # Keyed by data version so repeated requests share one run
+        get_agent(user_id)
+        job = job_runner.submit(user_id, 'report', report_job, user_id, key=agent_cache.version(user_id))
+    else:
+        return jsonify({'success': False, 'message': f"Unknown job kind '{kind}'"}), 400
+    return job_accepted(job, success=True)
+
+def job_accepted(job, **fields):
+    """202 response pointing the client at a background job to poll"""
+    response = jsonify({**fields, 'job': job.to_dict()})
+    response.status_code = 202
+    response.headers['Location'] = f'/jobs/{job.id}'
+    return response
+
+def user_job(job_id):
+    """The job with this id if it belongs to the session's user, else None"""
+    job = job_runner.get(job_id)
+    if job is None or job.user_id != current_user_id():
+        return None
+    return job
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Submit a job: {"kind": "train_model" | "report"}"""
+    data = request.get_json(silent=True) or request.form
+    try:
+        return submit_job(current_user_id(), data.get('kind', ''))
+    except JobLimitExceeded as e:
+        return jsonify({'success': False, 'message': str(e)}), 429
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = user_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = user_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    if not job.finished:
+        return jsonify({'success': False, 'job': job.to_dict(), 'message': 'Job has not finished'}), 409
+    if job.error is not None:
+        return jsonify({'success': False, 'job': job.to_dict(), 'message': job.error}), 500
+    if job.kind == 'report':
+        return report_download([job.result['report']])
+    if job.result is None:
+        return jsonify({'success': False, 'message': 'Need more transaction data to train the model'})
+    return jsonify({'success': True, 'model_score': job.result['score'], 'version': job.result['version']})
+
+@app.route('/export_transactions')
+def export_transactions():
+    """Download transactions as CSV, optionally only those in a period or
+    date_from/date_to window"""
+    try:
+        window = request_window()
+        output = io.StringIO()
+        storage.export_transactions_csv(output, current_user_id(), *window.bounds)
         
         return send_file(
-            output,
+            io.BytesIO(output.getvalue().encode('utf-8')),
             as_attachment=True,
-            download_name='financial_report.txt',
-            mimetype='text/plain'
+            download_name='transactions.csv',
+            mimetype='text/csv'
         )
+    except ValueError as e:
+        return f"Invalid date window: {str(e)}", 400
     except Exception as e:
-        return f"Error generating report: {str(e)}", 500
+        return f"Error exporting transactions: {str(e)}", 500
 
 @app.route('/clear_data', methods=['POST'])
 def clear_data():
     try:
-        # Clear all data files
-        user_id = 'default'
-        data_files = [
-            f'data/{user_id}_transactions.csv',
-            f'data/{user_id}_budgets.json', 
-            f'data/{user_id}_income.json'
-        ]
-        
-        for file_path in data_files:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        user_id = current_user_id()
+        # Clear all data files, including pending transaction log segments
+        with agent_cache.lock(user_id).write():
+            storage.clear_user_data(user_id)
+            model_registry.clear(user_id)
+            job_runner.forget(user_id)
+            snapshot_store.discard(user_id)
+            alert_feed.forget(user_id)
+            agent_cache.invalidate(user_id)
         
         return jsonify({'success': True, 'message': 'Data cleared successfully'})
     except Exception as e:
@@ -240,24 +833,87 @@ def clear_data():
 @app.route('/generate_sample_data', methods=['POST'])
 def generate_sample_data():
     try:
+        user_id = current_user_id()
         # Clear existing data
-        user_id = 'default'
-        data_files = [
-            f'data/{user_id}_transactions.csv',
-            f'data/{user_id}_budgets.json',
-            f'data/{user_id}_income.json'
-        ]
-        
-        for file_path in data_files:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        
-        # Create new agent with sample data (will auto-generate)
-        agent = get_agent()
+        with agent_cache.lock(user_id).write():
+            storage.clear_user_data(user_id)
+            model_registry.clear(user_id)
+            job_runner.forget(user_id)
+            snapshot_store.discard(user_id)
+            alert_feed.forget(user_id)
+            agent_cache.invalidate(user_id)
         
+        # The next request loads the user afresh, which generates sample data
         return jsonify({'success': True, 'message': 'Sample data generated successfully'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/switch_user', methods=['POST'])
+def switch_user():
+    """Select the user this session works on (JSON body or form field 'user_id')"""
+    data = request.get_json(silent=True) or request.form
+    user_id = str(data.get('user_id', '')).strip()
+    if not is_valid_user_id(user_id):
+        message = 'User ids are 1-64 letters, digits, "-" or "_"'
+        if request.is_json:
+            return jsonify({'success': False, 'message': message}), 400
+        return message, 400
+    session['user_id'] = user_id
+    if request.is_json:
+        return jsonify({'success': True, 'user_id': user_id})
+    return redirect(request.referrer or '/')
+
+@app.cli.command('migrate-storage')
+@click.option('--source', default='csv', help='Backend the data is currently stored in')
+@click.option('--target', default='feather', help='Backend to convert the data to (csv, feather or sqlite)')
+def migrate_storage_command(source, target):
+    """Convert every user's transactions to another storage backend"""
+    if target == 'sqlite':
+        # Copies budgets and income sources too; the files are left in place
+        migrated = migrate_to_sqlite(storage.data_dir, source=source)
+    else:
+        migrated = migrate_transactions(storage.data_dir, source=source, target=target)
+    click.echo(f"Migrated {len(migrated)} user(s) from {source} to {target}")
+
+@app.cli.command('refresh-snapshots')
+def refresh_snapshots_command():
+    """Recompute every user's forecast, insights and report snapshot (for cron)"""
+    user_ids = sorted(set(snapshot_store.users()) | {'default'})
+    for user_id in user_ids:
+        snapshot_store.put(user_id, compute_snapshot(user_id))
+    click.echo(f"Refreshed {len(user_ids)} snapshot(s)")
+
+@app.cli.command('batch-analytics')
+@click.option('--workers', type=int, default=None, help='Worker processes (default BATCH_WORKERS or the CPU count)')
+@click.option('--chunk-size', type=int, default=None, help='Users per task (default BATCH_CHUNK_SIZE or about 4 per worker)')
+@click.option('--user', 'user_ids', multiple=True, help='Only analyze this user (repeatable)')
+@click.option('--output', default=None, help='Summary database (default <data dir>/summaries.db)')
+def batch_analytics_command(workers, chunk_size, user_ids, output):
+    """Forecast, savings insights and budget overruns for every user, in parallel (for cron)"""
+    store = SummaryStore(output or os.path.join(storage.data_dir, 'summaries.db'))
+    
+    def progress(done, total):
+        click.echo(f"\r{done:,}/{total:,} users", nl=False)
+    
+    result = run_batch_analytics(STORAGE_BACKEND, storage.data_dir, store, user_ids=list(user_ids) or None,
+                                 workers=workers, chunk_size=chunk_size, progress=progress)
+    click.echo(f"\nAnalyzed {result['users']:,} user(s) in {result['seconds']:.1f}s, "
+               f"{result['failed']:,} failed; run {result['run_id']} written to {store.path}")
+
+@app.cli.command('generate-sample-data')
+@click.option('--user', 'user_id', default='default', help='User to write the sample data for')
+@click.option('--rows', default=100, show_default=True, help='Number of transactions to generate')
+@click.option('--months', default=3, show_default=True, help='Length of the date window in 30-day months')
+@click.option('--seed', type=int, default=None, help='Seed for reproducible data')
+def generate_sample_data_command(user_id, rows, months, seed):
+    """Replace a user's transactions with generated sample data (for load testing)"""
+    transactions = generate_transactions(rows=rows, months=months, seed=seed,
+                                         expense_categories=list(storage.load_budgets(user_id).keys()),
+                                         income_categories=list(storage.load_income_sources(user_id).keys()))
+    storage.save_transactions(transactions, user_id)
+    agent_cache.invalidate(user_id)
+    snapshot_store.discard(user_id)
+    click.echo(f"Wrote {len(transactions):,} transactions for user '{user_id}'")
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
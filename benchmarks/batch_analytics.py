@@ -0,0 +1,57 @@
+"""Throughput of the multi-user batch analytics at increasing worker counts.
+
+Writes --users users of generated data into a scratch data directory and
+runs run_batch_analytics over all of them once per worker count, reporting
+users per second and the speedup over one worker.
+
+    python -m benchmarks.batch_analytics --users 2000 --rows 200 --workers 1,2,4,8
+    python -m benchmarks.batch_analytics --backend sqlite
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from modules.sample_data import generate_transactions
+from modules.batch_analytics import SummaryStore, open_storage, run_batch_analytics
+
+def populate(storage, users, rows, months):
+    for i in range(users):
+        storage.save_transactions(generate_transactions(rows=rows, months=months, seed=i), f'user{i:06d}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=200, help='Transactions per user')
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--backend', default='csv', help='csv, feather or sqlite')
+    parser.add_argument('--workers', default=','.join(str(n) for n in sorted({1, 2, os.cpu_count() or 1})),
+                        help='Comma-separated worker counts')
+    parser.add_argument('--chunk-size', type=int, default=None)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='fma-batch-')
+    try:
+        start = time.perf_counter()
+        populate(open_storage(args.backend, data_dir), args.users, args.rows, args.months)
+        print(f"{args.users:,} users x {args.rows:,} rows ({args.backend}) written in "
+              f"{time.perf_counter() - start:.1f}s; {os.cpu_count()} CPU(s)")
+        # Let the directory listing settle so every run sees the same cache state
+        time.sleep(2)
+
+        print(f"{'workers':>8}{'seconds':>10}{'users/s':>10}{'speedup':>10}")
+        baseline = None
+        for workers in [int(n) for n in args.workers.split(',') if n]:
+            store = SummaryStore(os.path.join(data_dir, f'summaries-{workers}.db'))
+            result = run_batch_analytics(args.backend, data_dir, store, workers=workers,
+                                         chunk_size=args.chunk_size)
+            if result['failed']:
+                print(f"  {result['failed']} user(s) failed")
+            baseline = baseline or result['seconds']
+            print(f"{workers:8d}{result['seconds']:10.2f}{result['users'] / result['seconds']:10.0f}"
+                  f"{baseline / result['seconds']:10.2f}")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
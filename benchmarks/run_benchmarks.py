@@ -0,0 +1,276 @@
+"""Benchmark suite for the agent, chart generation and every Flask route
+(except those listed in ROUTES_NOT_BENCHMARKED, with the reason).
+
+Synthetic datasets are generated with modules.sample_data at each requested
+size, written through the app's storage (--backend) into a scratch data directory and then
+exercised through the FinancialManagementAgent API, ChartGenerator and the
+Flask test client. Latency percentiles come from untraced runs; peak memory
+comes from one extra run under tracemalloc.
+
+    python -m benchmarks.run_benchmarks --sizes 1k,100k --output results.json
+    python -m benchmarks.run_benchmarks --sizes 1k,100k,1m --baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --sizes 1k,100k --save-baseline
+
+Sizes accept k/m suffixes (1k, 100k, 1m, 10m). Exits with status 1 when a
+benchmark's p50 regresses past --threshold relative to the baseline.
+Model training dominates the 1m/10m runs; add --skip build_ml_model there
+when only the request paths are of interest.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json')
+
+# Routes run_size does not exercise, and why
+ROUTES_NOT_BENCHMARKED = {
+    'POST /switch_user': 'only stores the user id in the session cookie',
+    'GET /jobs/<job_id>/result (train_model)': 'returns a stored score; the fit itself is '
+                                               'measured by POST /build_model'
+}
+
+def parse_size(text):
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+def repeats_for(rows, base):
+    """Fewer repetitions for the larger datasets so a run stays bounded"""
+    if rows >= 5000000:
+        return max(1, base // 10)
+    if rows >= 500000:
+        return max(2, base // 4)
+    return base
+
+def measure(func, setup=None, repeat=10, warmup=1):
+    """Latency percentiles (ms) and tracemalloc peak (MiB) of func(setup())"""
+    for _ in range(warmup):
+        func(setup() if setup else None)
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        func(state)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    state = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    timings = np.array(timings)
+    return {
+        'repeat': repeat,
+        'mean_ms': round(float(timings.mean()), 3),
+        'p50_ms': round(float(np.percentile(timings, 50)), 3),
+        'p95_ms': round(float(np.percentile(timings, 95)), 3),
+        'p99_ms': round(float(np.percentile(timings, 99)), 3),
+        'peak_mib': round(peak / 2 ** 20, 3)
+    }
+
+def run_size(app_module, rows, repeat, skip):
+    from modules.sample_data import generate_transactions
+    from modules.financial_agent import FinancialManagementAgent
+    from modules.data_processor import DataProcessor
+    from modules.visualization import ChartGenerator
+
+    storage = app_module.storage
+    user_id = 'default'
+    storage.clear_user_data(user_id)
+    app_module.model_registry.clear(user_id)
+    app_module.agent_cache.clear()
+    transactions = generate_transactions(rows=rows, months=24, seed=42)
+    storage.save_transactions(transactions, user_id)
+
+    results = {}
+
+    def bench(name, func, setup=None, base_repeat=repeat):
+        if any(pattern in name for pattern in skip):
+            return
+        results[name] = measure(func, setup, repeats_for(rows, base_repeat))
+        print(f"  {name:52} p50 {results[name]['p50_ms']:10.2f} ms   "
+              f"p95 {results[name]['p95_ms']:10.2f} ms   peak {results[name]['peak_mib']:8.2f} MiB")
+
+    def fresh_agent(_=None):
+        """An agent whose derived structures (cube, indexes) must be rebuilt"""
+        agent = FinancialManagementAgent()
+        agent.transactions = warm.transactions
+        agent.budget_categories = dict(warm.budget_categories)
+        return agent
+
+    # Storage and agent loading
+    bench('get_agent (cold)', lambda _: app_module.get_agent(),
+          setup=lambda: app_module.agent_cache.clear())
+    warm = app_module.get_agent()
+    bench('get_agent (warm)', lambda _: app_module.get_agent())
+
+    # Agent analytics on an agent whose aggregates are not built yet
+    bench('agent.add_transaction', lambda agent: agent.add_transaction(
+        '2025-01-15', 'Benchmark', 123.45, 'Shopping', 'Expense'), setup=fresh_agent)
+    bench('agent.categorize_expenses', lambda agent: agent.categorize_expenses(), setup=fresh_agent)
+    bench('agent.forecast_budget', lambda agent: agent.forecast_budget(), setup=fresh_agent)
+    bench('agent.analyze_savings', lambda agent: agent.analyze_savings(), setup=fresh_agent)
+    bench('agent.generate_report', lambda agent: agent.generate_report(), setup=fresh_agent)
+    bench('agent.build_ml_model', lambda agent: agent.build_ml_model(), setup=fresh_agent, base_repeat=3)
+
+    # Chart generation without the render cache
+    expense_data = DataProcessor.expense_summary_to_json(warm.categorize_expenses())
+    forecast_json = DataProcessor.forecast_to_json(warm.forecast_budget())
+    for output in ('html', 'json'):
+        bench(f'ChartGenerator.create_expense_pie_chart [{output}]',
+              lambda _: ChartGenerator.create_expense_pie_chart(expense_data, output))
+        bench(f'ChartGenerator.create_monthly_trends_chart [{output}]',
+              lambda _: ChartGenerator.create_monthly_trends_chart(warm.aggregates, output))
+        bench(f'ChartGenerator.create_forecast_chart [{output}]',
+              lambda _: ChartGenerator.create_forecast_chart(forecast_json, output))
+
+    # Flask routes through the test client, against the warm cache
+    client = app_module.app.test_client()
+    model_registry = app_module.model_registry
+    if not any('route' in pattern for pattern in skip):
+        model_registry.train(app_module.get_agent(), user_id)
+    for path in ('/', '/transactions', '/api/transactions?limit=50', '/api/transactions?limit=50&sort=amount_desc',
+                 '/forecast', '/insights', '/budget', '/generate_report', '/api/charts/monthly_trends',
+                 '/export_transactions'):
+        bench(f'route GET {path}', lambda _, path=path: client.get(path))
+    bench('route GET / (304)', lambda etag: client.get('/', headers={'If-None-Match': etag}),
+          setup=lambda: client.get('/').headers.get('ETag'))
+    bench('route POST /add_transaction', lambda _: client.post('/add_transaction', json={
+        'date': '2025-01-15', 'description': 'Benchmark', 'amount': '99.5',
+        'category': 'Shopping', 'type': 'Expense'}))
+    bench('route POST /predict_expense', lambda _: client.post('/predict_expense', json={
+        'day_of_week': 2, 'day_of_month': 15, 'month': 1, 'is_weekend': 0, 'category': 'Shopping'}))
+    bench('route POST /predict_expenses (31 days)', lambda _: client.post('/predict_expenses', json={
+        'date_from': '2025-02-01', 'date_to': '2025-03-03'}))
+
+    # Routes added with date windows, forecasting intervals, charts and alerts
+    for path in ('/?period=3m', '/budget?period=12m', '/api/forecast', '/api/forecast?method=holt&months=6',
+                 '/api/charts/expense_pie', '/api/charts/forecast', '/alerts', '/metrics'):
+        bench(f'route GET {path}', lambda _, path=path: client.get(path))
+    bench('route GET /alerts/stream (first event)', lambda _: first_event(client, '/alerts/stream'))
+    bench('route POST /update_budgets', lambda _: client.post('/update_budgets', json=dict(warm.budget_categories)))
+    bench('route POST /alerts/thresholds', lambda _: client.post('/alerts/thresholds', json={'thresholds': [80, 100]}))
+
+    # Bulk import of 1,000 rows, committed into the cached agent
+    upload = generate_transactions(rows=1000, months=1, seed=7).to_csv(index=False, date_format='%Y-%m-%d').encode('utf-8')
+    bench('route POST /import_transactions (1k rows)', lambda _: client.post(
+        '/import_transactions', data={'file': (io.BytesIO(upload), 'import.csv')},
+        content_type='multipart/form-data'))
+
+    # Background jobs, submitted and polled until they finish
+    bench('route POST /build_model (until fitted)', lambda _: run_job(client, client.post('/build_model')),
+          base_repeat=3)
+    bench('route POST /jobs report (until done)', lambda _: run_job(client, client.post('/jobs', json={'kind': 'report'})))
+    report_job = run_job(client, client.post('/jobs', json={'kind': 'report'}))
+    bench('route GET /jobs/<id>', lambda _: client.get(f'/jobs/{report_job}'))
+    bench('route GET /jobs/<id>/result (report)', lambda _: client.get(f'/jobs/{report_job}/result'))
+
+    # These replace the dataset, so they run last
+    # Sample data is generated when the next request loads the cleared user
+    bench('route POST /generate_sample_data + next load',
+          lambda _: (client.post('/generate_sample_data'), client.get('/api/transactions')), base_repeat=3)
+    bench('route POST /clear_data', lambda _: client.post('/clear_data'), base_repeat=3)
+    return results
+
+def first_event(client, path):
+    """Open a server-sent event stream, read its first event and close it"""
+    response = client.get(path, buffered=False)
+    try:
+        next(iter(response.response))
+    finally:
+        response.close()
+
+def run_job(client, response, poll_interval=0.01):
+    """Poll a submitted job (202 response) until it finishes; returns its id"""
+    job_id = response.get_json()['job']['id']
+    while client.get(f'/jobs/{job_id}').get_json()['job']['status'] in ('queued', 'running'):
+        time.sleep(poll_interval)
+    return job_id
+
+def compare(results, baseline, threshold):
+    """Benchmarks whose p50 grew by more than threshold relative to the baseline"""
+    regressions = []
+    for size, benchmarks in results['sizes'].items():
+        for name, stats in benchmarks.items():
+            previous = baseline.get('sizes', {}).get(size, {}).get(name)
+            if previous is None or previous['p50_ms'] <= 0:
+                continue
+            change = stats['p50_ms'] / previous['p50_ms'] - 1
+            if change > threshold:
+                regressions.append((size, name, previous['p50_ms'], stats['p50_ms'], change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1k,100k', help='Comma separated dataset sizes (default 1k,100k)')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed repetitions per benchmark')
+    parser.add_argument('--skip', default='', help='Comma separated substrings of benchmark names to skip')
+    parser.add_argument('--backend', default='csv', choices=['csv', 'feather', 'sqlite'],
+                        help='Storage backend to benchmark (csv, feather or sqlite)')
+    parser.add_argument('--output', help='Write results JSON to this path')
+    parser.add_argument('--baseline', help=f'Compare against this results JSON (default {DEFAULT_BASELINE} if present)')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the default baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed p50 regression ratio (default 0.25)')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='fma-bench-')
+    previous_cwd = os.getcwd()
+    os.environ['STORAGE_BACKEND'] = args.backend
+    sys.path.insert(0, REPO_ROOT)
+    # app.py keeps its data in ./data, so run it from the scratch directory
+    os.chdir(scratch)
+    try:
+        import app as app_module
+
+        results = {
+            'meta': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'backend': args.backend,
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+            },
+            'sizes': {}
+        }
+        skip = [pattern for pattern in args.skip.split(',') if pattern]
+        for size in args.sizes.split(','):
+            rows = parse_size(size)
+            print(f"{rows:,} transactions")
+            results['sizes'][size.strip()] = run_size(app_module, rows, args.repeat, skip)
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    baseline_path = args.baseline or (DEFAULT_BASELINE if os.path.exists(DEFAULT_BASELINE) and not args.save_baseline else None)
+    if baseline_path:
+        with open(baseline_path, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for size, name, before, after, change in regressions:
+            print(f"REGRESSION [{size}] {name}: p50 {before:.2f} ms -> {after:.2f} ms (+{change:.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {baseline_path}")
+
+if __name__ == '__main__':
+    main()
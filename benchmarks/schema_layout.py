@@ -0,0 +1,80 @@
+"""Memory and latency of the legacy untyped transactions layout versus the
+canonical typed schema (modules/schema.py).
+
+    python -m benchmarks.schema_layout --rows 1000000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from modules.schema import normalize_transactions
+
+CATEGORIES = ['Food & Dining', 'Transportation', 'Entertainment', 'Utilities', 'Shopping',
+              'Healthcare', 'Rent', 'Education', 'Personal Care', 'Investments', 'Other',
+              'Salary', 'Freelance', 'Business', 'Other Income']
+
+def legacy_frame(rows, seed=42):
+    """Transactions as pd.read_csv returns them from the CSV store"""
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64('2020-01-01') + rng.integers(0, 5 * 365, rows).astype('timedelta64[D]')
+    categories = np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), rows)]
+    return pd.DataFrame({
+        'Date': np.datetime_as_string(dates, unit='D').astype(object),
+        'Description': np.array(['Sample'] * rows, dtype=object),
+        'Amount': rng.uniform(50, 15000, rows).round(2),
+        'Category': categories,
+        'Type': np.where(rng.random(rows) < 0.8, 'Expense', 'Income').astype(object)
+    })
+
+def legacy_monthly_category(df):
+    expenses = df[df['Type'] == 'Expense'].copy()
+    expenses['Date'] = pd.to_datetime(expenses['Date'])
+    expenses['Month'] = expenses['Date'].dt.to_period('M')
+    return expenses.groupby(['Month', 'Category'])['Amount'].sum().unstack(fill_value=0)
+
+def canonical_monthly_category(df):
+    expenses = df[df['Type'] == 'Expense']
+    return expenses.groupby(['Month', 'Category'], observed=True)['Amount'].sum().unstack(fill_value=0)
+
+def legacy_features(df):
+    expenses = df[df['Type'] == 'Expense'].copy()
+    expenses['Date'] = pd.to_datetime(expenses['Date'])
+    return expenses['Date'].dt.dayofweek, expenses['Date'].dt.day, expenses['Date'].dt.month
+
+def canonical_features(df):
+    dates = df[df['Type'] == 'Expense']['Date'].dt
+    return dates.dayofweek, dates.day, dates.month
+
+def best_of(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    legacy = legacy_frame(args.rows)
+    start = time.perf_counter()
+    canonical = normalize_transactions(legacy)
+    normalize_ms = (time.perf_counter() - start) * 1000
+
+    print(f"rows: {args.rows:,}  (one-off normalize at load: {normalize_ms:.0f} ms)")
+    print(f"{'':28}{'legacy':>12}{'canonical':>12}")
+    legacy_mb = legacy.memory_usage(deep=True).sum() / 2 ** 20
+    canonical_mb = canonical.memory_usage(deep=True).sum() / 2 ** 20
+    print(f"{'memory (MiB)':28}{legacy_mb:12.1f}{canonical_mb:12.1f}")
+    for label, legacy_func, canonical_func in (
+        ('month x category (ms)', legacy_monthly_category, canonical_monthly_category),
+        ('model features (ms)', legacy_features, canonical_features)
+    ):
+        print(f"{label:28}{best_of(legacy_func, legacy, args.repeat):12.0f}"
+              f"{best_of(canonical_func, canonical, args.repeat):12.0f}")
+
+if __name__ == '__main__':
+    main()
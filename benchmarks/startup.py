@@ -0,0 +1,96 @@
+"""Cold-start latency of the Flask application.
+
+Each run starts a fresh interpreter in a scratch data directory and times
+``import app`` followed by the first and second request to each route, so
+the cost of importing the heavy libraries on first use shows up as the gap
+between the two. Runs are repeated and the median reported, once as
+deployed and once with PRELOAD_MODULES=1 (what a pre-fork master pays
+before forking workers).
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --importtime 15
+
+--importtime lists the slowest modules imported by ``import app``, from
+``python -X importtime``.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTES = ['/', '/forecast', '/insights', '/budget']
+
+def child(routes):
+    """Runs inside the fresh interpreter; prints one JSON line of timings"""
+    start = time.perf_counter()
+    import app as application
+    timings = {'import app': time.perf_counter() - start}
+    client = application.app.test_client()
+    try:
+        for route in routes:
+            for attempt in ('first', 'second'):
+                start = time.perf_counter()
+                client.get(route)
+                timings[f'{route} ({attempt})'] = time.perf_counter() - start
+    finally:
+        application.job_runner.shutdown()
+    timings['modules loaded'] = len(sys.modules)
+    print(json.dumps(timings))
+
+def run_once(routes, preload):
+    env = dict(os.environ, PRELOAD_MODULES='1' if preload else '0',
+               PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])))
+    with tempfile.TemporaryDirectory() as scratch:
+        # Relative data paths land in the scratch directory, not the real data/
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.startup', '--child', ','.join(routes)],
+                                cwd=scratch, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def import_profile(top):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    with tempfile.TemporaryDirectory() as scratch:
+        stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                                cwd=scratch, env=env, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--routes', default=','.join(ROUTES), help='Comma-separated routes to request')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N',
+                        help='Also list the N slowest imports (cumulative)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        child([route for route in args.child.split(',') if route])
+        return
+
+    routes = [route for route in args.routes.split(',') if route]
+    for preload in (False, True):
+        runs = [run_once(routes, preload) for _ in range(args.runs)]
+        print(f"PRELOAD_MODULES={int(preload)} (median of {args.runs} runs)")
+        for name in runs[0]:
+            value = statistics.median(run[name] for run in runs)
+            if name == 'modules loaded':
+                print(f"  {name:32}{value:10.0f}")
+            else:
+                print(f"  {name:32}{value * 1000:10.1f} ms")
+
+    if args.importtime:
+        print(f"Slowest imports under 'import app' (cumulative):")
+        for microseconds, name in import_profile(args.importtime):
+            print(f"  {name:48}{microseconds / 1000:10.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+import os
+import sys
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from modules.locking import LockTable
+
+class AgentCache:
+    """Bounded, process-resident cache of loaded FinancialManagementAgent objects.
+
+    Entries are keyed by user_id and evicted least-recently-used first once the
+    summed memory footprint exceeds ``max_bytes``. Each entry remembers the
+    storage signature it was loaded or last written at; the signature is only
+    re-checked every ``revalidate_interval`` seconds, so warm requests inside
+    that window touch no files at all.
+
+    Use ``read`` and ``write`` around work on a cached agent: readers share a
+    per-user lock, while a writer holds it exclusively together with the
+    user's storage lock for the in-memory change and its write to disk.
+    """
+
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+    DEFAULT_REVALIDATE_INTERVAL = 2.0
+
+    def __init__(self, storage, max_bytes=None, revalidate_interval=None):
+        self.storage = storage
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get('AGENT_CACHE_MAX_BYTES', self.DEFAULT_MAX_BYTES))
+        self.revalidate_interval = revalidate_interval if revalidate_interval is not None else float(
+            os.environ.get('AGENT_CACHE_REVALIDATE_SECONDS', self.DEFAULT_REVALIDATE_INTERVAL))
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._agent_locks = LockTable()
+
+    # Assumed size of a buffered row while the agent has no frame to size it from
+    ROW_BYTES = 200
+    # Values sampled to size an object column
+    SAMPLE_VALUES = 1000
+
+    @classmethod
+    def frame_footprint(cls, transactions):
+        """Approximate memory held by a transactions frame; object columns are
+        sized from a sample of their values so large frames measure quickly"""
+        footprint = int(transactions.memory_usage(deep=False).sum())
+        for column in transactions.columns:
+            values = transactions[column]
+            if values.dtype == object and len(values):
+                sample = values.iloc[::max(1, len(values) // cls.SAMPLE_VALUES)]
+                extra = sample.memory_usage(deep=True, index=False) - sample.memory_usage(index=False)
+                footprint += int(extra * len(values) / len(sample))
+        return footprint
+
+    @classmethod
+    def estimate_footprint(cls, agent, entry=None):
+        """Approximate memory held by an agent, dominated by its transactions frame.
+
+        With an entry, the frame is only re-sized when it was replaced or
+        loaded since the entry was last measured; rows buffered by
+        add_transaction are counted at the frame's average row size.
+        """
+        # Agents reading from a store may not have loaded their rows yet
+        transactions, pending = agent.loaded_state()
+        footprint = frame_bytes = 0
+        if transactions is not None:
+            known = entry.get('frame') if entry is not None else None
+            if known is not None and known() is transactions:
+                frame_bytes = entry['frame_bytes']
+            else:
+                frame_bytes = cls.frame_footprint(transactions)
+                if entry is not None:
+                    entry['frame'], entry['frame_bytes'] = weakref.ref(transactions), frame_bytes
+            footprint = frame_bytes
+        row_bytes = frame_bytes // len(transactions) if transactions is not None and len(transactions) else cls.ROW_BYTES
+        footprint += pending * row_bytes
+        footprint += sys.getsizeof(agent.budget_categories) + sys.getsizeof(agent.income_sources)
+        return footprint
+
+    def get(self, user_id, loader):
+        """Return the cached agent for user_id, calling loader(user_id) on a miss"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                now = time.monotonic()
+                if now - entry['checked_at'] < self.revalidate_interval:
+                    self._entries.move_to_end(user_id)
+                    return entry['agent']
+                if self.storage.signature(user_id) == entry['signature']:
+                    entry['checked_at'] = now
+                    self._entries.move_to_end(user_id)
+                    return entry['agent']
+                self._remove(user_id)
+
+        agent = loader(user_id)
+        self.put(user_id, agent)
+        return agent
+
+    def lock(self, user_id):
+        """In-process readers-writer lock over a user's cached agent"""
+        return self._agent_locks[user_id]
+
+    @contextmanager
+    def read(self, user_id, loader):
+        """Yield the user's agent while holding its read lock"""
+        agent = self.get(user_id, loader)
+        with self.lock(user_id).read():
+            yield agent
+            # The reader may have loaded a store-backed agent's rows
+            self.remeasure(user_id)
+
+    @contextmanager
+    def write(self, user_id, loader):
+        """Yield the user's agent for a change that is also written to storage.
+
+        The entry is checked against the files on disk once both locks are
+        held; if another process changed them, the agent is reloaded first so
+        the change is applied to (and saved from) current data rather than
+        overwriting the other process's write.
+        """
+        with self.lock(user_id).write(), self.storage.lock(user_id).write():
+            agent = self.get(user_id, loader)
+            with self._lock:
+                entry = self._entries.get(user_id)
+                in_sync = (entry is not None and entry['agent'] is agent
+                           and entry['signature'] == self.storage.signature(user_id))
+            if not in_sync:
+                agent = loader(user_id)
+                self.put(user_id, agent)
+            try:
+                yield agent
+            except BaseException:
+                # The agent may hold a change that never reached disk
+                self.invalidate(user_id)
+                raise
+            self.refresh(user_id)
+
+    def put(self, user_id, agent):
+        """Store an agent that matches what is currently on disk"""
+        entry = {
+            'agent': agent,
+            'signature': self.storage.signature(user_id),
+            'checked_at': time.monotonic()
+        }
+        entry['footprint'] = self.estimate_footprint(agent, entry)
+        with self._lock:
+            self._remove(user_id)
+            self._entries[user_id] = entry
+            self._total_bytes += entry['footprint']
+            self._evict()
+
+    def refresh(self, user_id):
+        """Re-stamp an entry after this process wrote the cached agent's changes to disk"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry['signature'] = self.storage.signature(user_id)
+                entry['checked_at'] = time.monotonic()
+        self.remeasure(user_id)
+
+    def remeasure(self, user_id):
+        """Re-size an entry whose agent grew (writes, merged inserts, rows
+        loaded lazily from a store) and evict others if now over budget.
+        Call with the user's lock held so the agent is not changing."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        footprint = self.estimate_footprint(entry['agent'], entry)
+        with self._lock:
+            if self._entries.get(user_id) is entry:
+                self._total_bytes += footprint - entry['footprint']
+                entry['footprint'] = footprint
+                self._evict()
+
+    @staticmethod
+    def version_token(signature):
+        """Short token identifying the data a storage signature was taken at"""
+        return hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()[:16]
+
+    def version(self, user_id):
+        """Short token identifying the data a cached agent was loaded or written at"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return self.version_token(entry['signature'])
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._remove(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._total_bytes, 'max_bytes': self.max_bytes}
+
+    def _remove(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._total_bytes -= entry['footprint']
+
+    def _evict(self):
+        # Always keep the most recently used entry, even if it alone is over budget
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            user_id = next(iter(self._entries))
+            self._remove(user_id)
@@ -0,0 +1,131 @@
+import pandas as pd
+
+class MonthlyAggregates:
+    """Materialized (month x category x type) cube of transaction amounts.
+
+    The cube is built with one groupby over the transactions and then kept up
+    to date one row at a time, so the monthly and per-category views below
+    cost O(months x categories) instead of a rescan of every transaction.
+    """
+
+    def __init__(self):
+        # (Period month, category, type) -> [amount, count]
+        self._cells = {}
+        self._views = {}
+
+    @classmethod
+    def from_transactions(cls, transactions_df):
+        """Build the cube with a single pass over a transactions DataFrame"""
+        aggregates = cls()
+        if transactions_df.empty:
+            return aggregates
+
+        if 'Month' in transactions_df.columns:
+            months = transactions_df['Month']
+        else:
+            months = pd.to_datetime(transactions_df['Date']).dt.to_period('M')
+        grouped = transactions_df['Amount'].groupby(
+            [months, transactions_df['Category'], transactions_df['Type']], observed=True
+        ).agg(['sum', 'count'])
+        for key, (amount, count) in zip(grouped.index, grouped.values):
+            aggregates._cells[key] = [float(amount), int(count)]
+        return aggregates
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build the cube from (month 'YYYY-MM', category, type, amount, count)
+        rows, e.g. the result of a GROUP BY pushed down to a database"""
+        aggregates = cls()
+        for month, category, transaction_type, amount, count in rows:
+            aggregates._cells[(pd.Period(month, 'M'), category, transaction_type)] = [float(amount), int(count)]
+        return aggregates
+
+    def between(self, first_month=None, last_month=None):
+        """A new cube with only the months in [first_month, last_month]"""
+        subset = MonthlyAggregates()
+        for (month, category, kind), (amount, count) in self._cells.items():
+            if (first_month is None or month >= first_month) and (last_month is None or month <= last_month):
+                subset._cells[(month, category, kind)] = [amount, count]
+        return subset
+
+    def add(self, date, amount, category, transaction_type):
+        """Fold a single new transaction into the cube"""
+        key = (pd.Timestamp(date).to_period('M'), category, transaction_type)
+        cell = self._cells.get(key)
+        if cell is None:
+            self._cells[key] = [float(amount), 1]
+        else:
+            cell[0] += float(amount)
+            cell[1] += 1
+        self._views.clear()
+
+    def merge(self, other):
+        """Fold another cube (e.g. built from a batch of new rows) into this one"""
+        for key, (amount, count) in other._cells.items():
+            cell = self._cells.get(key)
+            if cell is None:
+                self._cells[key] = [amount, count]
+            else:
+                cell[0] += amount
+                cell[1] += count
+        self._views.clear()
+
+    def amount(self, month, category, transaction_type):
+        """Running total of one (month Period, category, type) cell"""
+        cell = self._cells.get((month, category, transaction_type))
+        return 0.0 if cell is None else cell[0]
+
+    def month_range(self):
+        """(first, last) month with any transaction, or (None, None)"""
+        months = [month for (month, _, _), (_, count) in self._cells.items() if count]
+        return (min(months), max(months)) if months else (None, None)
+
+    def count(self, transaction_type):
+        """Number of transactions of a type"""
+        return sum(count for (_, _, kind), (_, count) in self._cells.items() if kind == transaction_type)
+
+    def categories(self, transaction_type):
+        """Categories that have transactions of a type"""
+        return {category for (_, category, kind), (_, count) in self._cells.items()
+                if kind == transaction_type and count}
+
+    def total(self, transaction_type):
+        """Total amount of a type"""
+        return sum(amount for (_, _, kind), (amount, _) in self._cells.items() if kind == transaction_type)
+
+    def _series(self, transaction_type):
+        """Amount per (month, category) for a type, sorted like a groupby"""
+        view_key = ('series', transaction_type)
+        if view_key not in self._views:
+            cells = {(month, category): amount
+                     for (month, category, kind), (amount, _) in self._cells.items()
+                     if kind == transaction_type}
+            if cells:
+                index = pd.MultiIndex.from_tuples(list(cells.keys()), names=['Month', 'Category'])
+                series = pd.Series(list(cells.values()), index=index, name='Amount', dtype='float64').sort_index()
+            else:
+                series = pd.Series(dtype='float64', name='Amount')
+            self._views[view_key] = series
+        return self._views[view_key]
+
+    def category_matrix(self, transaction_type='Expense'):
+        """Month x category amounts, matching categorize_expenses' layout"""
+        view_key = ('matrix', transaction_type)
+        if view_key not in self._views:
+            series = self._series(transaction_type)
+            self._views[view_key] = pd.DataFrame() if series.empty else series.unstack(fill_value=0)
+        return self._views[view_key]
+
+    def monthly_totals(self, transaction_type):
+        """Total amount per month for a type"""
+        series = self._series(transaction_type)
+        if series.empty:
+            return series
+        return series.groupby(level='Month').sum()
+
+    def category_totals(self, transaction_type='Expense'):
+        """Total amount per category for a type"""
+        series = self._series(transaction_type)
+        if series.empty:
+            return series
+        return series.groupby(level='Category').sum()
@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+from collections import deque
+import pandas as pd
+
+def crossed_thresholds(before, after, budget, thresholds):
+    """Thresholds (percent of budget) that spending moved across, lowest first"""
+    if budget <= 0 or after <= before:
+        return []
+    return [level for level in sorted(thresholds) if before < budget * level / 100 <= after]
+
+class AlertFeed:
+    """Recent alerts per user, for polling and server-sent event streams.
+
+    Ids increase across all users and start from the current time in
+    milliseconds, so a client resuming with the last id it saw (SSE
+    Last-Event-ID) neither misses nor repeats alerts, even across a restart.
+    Alerts are kept in this process only: with several server processes a
+    stream sees the alerts raised by writes handled in its own process.
+    """
+
+    def __init__(self, history=None):
+        self.history = history or int(os.environ.get('ALERT_HISTORY', 100))
+        self._alerts = {}
+        self._last_id = int(time.time() * 1000)
+        self._cond = threading.Condition()
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._last_id
+
+    def publish(self, user_id, alerts):
+        """Assign ids to alerts, keep them and wake the user's subscribers"""
+        if not alerts:
+            return alerts
+        with self._cond:
+            feed = self._alerts.get(user_id)
+            if feed is None:
+                feed = self._alerts[user_id] = deque(maxlen=self.history)
+            for alert in alerts:
+                self._last_id += 1
+                alert['id'] = self._last_id
+                feed.append(alert)
+            self._cond.notify_all()
+        return alerts
+
+    def _since(self, user_id, last_id):
+        return [alert for alert in self._alerts.get(user_id, ()) if alert['id'] > last_id]
+
+    def since(self, user_id, last_id=0):
+        """The user's kept alerts newer than last_id, oldest first"""
+        with self._cond:
+            return self._since(user_id, last_id)
+
+    def wait(self, user_id, last_id, timeout=None):
+        """Block until the user has alerts newer than last_id, or the timeout
+        passes; returns them (empty on timeout)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._since(user_id, last_id), timeout)
+            return self._since(user_id, last_id)
+
+    def forget(self, user_id):
+        with self._cond:
+            self._alerts.pop(user_id, None)
+
+class BudgetAlertMonitor:
+    """Raises an alert when an expense takes a category's spending for its
+    month across one of the user's thresholds (percentages of the monthly
+    budget, 80% and 100% unless the user set others).
+
+    The month's spending is the agent's aggregate cube cell for (month,
+    category), which add_transaction already keeps up to date, so a check
+    is one dict lookup and one comparison per threshold however long the
+    history is.
+    """
+
+    def __init__(self, feed):
+        self.feed = feed
+
+    def check(self, user_id, agent, date, amount, category, transaction_type):
+        """Alerts raised by a transaction that has just been added to the agent"""
+        budget = agent.budget_categories.get(category)
+        if transaction_type != 'Expense' or not budget:
+            return []
+        month = pd.Timestamp(date).to_period('M')
+        spent = agent.aggregates.amount(month, category, 'Expense')
+        created_at = time.time()
+        alerts = []
+        for level in crossed_thresholds(spent - float(amount), spent, budget, agent.alert_thresholds):
+            alerts.append({
+                'category': category,
+                'month': str(month),
+                'threshold': level,
+                'severity': 'exceeded' if level >= 100 else 'warning',
+                'budget': budget,
+                'spent': round(spent, 2),
+                'percentage': round(spent / budget * 100, 1),
+                'message': f"{category} spending for {month} reached {level:g}% of its ₹{budget:,.2f} "
+                           f"budget (₹{spent:,.2f} spent)",
+                'created_at': created_at
+            })
+        return self.feed.publish(user_id, alerts)
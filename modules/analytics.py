@@ -0,0 +1,161 @@
+# Advice shown for the top spending category
+REDUCTION_TIPS = {
+    'Food & Dining': "Consider cooking at home more often and limiting restaurant visits to weekends.",
+    'Transportation': "Explore public transport options or carpooling to reduce fuel costs.",
+    'Entertainment': "Look for free or low-cost entertainment options in your community.",
+    'Shopping': "Implement a 24-hour waiting period before making non-essential purchases.",
+    'Rent': "If possible, consider moving to a more affordable area or getting a roommate.",
+    'Utilities': "Turn off appliances when not in use and consider energy-efficient options."
+}
+
+class AnalyticsResult:
+    """Every statistic the report, dashboard, insights and budget views show,
+    computed once from an aggregate cube.
+
+    category_matrix     month x category expense amounts
+    monthly_income,
+    monthly_expenses,
+    monthly_savings     per-month Series (savings is income minus expenses)
+    category_totals     expense amount per category
+    top_categories      [(category, amount)], largest first
+    months              calendar months the budgets are compared over
+    budget              per budget category: budget (monthly), limit (budget
+                        x months), spent, remaining, percentage (of limit),
+                        display_percentage and status ('exceeded' over
+                        100%, 'close' over 80%, else 'within')
+    """
+
+    def __init__(self, category_matrix, monthly_income, monthly_expenses, category_totals,
+                 total_income, total_expenses, income_count, expense_count, budget, top_categories, months=1):
+        self.category_matrix = category_matrix
+        self.monthly_income = monthly_income
+        self.monthly_expenses = monthly_expenses
+        self.monthly_savings = monthly_income - monthly_expenses
+        self.category_totals = category_totals
+        self.total_income = total_income
+        self.total_expenses = total_expenses
+        self.net_savings = total_income - total_expenses
+        self.income_count = income_count
+        self.expense_count = expense_count
+        self.budget = budget
+        self.top_categories = top_categories
+        self.months = months
+
+    @property
+    def has_savings_data(self):
+        """Whether there is both income and expense history to compare"""
+        return self.expense_count > 0 and self.income_count > 0
+
+    @property
+    def average_savings(self):
+        return self.monthly_savings.mean() if self.has_savings_data else None
+
+    @property
+    def savings_rate(self):
+        """Average monthly savings as a percentage of average monthly income"""
+        if not self.has_savings_data:
+            return None
+        return (self.monthly_savings.mean() / self.monthly_income.mean()) * 100
+
+    def summary(self):
+        """Totals shown on the dashboard"""
+        return {
+            'total_income': self.total_income,
+            'total_expenses': self.total_expenses,
+            'net_savings': self.net_savings
+        }
+
+    def insights(self):
+        """Savings insight lines, joined by newlines"""
+        if not self.has_savings_data:
+            return "Not enough data for savings analysis"
+
+        avg_savings = self.average_savings
+        savings_rate = self.savings_rate
+        insights = []
+        insights.append(f"Average monthly savings: ₹{avg_savings:,.2f}")
+        insights.append(f"Savings rate: {savings_rate:.1f}% of your income")
+
+        if savings_rate > 20:
+            insights.append("Excellent savings rate! You're on track for financial security.")
+        elif savings_rate > 10:
+            insights.append("Good savings rate. Consider increasing it to 20% for better financial health.")
+        else:
+            insights.append("Your savings rate is low. Try to reduce unnecessary expenses.")
+
+        if self.top_categories:
+            category, amount = self.top_categories[0]
+            insights.append(f"Your top spending category is {category} (₹{amount:,.2f})")
+            if category in REDUCTION_TIPS:
+                insights.append(f"Tip: {REDUCTION_TIPS[category]}")
+
+        return "\n".join(insights)
+
+class AnalyticsEngine:
+    """Computes an AnalyticsResult from a MonthlyAggregates cube.
+
+    The cube is built with one pass over the transactions and kept up to
+    date on insert, so this reads only months x categories cells: each view
+    (matrix, monthly series, category totals) is derived once here and
+    shared by every consumer of the result instead of being recomputed per
+    view or per report section.
+    """
+
+    TOP_CATEGORIES = 5
+
+    @staticmethod
+    def budget_months(aggregates, first_month=None, last_month=None):
+        """Calendar months from first_month to last_month, an open end
+        falling back to the cube's first or last month with data"""
+        data_first, data_last = aggregates.month_range()
+        first_month = first_month if first_month is not None else data_first
+        last_month = last_month if last_month is not None else data_last
+        if first_month is None or last_month is None or last_month < first_month:
+            return 1
+        return (last_month - first_month).n + 1
+
+    @staticmethod
+    def compute(aggregates, budget_categories=None, top=None, months=None):
+        """AnalyticsResult for a cube and, optionally, the user's monthly budgets.
+
+        Budgets are monthly, so spending is compared against each budget
+        times ``months`` (by default the months the cube has data for).
+        """
+        expense_count = aggregates.count('Expense')
+        income_count = aggregates.count('Income')
+        category_totals = aggregates.category_totals('Expense')
+        months = months or AnalyticsEngine.budget_months(aggregates)
+
+        budget = []
+        for category, amount in (budget_categories or {}).items():
+            spent = category_totals.get(category, 0)
+            limit = amount * months
+            percentage = (spent / limit * 100) if limit > 0 else 0
+            budget.append({
+                'category': category,
+                'budget': amount,
+                'limit': limit,
+                'spent': spent,
+                'remaining': limit - spent,
+                'percentage': percentage,
+                # Bars stop at 100% on the budget page
+                'display_percentage': min(percentage, 100),
+                'status': 'exceeded' if percentage > 100 else 'close' if percentage > 80 else 'within'
+            })
+
+        ranked = category_totals.sort_values(ascending=False)
+        top_categories = list(ranked.head(top or AnalyticsEngine.TOP_CATEGORIES).items())
+
+        return AnalyticsResult(
+            category_matrix=aggregates.category_matrix('Expense'),
+            monthly_income=aggregates.monthly_totals('Income'),
+            monthly_expenses=aggregates.monthly_totals('Expense'),
+            category_totals=category_totals,
+            total_income=aggregates.total('Income'),
+            total_expenses=aggregates.total('Expense'),
+            income_count=income_count,
+            expense_count=expense_count,
+            budget=budget,
+            top_categories=top_categories,
+            months=months
+        )
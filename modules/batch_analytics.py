@@ -0,0 +1,244 @@
+import os
+import json
+import math
+import time
+import uuid
+import sqlite3
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from modules.financial_agent import FinancialManagementAgent
+from modules.data_processor import DataProcessor
+from modules.storage import DataStorage
+from modules.sqlite_storage import SQLiteStorage
+from modules.instrumentation import metrics
+
+metrics.describe('fma_batch_chunk_seconds', 'Batch analytics time per chunk of users, measured in the worker')
+
+SUMMARY_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS user_summaries (
+    user_id TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    computed_at REAL NOT NULL,
+    transactions INTEGER,
+    total_income REAL,
+    total_expenses REAL,
+    net_savings REAL,
+    savings_rate REAL,
+    forecast TEXT,
+    insights TEXT,
+    overruns TEXT,
+    overrun_count INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_user_summaries_overruns ON user_summaries (overrun_count);
+CREATE TABLE IF NOT EXISTS summary_runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    users INTEGER NOT NULL,
+    failed INTEGER,
+    workers INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL
+);
+'''
+
+SUMMARY_COLUMNS = ('user_id', 'run_id', 'computed_at', 'transactions', 'total_income', 'total_expenses',
+                   'net_savings', 'savings_rate', 'forecast', 'insights', 'overruns', 'overrun_count', 'error')
+UPSERT_SUMMARY = (f"INSERT INTO user_summaries ({', '.join(SUMMARY_COLUMNS)}) "
+                  f"VALUES ({', '.join('?' * len(SUMMARY_COLUMNS))}) ON CONFLICT (user_id) DO UPDATE SET "
+                  + ', '.join(f'{column} = excluded.{column}' for column in SUMMARY_COLUMNS[1:]))
+
+class SummaryStore:
+    """SQLite table of the latest batch analytics per user, plus one row per run.
+
+    Only the process driving a batch writes here, one transaction per chunk
+    of users; readers (dashboards, reports over all users) can query it at
+    any time thanks to WAL mode.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SUMMARY_SCHEMA)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def start_run(self, run_id, users, workers, chunk_size):
+        with self._connect() as connection:
+            connection.execute('INSERT INTO summary_runs (run_id, started_at, users, workers, chunk_size) '
+                               'VALUES (?, ?, ?, ?, ?)', (run_id, time.time(), users, workers, chunk_size))
+
+    def finish_run(self, run_id, failed):
+        with self._connect() as connection:
+            connection.execute('UPDATE summary_runs SET finished_at = ?, failed = ? WHERE run_id = ?',
+                               (time.time(), failed, run_id))
+
+    def write(self, run_id, summaries):
+        """Store per-user summaries (dicts from analyze_user), replacing older ones"""
+        rows = []
+        for summary in summaries:
+            row = dict(summary, run_id=run_id)
+            for column in ('forecast', 'overruns'):
+                if row.get(column) is not None:
+                    row[column] = json.dumps(row[column])
+            rows.append(tuple(row.get(column) for column in SUMMARY_COLUMNS))
+        with self._connect() as connection:
+            connection.executemany(UPSERT_SUMMARY, rows)
+
+    def get(self, user_id):
+        """A user's latest summary as a dict, or None"""
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute('SELECT * FROM user_summaries WHERE user_id = ?', (user_id,)).fetchone()
+        if row is None:
+            return None
+        summary = dict(row)
+        for column in ('forecast', 'overruns'):
+            if summary[column] is not None:
+                summary[column] = json.loads(summary[column])
+        return summary
+
+    def last_run(self):
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute('SELECT * FROM summary_runs ORDER BY started_at DESC LIMIT 1').fetchone()
+        return None if row is None else dict(row)
+
+def open_storage(backend, data_dir):
+    """The storage a batch reads from, as configured by STORAGE_BACKEND"""
+    if backend == 'sqlite':
+        return SQLiteStorage(data_dir, pool_size=1)
+    return DataStorage(data_dir, backend=backend)
+
+def analyze_user(storage, user_id, forecast_months=3):
+    """Forecast, savings insights and budget overruns for one user, as a
+    summary dict; reads the user's data without generating sample data"""
+    agent = FinancialManagementAgent()
+    if hasattr(storage, 'monthly_aggregates'):
+        # Analytics need only the cube, computed inside the database
+        agent.use_store(storage, user_id)
+    else:
+        agent.transactions = storage.load_transactions(user_id)
+    agent.budget_categories = storage.load_budgets(user_id)
+
+    analytics = agent.analytics()
+    overruns = [{'category': row['category'], 'budget': row['budget'],
+                 'limit': row['limit'], 'spent': round(float(row['spent']), 2),
+                 'percentage': round(float(row['percentage']), 1), 'status': row['status']}
+                for row in analytics.budget if row['status'] != 'within']
+    savings_rate = analytics.savings_rate
+    return {
+        'user_id': user_id,
+        'computed_at': time.time(),
+        'transactions': analytics.income_count + analytics.expense_count,
+        'total_income': float(analytics.total_income),
+        'total_expenses': float(analytics.total_expenses),
+        'net_savings': float(analytics.net_savings),
+        'savings_rate': None if savings_rate is None else float(savings_rate),
+        'forecast': DataProcessor.forecast_to_json(agent.forecast_budget(forecast_months)),
+        'insights': analytics.insights(),
+        'overruns': overruns,
+        'overrun_count': sum(1 for row in overruns if row['status'] == 'exceeded'),
+        'error': None
+    }
+
+# Storage opened once per worker process and reused for all its chunks
+_worker_storage = {}
+
+def analyze_chunk(backend, data_dir, user_ids, forecast_months=3):
+    """Worker entry point: summaries for a chunk of users. A user whose
+    analysis fails gets a summary with only 'error' set."""
+    start = time.perf_counter()
+    key = (backend, data_dir)
+    if key not in _worker_storage:
+        _worker_storage[key] = open_storage(backend, data_dir)
+    storage = _worker_storage[key]
+    summaries = []
+    for user_id in user_ids:
+        try:
+            summaries.append(analyze_user(storage, user_id, forecast_months))
+        except Exception as e:
+            summaries.append(failed_summary(user_id, e))
+        finally:
+            # Each user is visited once; keep file handles bounded
+            storage.forget(user_id)
+    return summaries, time.perf_counter() - start
+
+def failed_summary(user_id, error):
+    return {'user_id': user_id, 'computed_at': time.time(), 'error': f'{type(error).__name__}: {error}'}
+
+def default_chunk_size(users, workers):
+    """About four chunks per worker so a slow chunk does not leave the
+    others idle at the end, capped so each result stays small"""
+    return max(1, min(500, math.ceil(users / (workers * 4))))
+
+def run_batch_analytics(backend, data_dir, store, user_ids=None, workers=None, chunk_size=None,
+                        forecast_months=3, progress=None):
+    """Analyze every user (or ``user_ids``) and write the summaries to a
+    SummaryStore; returns {'run_id', 'users', 'failed', 'seconds'}.
+
+    Users are split into chunks handed to a pool of ``workers`` processes
+    (BATCH_WORKERS, default the CPU count); each worker opens the storage
+    once and returns one result per chunk, and at most two chunks per
+    worker are in flight, so memory stays flat however many users there
+    are. ``progress(done, total)`` is called after each chunk.
+    """
+    if user_ids is None:
+        user_ids = open_storage(backend, data_dir).users()
+    user_ids = list(user_ids)
+    workers = workers or int(os.environ.get('BATCH_WORKERS', 0)) or os.cpu_count() or 1
+    workers = max(1, min(workers, len(user_ids) or 1))
+    chunk_size = chunk_size or int(os.environ.get('BATCH_CHUNK_SIZE', 0)) or default_chunk_size(len(user_ids), workers)
+    chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+    run_id = uuid.uuid4().hex
+    start = time.perf_counter()
+    store.start_run(run_id, len(user_ids), workers, chunk_size)
+    done = failed = 0
+
+    def collect(chunk, summaries, seconds):
+        nonlocal done, failed
+        store.write(run_id, summaries)
+        metrics.observe('fma_batch_chunk_seconds', seconds)
+        done += len(chunk)
+        failed += sum(1 for summary in summaries if summary['error'] is not None)
+        if progress is not None:
+            progress(done, len(user_ids))
+
+    if workers == 1:
+        for chunk in chunks:
+            collect(chunk, *analyze_chunk(backend, data_dir, chunk, forecast_months))
+    else:
+        # spawn, as for JobRunner: the caller may have threads running
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            remaining = iter(chunks)
+            pending = {}
+
+            def submit_next():
+                chunk = next(remaining, None)
+                if chunk is not None:
+                    pending[executor.submit(analyze_chunk, backend, data_dir, chunk, forecast_months)] = chunk
+
+            for _ in range(workers * 2):
+                submit_next()
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chunk = pending.pop(future)
+                    try:
+                        summaries, seconds = future.result()
+                    except Exception as e:
+                        # The worker died; record the chunk as failed rather than abort the run
+                        summaries, seconds = [failed_summary(user_id, e) for user_id in chunk], 0.0
+                    collect(chunk, summaries, seconds)
+                    submit_next()
+
+    store.finish_run(run_id, failed)
+    return {'run_id': run_id, 'users': len(user_ids), 'failed': failed,
+            'seconds': time.perf_counter() - start}
@@ -6,6 +6,10 @@ class DataProcessor:
     @staticmethod
     def transactions_to_json(transactions_df):
         """Convert transactions DataFrame to JSON format"""
+        if 'Month' in transactions_df.columns:
+            transactions_df = transactions_df.drop(columns=['Month'])
+        if pd.api.types.is_datetime64_any_dtype(transactions_df['Date']):
+            transactions_df = transactions_df.assign(Date=transactions_df['Date'].dt.strftime('%Y-%m-%d'))
         return transactions_df.to_dict('records')
     
     @staticmethod
@@ -30,6 +34,18 @@ class DataProcessor:
         forecast_df_str.index = forecast_df_str.index.astype(str)
         return forecast_df_str.to_dict()
     
+    @staticmethod
+    def predictions_to_json(predictions_df):
+        """Convert a day x category prediction DataFrame to per-day and per-category totals"""
+        dates = predictions_df.index.strftime('%Y-%m-%d')
+        return {
+            'daily': [{'date': date, 'total': round(float(total), 2), 'categories': row}
+                      for date, total, row in zip(dates, predictions_df.sum(axis=1),
+                                                  predictions_df.to_dict('records'))],
+            'category_totals': predictions_df.sum().round(2).to_dict(),
+            'total': round(float(predictions_df.to_numpy().sum()), 2)
+        }
+    
     @staticmethod
     def serialize_period(obj):
         """Custom JSON serializer for pandas Period objects"""
@@ -0,0 +1,88 @@
+import time
+import numpy as np
+from modules.lazy import lazy_import
+
+# scikit-learn loads on the first fit or unpickled model, not at application start
+ensemble = lazy_import('sklearn.ensemble')
+linear_model = lazy_import('sklearn.linear_model')
+sklearn_metrics = lazy_import('sklearn.metrics')
+
+# Feature columns: DayOfWeek, DayOfMonth, Month, IsWeekend, CategoryEncoded
+FEATURE_SIZES = (7, 31, 12, 2)
+FEATURE_OFFSETS = (0, 1, 1, 0)
+
+def fit_forest(X, y, n_estimators=100, n_jobs=None, time_budget=None, random_state=42, batch=10):
+    """RandomForestRegressor fitted with n_jobs cores.
+
+    With a time budget (seconds) the forest grows ``batch`` trees at a time
+    with warm_start and stops once the budget is spent, keeping at least one
+    batch. A forest that reaches n_estimators is identical to a single fit.
+    """
+    model = ensemble.RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, n_jobs=n_jobs)
+    if time_budget is None:
+        return model.fit(X, y)
+    deadline = time.perf_counter() + time_budget
+    model.set_params(warm_start=True, n_estimators=0)
+    while model.n_estimators < n_estimators:
+        model.set_params(n_estimators=min(model.n_estimators + batch, n_estimators))
+        model.fit(X, y)
+        if time.perf_counter() >= deadline:
+            break
+    return model
+
+class IncrementalExpenseModel:
+    """Linear expense model trained with SGD that can keep learning from new rows.
+
+    Each feature is one-hot encoded (so the fit is additive per weekday, day
+    of month, month, weekend flag and category) and the target is
+    standardised with the mean and scale of the first batch. ``partial_fit``
+    only needs the rows that are new since the last call; the category count
+    is fixed when the model is created.
+    """
+
+    def __init__(self, n_categories, epochs=5, chunk_rows=50000, random_state=42):
+        self.n_categories = n_categories
+        self.epochs = epochs
+        self.chunk_rows = chunk_rows
+        self.sizes = FEATURE_SIZES + (n_categories,)
+        self.offsets = np.cumsum((0,) + self.sizes[:-1])
+        self.regressor = linear_model.SGDRegressor(alpha=1e-4, learning_rate='invscaling', eta0=0.01,
+                                      random_state=random_state)
+        self.y_mean = None
+        self.y_scale = None
+        self.rows_seen = 0
+        self._rng = np.random.default_rng(random_state)
+
+    def _encode(self, X):
+        X = np.asarray(X, dtype=np.int64) - np.array(FEATURE_OFFSETS + (0,))
+        # Out-of-range inputs fall into the nearest bucket
+        X = np.clip(X, 0, np.array(self.sizes) - 1)
+        encoded = np.zeros((len(X), int(sum(self.sizes))), dtype=np.float64)
+        np.put_along_axis(encoded, X + self.offsets, 1.0, axis=1)
+        return encoded
+
+    def partial_fit(self, X, y):
+        X = np.asarray(X)
+        y = np.asarray(y, dtype=np.float64)
+        if self.y_mean is None:
+            self.y_mean = float(y.mean())
+            self.y_scale = float(y.std()) or 1.0
+        scaled = (y - self.y_mean) / self.y_scale
+        for _ in range(self.epochs):
+            order = self._rng.permutation(len(X))
+            for start in range(0, len(X), self.chunk_rows):
+                rows = order[start:start + self.chunk_rows]
+                self.regressor.partial_fit(self._encode(X[rows]), scaled[rows])
+        self.rows_seen += len(X)
+        return self
+
+    def predict(self, X):
+        X = np.asarray(X)
+        predictions = np.empty(len(X))
+        for start in range(0, len(X), self.chunk_rows):
+            encoded = self._encode(X[start:start + self.chunk_rows])
+            predictions[start:start + self.chunk_rows] = self.regressor.predict(encoded)
+        return predictions * self.y_scale + self.y_mean
+
+    def score(self, X, y):
+        return sklearn_metrics.r2_score(y, self.predict(X))
@@ -1,15 +1,44 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
+from modules.aggregates import MonthlyAggregates
+from modules.schema import TRANSACTION_COLUMNS, normalize_transactions, empty_transactions, append_transactions
+from modules.storage import DEFAULT_ALERT_THRESHOLDS
+from modules.sample_data import generate_transactions
+from modules.query import SortedIndex
+from modules.expense_models import IncrementalExpenseModel, fit_forest
+from modules.forecasting import ExponentialSmoothingForecaster
+from modules.reports import ReportGenerator
+from modules.analytics import AnalyticsEngine
+from modules.instrumentation import timed
+from modules.lazy import lazy_import
+import os
+import threading
 import warnings
 warnings.filterwarnings('ignore')
 
+# scikit-learn loads when a model is first fitted or attached
+preprocessing = lazy_import('sklearn.preprocessing')
+model_selection = lazy_import('sklearn.model_selection')
+
 class FinancialManagementAgent:
+    # Date windows whose analytics are kept per revision (see analytics)
+    ANALYTICS_WINDOWS = 8
+    # Rows added one at a time are buffered and merged into the frame once
+    # the buffer reaches this size or an eighth of the frame (see add_transaction)
+    TAIL_MIN_ROWS = 256
+    
     def __init__(self):
-        self.transactions = pd.DataFrame(columns=['Date', 'Description', 'Amount', 'Category', 'Type'])
+        # Store the transactions are read from lazily, if any (see use_store)
+        self._store = None
+        self._store_user = None
+        # Bumped by every change to the transactions
+        self._revision = 0
+        self._load_lock = threading.Lock()
+        # Rows from add_transaction not yet merged into the frame; readers
+        # merge them (under _merge_lock) before touching the frame or indexes
+        self._tail = []
+        self._merge_lock = threading.Lock()
+        self.transactions = empty_transactions()
         self.budget_categories = {
             'Food & Dining': 5000, 
             'Transportation': 3000, 
@@ -30,292 +59,505 @@ class FinancialManagementAgent:
             'Business': 20000,
             'Other Income': 5000
         }
+        # Budget alert levels in percent of a category's monthly budget
+        self.alert_thresholds = list(DEFAULT_ALERT_THRESHOLDS)
+        # Model fitted in this process by build_ml_model (e.g. on a trainer agent)
         self.model = None
-        self.encoder = LabelEncoder()
+        self._encoder = None
+        # Persisted model version attached by ModelRegistry (a ServedModel),
+        # replaced as a whole; predictions prefer it over self.model
+        self.served_model = None
+        self.model_state = None
+        # Forecast method and its fitted state, keyed by revision and settings
+        self.forecaster = ExponentialSmoothingForecaster(os.environ.get('FORECAST_METHOD', 'weighted'))
+        self._forecast_state = None
+        # (revision and budgets, {window: AnalyticsResult}); see analytics
+        self._analytics = None
         
-    def add_transaction(self, date, description, amount, category, transaction_type):
-        """Add a new transaction to the dataset"""
-        new_transaction = pd.DataFrame({
-            'Date': [date],
-            'Description': [description],
-            'Amount': [amount],
-            'Category': [category],
-            'Type': [transaction_type]
-        })
-        self.transactions = pd.concat([self.transactions, new_transaction], ignore_index=True)
-        
-    def generate_sample_data(self, months=3):
-        """Generate sample transaction data for testing with Indian context"""
-        # ... (same as original code)
-        expense_categories = list(self.budget_categories.keys())
-        income_categories = list(self.income_sources.keys())
-        start_date = datetime.now() - timedelta(days=30*months)
-        
-        # Generate expense transactions
-        for i in range(80):
-            date = start_date + timedelta(days=np.random.randint(0, 30*months))
-            category = np.random.choice(expense_categories)
-            
-            # Set appropriate amount ranges for Indian context
-            amount_ranges = {
-                'Food & Dining': (100, 1500),
-                'Transportation': (50, 1000),
-                'Entertainment': (200, 3000),
-                'Utilities': (500, 5000),
-                'Shopping': (300, 8000),
-                'Healthcare': (200, 5000),
-                'Rent': (8000, 15000),
-                'Education': (1000, 10000),
-                'Personal Care': (100, 2000),
-                'Investments': (1000, 10000),
-                'Other': (50, 2000)
-            }
-            
-            min_amt, max_amt = amount_ranges[category]
-            amount = round(np.random.uniform(min_amt, max_amt), 2)
-            
-            descriptions = {
-                'Food & Dining': ['Restaurant', 'Zomato Order', 'Swiggy Order', 'Grocery', 'Street Food', 'Cafe'],
-                'Transportation': ['Petrol', 'Auto Rickshaw', 'Metro', 'Bus', 'Ola', 'Uber', 'Train'],
-                'Entertainment': ['Movie Tickets', 'Netflix', 'Amazon Prime', 'Concert', 'Amusement Park'],
-                'Utilities': ['Electricity Bill', 'Water Bill', 'Internet Bill', 'Mobile Recharge', 'Gas Cylinder'],
-                'Shopping': ['Clothes', 'Electronics', 'Amazon', 'Flipkart', 'Myntra', 'Local Market'],
-                'Healthcare': ['Doctor Visit', 'Medicines', 'Hospital', 'Pharmacy', 'Health Checkup'],
-                'Rent': ['House Rent', 'Maintenance'],
-                'Education': ['School Fees', 'Books', 'Tuition', 'Online Course'],
-                'Personal Care': ['Salon', 'Spa', 'Gym', 'Yoga Class'],
-                'Investments': ['Mutual Funds', 'Stocks', 'Fixed Deposit', 'PPF'],
-                'Other': ['Gift', 'Donation', 'Miscellaneous']
-            }
-            description = np.random.choice(descriptions[category])
-                
-            self.add_transaction(
-                date.strftime('%Y-%m-%d'),
-                description,
-                amount,
-                category,
-                'Expense'
-            )
-        
-        # Generate income transactions
-        for i in range(20):
-            date = start_date + timedelta(days=np.random.randint(0, 30*months))
-            category = np.random.choice(income_categories)
-            
-            amount_ranges = {
-                'Salary': (40000, 80000),
-                'Freelance': (5000, 30000),
-                'Investments': (1000, 10000),
-                'Business': (10000, 50000),
-                'Other Income': (1000, 10000)
-            }
-            
-            min_amt, max_amt = amount_ranges[category]
-            amount = round(np.random.uniform(min_amt, max_amt), 2)
-            
-            descriptions = {
-                'Salary': ['Monthly Salary', 'Paycheck'],
-                'Freelance': ['Freelance Project', 'Consulting'],
-                'Investments': ['Dividends', 'Interest', 'Capital Gains'],
-                'Business': ['Business Revenue', 'Client Payment'],
-                'Other Income': ['Bonus', 'Cashback', 'Rewards']
-            }
-            description = np.random.choice(descriptions[category])
-                
-            self.add_transaction(
-                date.strftime('%Y-%m-%d'),
-                description,
-                amount,
-                category,
-                'Income'
-            )
-    
-    def categorize_expenses(self):
-        """Categorize expenses and return summary"""
-        expenses = self.transactions[self.transactions['Type'] == 'Expense']
-        if expenses.empty:
-            return pd.DataFrame()
-        
-        # Convert date to datetime and extract month
-        expenses['Date'] = pd.to_datetime(expenses['Date'])
-        expenses['Month'] = expenses['Date'].dt.to_period('M')
+    @property
+    def transactions(self):
+        if self._transactions is None:
+            self._load_from_store('_transactions', lambda: self._store.load_transactions(self._store_user))
+        if self._tail:
+            self._merge_tail()
+        return self._transactions
+    
+    @transactions.setter
+    def transactions(self, transactions_df):
+        # Enforce the canonical schema once, at load; replacing the frame
+        # wholesale invalidates the aggregate cube
+        self._transactions = normalize_transactions(transactions_df)
+        self._tail = []
+        self._aggregates = None
+        self._date_index = None
+        self._amount_index = None
+        self._revision += 1
+    
+    @property
+    def model_score(self):
+        return None if self.served_model is None else self.served_model.score
+    
+    @property
+    def model_version(self):
+        return None if self.served_model is None else self.served_model.version
+    
+    @property
+    def encoder(self):
+        """Category LabelEncoder of the current model, created on first use"""
+        if self._encoder is None:
+            self._encoder = preprocessing.LabelEncoder()
+        return self._encoder
+    
+    @encoder.setter
+    def encoder(self, encoder):
+        self._encoder = encoder
+    
+    @property
+    def revision(self):
+        """Counter that changes whenever the transactions change"""
+        return self._revision
+    
+    @property
+    def loaded_transactions(self):
+        """The transactions frame if it is in memory, else None"""
+        if self._transactions is not None and self._tail:
+            self._merge_tail()
+        return self._transactions
+    
+    def loaded_state(self):
+        """(frame, buffered row count) as held in memory right now, without
+        merging the insert buffer; frame is None while rows are not loaded"""
+        with self._merge_lock:
+            return self._transactions, len(self._tail)
+    
+    def use_store(self, store, user_id):
+        """Read transactions from a store lazily. Aggregates and transaction
+        pages are pushed down to the store; rows are only loaded by methods
+        that need all of them, such as model training."""
+        self._store = store
+        self._store_user = user_id
+        self._transactions = None
+        self._tail = []
+        self._aggregates = None
+        self._date_index = None
+        self._amount_index = None
+        self._revision += 1
+    
+    def _load_from_store(self, attribute, loader):
+        """Fill a lazily loaded attribute, reloading if a change landed meanwhile"""
+        while getattr(self, attribute) is None:
+            revision = self._revision
+            value = loader()
+            with self._load_lock:
+                if self._revision == revision and getattr(self, attribute) is None:
+                    setattr(self, attribute, value)
+        return getattr(self, attribute)
+    
+    def has_transactions(self):
+        if self._transactions is not None:
+            return not self._transactions.empty or bool(self._tail)
+        return self.aggregates.count('Expense') + self.aggregates.count('Income') > 0
+    
+    @property
+    def date_index(self):
+        """Row positions sorted by date, maintained incrementally on insert"""
+        if self._tail:
+            self._merge_tail()
+        if self._date_index is None:
+            self._date_index = SortedIndex(self.transactions['Date'].to_numpy().view('i8'))
+        return self._date_index
+    
+    @property
+    def amount_index(self):
+        """Row positions sorted by amount, built on first use and extended by inserts"""
+        if self._tail:
+            self._merge_tail()
+        if self._amount_index is None:
+            self._amount_index = SortedIndex(self.transactions['Amount'].to_numpy())
+        return self._amount_index
+    
+    def _merge_tail(self):
+        """Append the rows buffered by add_transaction to the frame and the
+        date and amount indexes in one step"""
+        with self._merge_lock:
+            if not self._tail:
+                # Another reader merged them while this one waited
+                return
+            batch = pd.DataFrame(self._tail, columns=TRANSACTION_COLUMNS)
+            first_row = len(self._transactions)
+            transactions = append_transactions(self._transactions, batch)
+            if self._date_index is not None:
+                self._date_index.extend(transactions['Date'].to_numpy()[first_row:].view('i8'), first_row)
+            if self._amount_index is not None:
+                self._amount_index.extend(transactions['Amount'].to_numpy()[first_row:], first_row)
+            self._transactions = transactions
+            self._tail = []
+    
+    def _appended(self, batch, first_row):
+        """Keep derived structures in step with rows appended at first_row"""
+        if self._aggregates is not None:
+            self._aggregates.merge(MonthlyAggregates.from_transactions(batch))
+        if self._date_index is not None:
+            self._date_index.extend(batch['Date'].to_numpy().view('i8'), first_row)
+        if self._amount_index is not None:
+            self._amount_index.extend(batch['Amount'].to_numpy(), first_row)
+    
+    def query_transactions(self, query):
+        """Run a TransactionQuery; returns (page DataFrame, next cursor).
         
-        # Group by month and category
-        summary = expenses.groupby(['Month', 'Category'])['Amount'].sum().unstack(fill_value=0)
-        return summary
+        A store-backed agent always pages through the store, even once its
+        rows are loaded, so cursors keep one format for the agent's life.
+        """
+        if self._store is not None:
+            return self._store.query_transactions(self._store_user, query)
+        return query.run(self.transactions, self.date_index, self.amount_index)
     
-    def forecast_budget(self, future_months=3):
-        """Forecast future budget needs based on historical data"""
-        expenses = self.categorize_expenses()
-        if expenses.empty:
-            return pd.DataFrame()
+    @property
+    def aggregates(self):
+        """Monthly (month x category x type) aggregate cube, built on first use"""
+        if self._aggregates is None:
+            if self._transactions is None and self._store is not None:
+                # Computed by the store, without loading any rows
+                self._load_from_store('_aggregates', lambda: self._store.monthly_aggregates(self._store_user))
+            else:
+                self._aggregates = MonthlyAggregates.from_transactions(self.transactions)
+        return self._aggregates
+    
+    def aggregates_between(self, date_from=None, date_to=None):
+        """A copy of the aggregate cube restricted to transactions dated within
+        [date_from, date_to] (either end open when None).
         
-        # Prepare data for forecasting
-        forecast_data = {}
-        for category in expenses.columns:
-            # Use weighted average with more weight to recent months
-            weights = np.arange(1, len(expenses) + 1)
-            weighted_avg = np.average(expenses[category], weights=weights)
-            forecast_data[category] = [weighted_avg] * future_months
+        Whole months come from the maintained cube; only the rows of a
+        partially covered first or last month are read, found by binary
+        search on the date index, so the cost does not grow with the range.
+        """
+        if date_from is None and date_to is None:
+            return self.aggregates.between()
+        if self._transactions is None and self._store is not None:
+            return self._store.monthly_aggregates(self._store_user, date_from, date_to)
         
-        # Create future dates
-        last_month = expenses.index[-1]
-        future_dates = [last_month + i for i in range(1, future_months+1)]
+        date_from = None if date_from is None else pd.Timestamp(date_from).normalize()
+        date_to = None if date_to is None else pd.Timestamp(date_to).normalize()
+        first_month = None if date_from is None else date_from.to_period('M')
+        last_month = None if date_to is None else date_to.to_period('M')
+        edges = []
+        if date_from is not None and date_from != first_month.start_time:
+            month_end = first_month.end_time.normalize()
+            edges.append((date_from, month_end if date_to is None else min(month_end, date_to)))
+            first_month += 1
+        if date_to is not None and date_to != last_month.end_time.normalize() and (
+                first_month is None or last_month >= first_month):
+            month_start = last_month.start_time
+            edges.append((month_start if date_from is None else max(month_start, date_from), date_to))
+            last_month -= 1
         
-        return pd.DataFrame(forecast_data, index=future_dates)
+        if first_month is not None and last_month is not None and first_month > last_month:
+            result = MonthlyAggregates()
+        else:
+            result = self.aggregates.between(first_month, last_month)
+        for low, high in edges:
+            start, stop = self.date_index.bounds(low.value, high.value)
+            rows = self.transactions.take(self.date_index.order[start:stop])
+            result.merge(MonthlyAggregates.from_transactions(rows))
+        return result
     
-    def analyze_savings(self):
-        """Analyze savings patterns and provide insights"""
-        # Calculate monthly income and expenses
-        expenses = self.transactions[self.transactions['Type'] == 'Expense']
-        income = self.transactions[self.transactions['Type'] == 'Income']
+    @timed('agent.add_transaction')
+    def add_transaction(self, date, description, amount, category, transaction_type):
+        """Add a new transaction to the dataset.
         
-        if expenses.empty or income.empty:
-            return "Not enough data for savings analysis"
+        The aggregate cube is updated at once; the row itself is buffered and
+        merged into the frame and indexes by the next read that needs them,
+        or once the buffer grows past TAIL_MIN_ROWS and an eighth of the
+        frame, so a run of inserts costs amortized constant time per row
+        however long the history is.
+        """
+        date, amount = pd.Timestamp(date), float(amount)
+        with self._load_lock:
+            self._revision += 1
+            loaded = self._transactions is not None
+            if loaded:
+                with self._merge_lock:
+                    self._tail.append((date, description, amount, category, transaction_type))
+        # When not loaded, the row is read from the store with the rest when needed
+        if self._aggregates is not None:
+            self._aggregates.add(date, amount, category, transaction_type)
+        if loaded and len(self._tail) >= max(self.TAIL_MIN_ROWS, len(self._transactions) // 8):
+            self._merge_tail()
         
-        expenses['Date'] = pd.to_datetime(expenses['Date'])
-        income['Date'] = pd.to_datetime(income['Date'])
+    def add_transactions(self, transactions_df):
+        """Add a batch of transactions, folding them into the aggregate cube"""
+        batch = normalize_transactions(transactions_df)
+        with self._load_lock:
+            self._revision += 1
+            loaded = self._transactions is not None
+        if not loaded:
+            if self._aggregates is not None:
+                self._aggregates.merge(MonthlyAggregates.from_transactions(batch))
+            return
+        # Buffered single rows come first, keeping insertion order
+        self._merge_tail()
+        first_row = len(self._transactions)
+        self._transactions = append_transactions(self._transactions, batch)
+        self._appended(batch, first_row)
         
-        expenses['Month'] = expenses['Date'].dt.to_period('M')
-        income['Month'] = income['Date'].dt.to_period('M')
+    def merge_aggregates(self, aggregates):
+        """Fold the cube of rows written straight to the store (e.g. a bulk
+        import) into a store-backed agent whose rows are not loaded.
+        Returns False, changing nothing, when the rows are in memory; use
+        add_transactions then."""
+        with self._load_lock:
+            if self._transactions is not None:
+                return False
+            self._revision += 1
+        if self._aggregates is not None:
+            self._aggregates.merge(aggregates)
+        return True
         
-        monthly_expenses = expenses.groupby('Month')['Amount'].sum()
-        monthly_income = income.groupby('Month')['Amount'].sum()
+    def generate_sample_data(self, months=3, rows=100, seed=None):
+        """Generate sample transaction data for testing with Indian context"""
+        sample = generate_transactions(
+            rows=rows,
+            months=months,
+            seed=seed,
+            expense_categories=list(self.budget_categories.keys()),
+            income_categories=list(self.income_sources.keys())
+        )
+        self.transactions = append_transactions(self.transactions, sample)
+    
+    @timed('agent.categorize_expenses')
+    def categorize_expenses(self, date_from=None, date_to=None):
+        """Categorize expenses and return summary, optionally only for
+        transactions dated within [date_from, date_to]"""
+        # Month x category totals are maintained incrementally in the aggregate cube
+        if date_from is None and date_to is None:
+            return self.aggregates.category_matrix('Expense')
+        return self.aggregates_between(date_from, date_to).category_matrix('Expense')
+    
+    @timed('agent.forecast_budget')
+    def forecast_budget(self, future_months=3, date_from=None, date_to=None):
+        """Forecast future budget needs based on historical data"""
+        forecast = self.forecast(future_months, date_from=date_from, date_to=date_to)
+        return pd.DataFrame() if forecast is None else forecast.mean
+    
+    def forecast(self, future_months=3, forecaster=None, date_from=None, date_to=None):
+        """Forecast of monthly expenses per category, with prediction intervals.
         
-        # Calculate savings
-        monthly_savings = monthly_income - monthly_expenses
-        avg_savings = monthly_savings.mean()
-        savings_rate = (avg_savings / monthly_income.mean()) * 100
+        Uses the agent's forecaster (weighted average unless configured
+        otherwise) fitted to the months within [date_from, date_to], or all
+        history; the fitted state is reused until the transactions change.
+        Returns None when there are no expenses.
+        """
+        forecaster = forecaster or self.forecaster
+        key = (self._revision, forecaster.method, forecaster.alpha, forecaster.beta,
+               forecaster.gamma, forecaster.season_length, self._window_key(date_from, date_to))
+        if self._forecast_state is None or self._forecast_state[0] != key:
+            expenses = self.categorize_expenses(date_from, date_to)
+            if expenses.empty:
+                return None
+            self._forecast_state = (key, forecaster.fit(expenses))
+        return forecaster.forecast(self._forecast_state[1], future_months)
+    
+    @staticmethod
+    def _window_key(date_from, date_to):
+        return tuple(None if value is None else pd.Timestamp(value).normalize() for value in (date_from, date_to))
+    
+    def analytics(self, date_from=None, date_to=None):
+        """AnalyticsResult (category matrix, monthly series, totals, budget
+        utilization, top categories) for transactions dated within
+        [date_from, date_to], or all of them. Budgets are compared over the
+        calendar months the window spans (open ends: the months with data).
         
-        # Generate insights
-        insights = []
-        insights.append(f"Average monthly savings: ₹{avg_savings:,.2f}")
-        insights.append(f"Savings rate: {savings_rate:.1f}% of your income")
+        Results for the last few windows are reused until the transactions
+        or the budgets change, so the views that share one compute it once.
+        """
+        key = (self._revision, tuple(self.budget_categories.items()))
+        window = self._window_key(date_from, date_to)
+        with self._load_lock:
+            if self._analytics is None or self._analytics[0] != key:
+                self._analytics = (key, {})
+            results = self._analytics[1]
+            result = results.get(window)
+        if result is not None:
+            return result
         
-        if savings_rate > 20:
-            insights.append("Excellent savings rate! You're on track for financial security.")
-        elif savings_rate > 10:
-            insights.append("Good savings rate. Consider increasing it to 20% for better financial health.")
+        if window == (None, None):
+            result = AnalyticsEngine.compute(self.aggregates, self.budget_categories)
         else:
-            insights.append("Your savings rate is low. Try to reduce unnecessary expenses.")
-            
-        # Identify top spending categories
-        top_categories = expenses.groupby('Category')['Amount'].sum().sort_values(ascending=False)
-        if not top_categories.empty:
-            insights.append(f"Your top spending category is {top_categories.index[0]} (₹{top_categories.iloc[0]:,.2f})")
-            
-            # Suggest ways to reduce spending in top category
-            reduction_tips = {
-                'Food & Dining': "Consider cooking at home more often and limiting restaurant visits to weekends.",
-                'Transportation': "Explore public transport options or carpooling to reduce fuel costs.",
-                'Entertainment': "Look for free or low-cost entertainment options in your community.",
-                'Shopping': "Implement a 24-hour waiting period before making non-essential purchases.",
-                'Rent': "If possible, consider moving to a more affordable area or getting a roommate.",
-                'Utilities': "Turn off appliances when not in use and consider energy-efficient options."
-            }
-            
-            if top_categories.index[0] in reduction_tips:
-                insights.append(f"Tip: {reduction_tips[top_categories.index[0]]}")
+            aggregates = self.aggregates_between(*window)
+            months = AnalyticsEngine.budget_months(
+                aggregates, *(None if value is None else value.to_period('M') for value in window))
+            result = AnalyticsEngine.compute(aggregates, self.budget_categories, months=months)
+        with self._load_lock:
+            if len(results) >= self.ANALYTICS_WINDOWS:
+                results.pop(next(iter(results)))
+            results[window] = result
+        return result
+    
+    @timed('agent.analyze_savings')
+    def analyze_savings(self, date_from=None, date_to=None):
+        """Analyze savings patterns and provide insights"""
+        return self.analytics(date_from, date_to).insights()
+    
+    def transactions_between(self, date_from=None, date_to=None):
+        """Transactions dated within [date_from, date_to] in date order.
         
-        return "\n".join(insights)
+        In-memory rows are selected by binary search on the date index;
+        when rows are read from a store, only the window is loaded.
+        """
+        date_from, date_to = self._window_key(date_from, date_to)
+        if self._transactions is None and self._store is not None:
+            rows = normalize_transactions(self._store.load_transactions(self._store_user, date_from, date_to))
+            return rows.sort_values('Date', kind='stable', ignore_index=True)
+        start, stop = self.date_index.bounds(None if date_from is None else date_from.value,
+                                             None if date_to is None else date_to.value)
+        return self.transactions.take(self.date_index.order[start:stop])
     
-    def build_ml_model(self):
-        """Build a machine learning model for expense prediction"""
+    def _expense_features(self, expenses):
+        """Model features and target for expense rows, with categories encoded"""
+        # Feature engineering on the already-typed Date column
+        dates = expenses['Date'].dt
+        features = pd.DataFrame({
+            'DayOfWeek': dates.dayofweek,
+            'DayOfMonth': dates.day,
+            'Month': dates.month,
+            'IsWeekend': dates.dayofweek.isin([5, 6]).astype(int),
+            # Encode categories
+            'CategoryEncoded': self.encoder.transform(expenses['Category'].astype(object))
+        }, index=expenses.index)
+        return features, expenses['Amount']
+    
+    @timed('model.fit')
+    def build_ml_model(self, kind='forest', n_jobs=None, max_samples=None, time_budget=None):
+        """Build a machine learning model for expense prediction.
+        
+        kind is 'forest' (RandomForestRegressor on n_jobs cores, optionally
+        stopped after time_budget seconds) or 'incremental' (an SGD model that
+        update_ml_model can extend later). max_samples limits the fit to the
+        most recent expenses.
+        """
         expenses = self.transactions[self.transactions['Type'] == 'Expense']
         if expenses.empty or len(expenses) < 20:
             return None
-            
-        # Feature engineering
-        expenses['Date'] = pd.to_datetime(expenses['Date'])
-        expenses['DayOfWeek'] = expenses['Date'].dt.dayofweek
-        expenses['DayOfMonth'] = expenses['Date'].dt.day
-        expenses['Month'] = expenses['Date'].dt.month
-        expenses['IsWeekend'] = expenses['Date'].dt.dayofweek.isin([5, 6]).astype(int)
-        
-        # Encode categories
-        expenses['CategoryEncoded'] = self.encoder.fit_transform(expenses['Category'])
         
-        # Prepare features and target
-        features = expenses[['DayOfWeek', 'DayOfMonth', 'Month', 'IsWeekend', 'CategoryEncoded']]
-        target = expenses['Amount']
+        self.encoder.fit(expenses['Category'].astype(object))
+        if max_samples is not None and len(expenses) > max_samples:
+            expenses = expenses.iloc[-max_samples:]
+        features, target = self._expense_features(expenses)
         
         # Train model
-        X_train, X_test, y_train, y_test = train_test_split(features, target, test_size=0.2, random_state=42)
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.model.fit(X_train, y_train)
+        X_train, X_test, y_train, y_test = model_selection.train_test_split(features, target, test_size=0.2, random_state=42)
+        if kind == 'incremental':
+            self.model = IncrementalExpenseModel(len(self.encoder.classes_))
+            self.model.partial_fit(X_train.to_numpy(), y_train.to_numpy())
+            score = self.model.score(X_test.to_numpy(), y_test.to_numpy())
+            # Then learn from the held-out rows too; later updates start after them
+            self.model.partial_fit(X_test.to_numpy(), y_test.to_numpy())
+            self.model.rows_seen = int((self.transactions['Type'] == 'Expense').sum())
+            return score
         
+        self.model = fit_forest(X_train, y_train, n_jobs=n_jobs, time_budget=time_budget)
         return self.model.score(X_test, y_test)
     
+    @timed('model.partial_fit')
+    def update_ml_model(self):
+        """Train an incremental model on the expenses added since it last saw data.
+        
+        Returns the R² on those new rows, measured before learning from them,
+        or None when there was nothing new.
+        """
+        expenses = self.transactions[self.transactions['Type'] == 'Expense']
+        new_expenses = expenses.iloc[self.model.rows_seen:]
+        if new_expenses.empty:
+            return None
+        features, target = self._expense_features(new_expenses)
+        score = self.model.score(features.to_numpy(), target.to_numpy()) if len(new_expenses) > 1 else None
+        self.model.partial_fit(features.to_numpy(), target.to_numpy())
+        return score
+    
+    @timed('model.predict')
     def predict_expense(self, day_of_week, day_of_month, month, is_weekend, category):
         """Predict expense amount for given parameters"""
-        if self.model is None:
+        # One read, so a model attached meanwhile cannot mix into this prediction
+        served = self.served_model
+        if served is not None:
+            # Persisted models answer from a precomputed table over the feature grid
+            if category not in served.category_codes:
+                return "Category not recognized"
+            if 0 <= day_of_week < 7 and 1 <= day_of_month <= 31 and 1 <= month <= 12 and is_weekend in (0, 1):
+                prediction = served.prediction_table[day_of_week, day_of_month - 1, month - 1,
+                                                     is_weekend, served.category_codes[category]]
+                return round(float(prediction), 2)
+            model, encoder = served.model, served.encoder
+        else:
+            model, encoder = self.model, self._encoder
+        
+        if model is None:
             return "Model not trained yet"
             
         # Encode category
         try:
-            category_encoded = self.encoder.transform([category])[0]
+            category_encoded = encoder.transform([category])[0]
         except:
             return "Category not recognized"
             
         # Make prediction
         features = np.array([[day_of_week, day_of_month, month, is_weekend, category_encoded]])
-        prediction = self.model.predict(features)
+        prediction = model.predict(features)
         
         return round(prediction[0], 2)
     
-    def generate_report(self):
-        """Generate a comprehensive financial report"""
-        report = "FINANCIAL MANAGEMENT REPORT\n"
-        report += "=" * 50 + "\n\n"
+    @timed('model.predict_batch')
+    def predict_expenses(self, date_from, date_to, categories=None):
+        """Predict the expense for every day in [date_from, date_to] and every
+        category (default: all the model knows) in one vectorized step.
         
-        # Expense categorization
-        expense_summary = self.categorize_expenses()
-        if not expense_summary.empty:
-            report += "EXPENSE CATEGORIZATION (Last 3 Months):\n"
-            report += expense_summary.to_string()
-            report += "\n\n"
+        Returns a DataFrame indexed by date with one column per category.
+        Raises ValueError for an empty range, unknown categories or when no
+        model is trained.
+        """
+        dates = pd.date_range(pd.Timestamp(date_from), pd.Timestamp(date_to), freq='D')
+        if dates.empty:
+            raise ValueError('date_to must not be before date_from')
         
-        # Budget forecast
-        forecast = self.forecast_budget()
-        if not forecast.empty:
-            report += "BUDGET FORECAST (Next 3 Months):\n"
-            report += forecast.to_string()
-            report += "\n\n"
+        served = self.served_model
+        if served is not None:
+            known = served.category_codes
+        elif self.model is not None:
+            known = {category: code for code, category in enumerate(self.encoder.classes_)}
+        else:
+            raise ValueError('Model not trained yet')
+        categories = list(known) if categories is None else list(categories)
+        unknown = [category for category in categories if category not in known]
+        if unknown:
+            raise ValueError(f"Category not recognized: {', '.join(map(str, unknown))}")
         
-        # Savings insights
-        savings_insights = self.analyze_savings()
-        report += "SAVINGS INSIGHTS:\n"
-        report += savings_insights
-        report += "\n\n"
+        # One row of date features per day, one column per category
+        day_of_week = dates.dayofweek.to_numpy()[:, None]
+        day_of_month = dates.day.to_numpy()[:, None]
+        month = dates.month.to_numpy()[:, None]
+        is_weekend = (day_of_week >= 5).astype(int)
+        codes = np.array([known[category] for category in categories], dtype=int)[None, :]
         
-        # Budget recommendations
-        expenses = self.transactions[self.transactions['Type'] == 'Expense']
-        if not expenses.empty:
-            category_totals = expenses.groupby('Category')['Amount'].sum()
-            report += "BUDGET RECOMMENDATIONS:\n"
-            for category, budget in self.budget_categories.items():
-                spent = category_totals.get(category, 0)
-                if spent > 0:
-                    percentage = (spent / budget) * 100
-                    report += f"{category}: Budget ₹{budget:,.2f}, Spent ₹{spent:,.2f} ({percentage:.1f}%)\n"
-                    if percentage > 100:
-                        report += f"  - You've exceeded your budget by ₹{spent - budget:,.2f}\n"
-                    elif percentage > 80:
-                        report += f"  - You're close to your budget limit\n"
-                    else:
-                        report += f"  - You're within your budget\n"
-            report += "\n"
+        if served is not None:
+            predictions = served.prediction_table[day_of_week, day_of_month - 1, month - 1, is_weekend, codes]
+        else:
+            shape = (len(dates), len(categories))
+            features = np.column_stack([np.broadcast_to(column, shape).ravel()
+                                        for column in (day_of_week, day_of_month, month, is_weekend, codes)])
+            predictions = self.model.predict(features).reshape(shape)
+        
+        return pd.DataFrame(np.round(predictions, 2), index=dates, columns=categories)
+    
+    @timed('agent.generate_report')
+    def generate_report(self, date_from=None, date_to=None):
+        """Generate a comprehensive financial report as one string.
         
-        return report
+        Use ReportGenerator(agent, date_from, date_to).render(format) to
+        stream it section by section instead, or in another format.
+        """
+        return ''.join(ReportGenerator(self, date_from, date_to).render('text'))
 
-    def get_summary_stats(self):
+    @timed('agent.summary_stats')
+    def get_summary_stats(self, date_from=None, date_to=None):
         """Get summary statistics for dashboard"""
-        total_income = self.transactions[self.transactions['Type'] == 'Income']['Amount'].sum()
-        total_expenses = self.transactions[self.transactions['Type'] == 'Expense']['Amount'].sum()
-        net_savings = total_income - total_expenses
-        
-        return {
-            'total_income': total_income,
-            'total_expenses': total_expenses,
-            'net_savings': net_savings
-        }
\ No newline at end of file
+        return self.analytics(date_from, date_to).summary()
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+from statistics import NormalDist
+
+class ForecastState:
+    """Fitted smoothing state for every column of a (months x categories) matrix.
+
+    Holds only small NumPy arrays, so it can be kept in a cache or pickled
+    and forecast from again without refitting.
+    """
+
+    def __init__(self, method, columns, last_period, level, trend, season, sigma, params):
+        self.method = method
+        self.columns = list(columns)
+        self.last_period = last_period
+        self.level = level
+        self.trend = trend
+        # (season_length, categories) seasonal offsets, next season first; None without seasonality
+        self.season = season
+        # Standard deviation of the in-sample one-step-ahead errors per column
+        self.sigma = sigma
+        self.params = params
+
+class Forecast:
+    """Point forecast with lower and upper prediction bounds, one row per future month"""
+
+    def __init__(self, mean, lower, upper, confidence):
+        self.mean = mean
+        self.lower = lower
+        self.upper = upper
+        self.confidence = confidence
+
+class ExponentialSmoothingForecaster:
+    """Forecast every category of a monthly matrix at once.
+
+    Methods:
+      'weighted'      flat forecast at the linearly weighted average of the
+                      history (recent months count more), as forecast_budget
+                      has always produced
+      'holt'          additive level and trend (Holt's linear method)
+      'holt_winters'  level, trend and additive seasonality of
+                      ``season_length`` months; falls back to 'holt' when
+                      there are fewer than two full seasons
+
+    Smoothing runs once per month with each step a vector operation across
+    all columns, so the cost grows with history length, not category count.
+    Prediction intervals assume normally distributed one-step errors; the
+    forecast and its bounds are clipped at zero.
+    """
+
+    METHODS = ('weighted', 'holt', 'holt_winters')
+
+    def __init__(self, method='weighted', alpha=0.5, beta=0.1, gamma=0.1, season_length=12, confidence=0.95):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown forecast method '{method}'")
+        self.method = method
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.season_length = season_length
+        self.confidence = confidence
+
+    def fit(self, history):
+        """Fit a DataFrame indexed by month Period, one column per category"""
+        # Column-major so each category reduces like the 1-D per-category sums did
+        values = np.asfortranarray(history.to_numpy(dtype=np.float64))
+        params = {'alpha': self.alpha, 'beta': self.beta, 'gamma': self.gamma,
+                  'season_length': self.season_length}
+        if self.method == 'weighted':
+            weights = np.arange(1, len(values) + 1, dtype=np.float64)
+            level = np.average(values, axis=0, weights=weights)
+            variance = np.average((values - level) ** 2, axis=0, weights=weights)
+            return ForecastState('weighted', history.columns, history.index[-1], level,
+                                 np.zeros_like(level), None, np.sqrt(variance), params)
+
+        seasonal = self.method == 'holt_winters' and len(values) >= 2 * self.season_length
+        level, trend, season, errors = self._smooth(values, seasonal)
+        sigma = np.sqrt((errors ** 2).mean(axis=0)) if len(errors) else np.zeros(values.shape[1])
+        return ForecastState('holt_winters' if seasonal else 'holt', history.columns, history.index[-1],
+                             level, trend, season, sigma, params)
+
+    def _smooth(self, values, seasonal):
+        alpha, beta, gamma, m = self.alpha, self.beta, self.gamma, self.season_length
+        if seasonal:
+            first, second = values[:m].mean(axis=0), values[m:2 * m].mean(axis=0)
+            level = first
+            trend = (second - first) / m
+            season = values[:m] - first
+            start = m
+        elif len(values) > 1:
+            level = values[1]
+            trend = values[1] - values[0]
+            season = None
+            start = 2
+        else:
+            level = values[0]
+            trend = np.zeros(values.shape[1])
+            season = None
+            start = 1
+
+        errors = []
+        for t in range(start, len(values)):
+            offset = season[t % m] if seasonal else 0.0
+            errors.append(values[t] - (level + trend + offset))
+            previous_level = level
+            level = alpha * (values[t] - offset) + (1 - alpha) * (level + trend)
+            trend = beta * (level - previous_level) + (1 - beta) * trend
+            if seasonal:
+                season[t % m] = gamma * (values[t] - level) + (1 - gamma) * offset
+        if seasonal:
+            # Rotate so row 0 is the season of the first forecast month
+            season = np.roll(season, -(len(values) % m), axis=0)
+        return level, trend, season, np.array(errors).reshape(-1, values.shape[1])
+
+    def forecast(self, state, horizon=3):
+        """Forecast ``horizon`` months after the fitted history"""
+        steps = np.arange(1, horizon + 1)[:, None]
+        mean = state.level + steps * state.trend
+        if state.season is not None:
+            mean = mean + state.season[(steps[:, 0] - 1) % len(state.season)]
+        # Expenses cannot go negative, however steep the fitted downtrend
+        mean = np.maximum(mean, 0)
+
+        if state.method == 'weighted':
+            spread = np.ones((horizon, 1))
+        else:
+            # Error variance multiplier for h steps ahead (additive Holt / Holt-Winters)
+            alpha, beta, gamma = state.params['alpha'], state.params['beta'], state.params['gamma']
+            m = state.params['season_length']
+            lags = np.arange(1, horizon)
+            coefficients = alpha * (1 + lags * beta)
+            if state.season is not None:
+                coefficients = coefficients + gamma * (1 - alpha) * (lags % m == 0)
+            spread = np.sqrt(1 + np.concatenate([[0.0], np.cumsum(coefficients ** 2)]))[:, None]
+
+        z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        half_width = z * spread * state.sigma
+        index = [state.last_period + i for i in range(1, horizon + 1)]
+
+        def frame(values):
+            return pd.DataFrame(values, index=index, columns=state.columns)
+
+        return Forecast(frame(mean), frame(np.maximum(mean - half_width, 0)),
+                        frame(mean + half_width), self.confidence)
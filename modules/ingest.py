@@ -0,0 +1,159 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+from modules.schema import TRANSACTION_COLUMNS, normalize_transactions
+
+class TransactionImporter:
+    """Streams bulk transaction uploads into storage in bounded memory.
+
+    Input is read in batches of ``chunk_rows``; each batch is validated and
+    normalized against the user's budget categories and income sources,
+    appended to a staging file and handed to ``on_batch``. The staging file
+    is published as a single log segment only once the whole input has been
+    read, so an upload either lands completely or not at all; ``commit``
+    (default: the storage's commit_import) lets the caller publish it under
+    its own locks, e.g. while folding the batches into a cached agent.
+    """
+
+    CHUNK_ROWS = 50000
+    MAX_ERROR_SAMPLES = 20
+    # Set on placeholder rows for input lines that could not be parsed
+    PARSE_ERROR_COLUMN = '_error'
+
+    TYPE_ALIASES = {
+        'expense': 'Expense', 'debit': 'Expense', 'dr': 'Expense', 'withdrawal': 'Expense',
+        'income': 'Income', 'credit': 'Income', 'cr': 'Income', 'deposit': 'Income'
+    }
+    # Expenses / income in categories the user has not configured fall back here
+    FALLBACK_CATEGORIES = {'Expense': 'Other', 'Income': 'Other Income'}
+
+    def __init__(self, storage, budget_categories, income_sources, chunk_rows=None):
+        self.storage = storage
+        self.chunk_rows = chunk_rows or self.CHUNK_ROWS
+        self.categories = {
+            'Expense': {str(name).lower(): name for name in budget_categories},
+            'Income': {str(name).lower(): name for name in income_sources}
+        }
+
+    def import_csv(self, stream, user_id='default', on_batch=None, commit=None):
+        """Import a CSV file-like object with a header row"""
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='') if self._is_binary(stream) else stream
+        batches = pd.read_csv(text, chunksize=self.chunk_rows, dtype=str, keep_default_na=False,
+                              skipinitialspace=True)
+        return self._run(batches, user_id, on_batch, commit)
+
+    def import_jsonl(self, stream, user_id='default', on_batch=None, commit=None):
+        """Import a JSON-lines body with one transaction object per line"""
+        return self._run(self._jsonl_batches(stream), user_id, on_batch, commit)
+
+    @staticmethod
+    def _is_binary(stream):
+        return not isinstance(stream, io.TextIOBase)
+
+    def _jsonl_batches(self, stream):
+        records = []
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                # Kept as a placeholder so the line is rejected with a row error
+                record = {'date': '', 'amount': '', self.PARSE_ERROR_COLUMN: 'malformed JSON line'}
+            records.append(record)
+            if len(records) >= self.chunk_rows:
+                yield pd.DataFrame.from_records(records)
+                records = []
+        if records:
+            yield pd.DataFrame.from_records(records)
+
+    def _run(self, batches, user_id, on_batch, commit=None):
+        staging_path = self.storage.stage_import(user_id)
+        result = {'imported': 0, 'rejected': 0, 'errors': []}
+        row_offset = 0
+        try:
+            for raw in batches:
+                batch, rejected, errors = self.normalize_batch(raw, row_offset)
+                row_offset += len(raw)
+                result['rejected'] += rejected
+                room = self.MAX_ERROR_SAMPLES - len(result['errors'])
+                result['errors'].extend(errors[:room])
+                if batch.empty:
+                    continue
+                self.storage.write_staged(staging_path, batch)
+                result['imported'] += len(batch)
+                if on_batch is not None:
+                    on_batch(batch)
+            if result['imported'] == 0:
+                self.storage.discard_import(staging_path)
+                return result
+            if commit is None:
+                result['segment'] = self.storage.commit_import(staging_path, user_id)
+            else:
+                result['segment'] = commit(staging_path)
+            return result
+        except Exception:
+            self.storage.discard_import(staging_path)
+            raise
+
+    def normalize_batch(self, raw, row_offset=0):
+        """Validate a raw batch; returns (canonical frame of valid rows,
+        number of rejected rows, sample of row errors)"""
+        raw = raw.rename(columns=lambda column: str(column).strip().lower())
+        missing = [column for column in ('date', 'amount') if column not in raw.columns]
+        if missing:
+            raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+        def column(name, default=''):
+            if name in raw.columns:
+                return raw[name].fillna(default).astype(str).str.strip()
+            return pd.Series(default, index=raw.index, dtype=object)
+
+        raw_dates = column('date')
+        dates = pd.to_datetime(raw_dates, errors='coerce', format='ISO8601')
+        unparsed = dates.isna() & (raw_dates != '')
+        if unparsed.any():
+            # Bank statements are not always ISO formatted; parse the rest row by row
+            dates[unparsed] = pd.to_datetime(raw_dates[unparsed], errors='coerce', format='mixed', dayfirst=True)
+        amounts = pd.to_numeric(column('amount').str.replace(r'[₹,\s]', '', regex=True), errors='coerce')
+
+        # Signed bank-statement amounts decide the type when none is given
+        types = column('type').str.lower().map(self.TYPE_ALIASES)
+        types = types.where(types.notna() | amounts.isna(), np.where(amounts < 0, 'Expense', 'Income'))
+        amounts = amounts.abs()
+
+        categories = pd.Series(None, index=raw.index, dtype=object)
+        raw_categories = column('category').str.lower()
+        for transaction_type, known in self.categories.items():
+            is_type = types == transaction_type
+            mapped = raw_categories[is_type].map(known)
+            fallback = self.FALLBACK_CATEGORIES[transaction_type]
+            if fallback in known.values():
+                mapped = mapped.fillna(fallback)
+            categories[is_type] = mapped
+
+        reasons = pd.Series(None, index=raw.index, dtype=object)
+        reasons[categories.isna()] = 'unknown category'
+        reasons[types.isna()] = 'unknown type'
+        reasons[amounts.isna()] = 'invalid amount'
+        reasons[dates.isna()] = 'invalid date'
+        if self.PARSE_ERROR_COLUMN in raw.columns:
+            unparsable = raw[self.PARSE_ERROR_COLUMN].notna()
+            reasons[unparsable] = raw[self.PARSE_ERROR_COLUMN][unparsable]
+        invalid = reasons.notna()
+        errors = [{'row': row_offset + int(position) + 1, 'error': reasons.iloc[position]}
+                  for position in np.flatnonzero(invalid.to_numpy())[:self.MAX_ERROR_SAMPLES]]
+
+        valid = ~invalid
+        batch = pd.DataFrame({
+            'Date': dates[valid],
+            'Description': column('description')[valid],
+            'Amount': amounts[valid],
+            'Category': categories[valid],
+            'Type': types[valid]
+        }, columns=TRANSACTION_COLUMNS)
+        return normalize_transactions(batch), int(invalid.sum()), errors
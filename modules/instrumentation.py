@@ -0,0 +1,254 @@
+import os
+import sys
+import time
+import math
+import bisect
+import random
+import cProfile
+import threading
+import functools
+import contextvars
+from collections import Counter
+
+# Seconds; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+class MetricsRegistry:
+    """Thread-safe histograms rendered in the Prometheus text exposition format"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][position] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self, name):
+        """{labels: (count, sum)} for one histogram"""
+        with self._lock:
+            return {key: (entry[2], entry[1]) for key, entry in self._histograms.get(name, {}).items()}
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, (counts, total, count) in sorted(series.items()):
+                    labels = ','.join(f'{label}="{_escape_label(value)}"' for label, value in key)
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets, counts):
+                        cumulative += bucket_count
+                        le = '+Inf' if bound == math.inf else repr(bound)
+                        bucket_labels = f'{labels},le="{le}"' if labels else f'le="{le}"'
+                        lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+                    suffix = f"{{{labels}}}" if labels else ''
+                    lines.append(f"{name}_sum{suffix} {total!r}")
+                    lines.append(f"{name}_count{suffix} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = MetricsRegistry()
+metrics.describe('fma_request_duration_seconds', 'Request latency by route, method and status')
+metrics.describe('fma_stage_duration_seconds', 'Time spent in instrumented stages (storage, agent, model, chart)')
+
+# Spans recorded during the current request, or None outside a request
+_request_spans = contextvars.ContextVar('request_spans', default=None)
+
+class span:
+    """Time a named stage, e.g. ``with span('storage.load'):``.
+
+    Every span feeds the stage histogram; inside a request it is also
+    reported in that response's Server-Timing header.
+    """
+
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self.start
+        metrics.observe('fma_stage_duration_seconds', elapsed, stage=self.stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((self.stage, elapsed))
+        return False
+
+def timed(stage):
+    """Decorator form of span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def server_timing(spans, total=None):
+    """Server-Timing header value, summing repeated stages"""
+    durations = {}
+    for stage, elapsed in spans:
+        durations[stage] = durations.get(stage, 0.0) + elapsed
+    parts = [f"{stage};dur={elapsed * 1000:.2f}" for stage, elapsed in durations.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(parts)
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval from a helper thread.
+
+    The result is a Counter of collapsed stacks ("outer;inner;leaf" -> samples),
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    @staticmethod
+    def write_collapsed(samples, file_path):
+        with open(file_path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+class RequestInstrumentation:
+    """Per-request timing, Server-Timing headers, the /metrics endpoint and an
+    opt-in profiler for slow requests.
+
+    Profiling is off unless ``profile_mode`` is 'sampling' (collapsed stacks,
+    .folded) or 'cprofile' (.pstats). A ``profile_rate`` fraction of requests
+    is profiled and a dump is written to ``profile_dir`` only when the request
+    took at least ``slow_ms`` milliseconds.
+    """
+
+    def __init__(self, app=None, registry=None, profile_mode=None, profile_rate=None, slow_ms=None,
+                 profile_dir=None, sample_interval_ms=None):
+        self.registry = registry or metrics
+        self.profile_mode = (profile_mode if profile_mode is not None
+                             else os.environ.get('PROFILE_MODE', '')).lower() or None
+        if self.profile_mode not in (None, 'sampling', 'cprofile'):
+            raise ValueError(f"Unknown profile mode '{self.profile_mode}'")
+        self.profile_rate = profile_rate if profile_rate is not None else float(
+            os.environ.get('PROFILE_SAMPLE_RATE', 1.0))
+        self.slow_ms = slow_ms if slow_ms is not None else float(os.environ.get('PROFILE_SLOW_MS', 500))
+        self.profile_dir = profile_dir or os.environ.get('PROFILE_DIR', os.path.join('data', 'profiles'))
+        self.sample_interval = (sample_interval_ms if sample_interval_ms is not None else float(
+            os.environ.get('PROFILE_INTERVAL_MS', 5))) / 1000
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from flask import g, request
+
+        @app.before_request
+        def start_request():
+            g.instrumentation_start = time.perf_counter()
+            g.instrumentation_spans = []
+            g.instrumentation_token = _request_spans.set(g.instrumentation_spans)
+            g.instrumentation_profiler = self._start_profiler()
+
+        @app.after_request
+        def finish_request(response):
+            start = g.pop('instrumentation_start', None)
+            if start is None:
+                return response
+            elapsed = time.perf_counter() - start
+            spans = g.pop('instrumentation_spans')
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            self.registry.observe('fma_request_duration_seconds', elapsed,
+                                  route=route, method=request.method, status=response.status_code)
+            response.headers['Server-Timing'] = server_timing(spans, elapsed)
+            profiler = g.pop('instrumentation_profiler', None)
+            if profiler is not None:
+                self._finish_profiler(profiler, route, elapsed)
+            return response
+
+        @app.teardown_request
+        def end_request(exc):
+            # Also runs when after_request was skipped by an unhandled error
+            token = g.pop('instrumentation_token', None)
+            if token is not None:
+                _request_spans.reset(token)
+            profiler = g.pop('instrumentation_profiler', None)
+            if isinstance(profiler, SamplingProfiler):
+                profiler.stop()
+            elif profiler is not None:
+                profiler.disable()
+
+        @app.route('/metrics')
+        def prometheus_metrics():
+            return app.response_class(self.registry.render(), mimetype='text/plain; version=0.0.4')
+
+    def _start_profiler(self):
+        if self.profile_mode is None or random.random() >= self.profile_rate:
+            return None
+        if self.profile_mode == 'sampling':
+            return SamplingProfiler(threading.get_ident(), self.sample_interval).start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _finish_profiler(self, profiler, route, elapsed):
+        if isinstance(profiler, SamplingProfiler):
+            samples = profiler.stop()
+        else:
+            profiler.disable()
+        if elapsed * 1000 < self.slow_ms:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = route.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root'
+        stem = os.path.join(self.profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}_{name}_{elapsed * 1000:.0f}ms")
+        if isinstance(profiler, SamplingProfiler):
+            SamplingProfiler.write_collapsed(samples, stem + '.folded')
+        else:
+            profiler.dump_stats(stem + '.pstats')
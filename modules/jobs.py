@@ -0,0 +1,187 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, CancelledError
+from concurrent.futures.process import BrokenProcessPool
+from modules.instrumentation import metrics
+
+metrics.describe('fma_job_duration_seconds', 'Background job run time from submission to completion, by kind')
+
+class JobLimitExceeded(Exception):
+    """The user already has the maximum number of unfinished jobs"""
+
+class Job:
+    """One unit of background work submitted to a JobRunner"""
+
+    def __init__(self, user_id, kind, key=None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.kind = kind
+        # Identifies the input, e.g. a data version; equal submissions share a job
+        self.key = key
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self._future = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    @property
+    def status(self):
+        if self._done.is_set():
+            return 'failed' if self.error is not None else 'done'
+        if self._future is not None and self._future.running():
+            return 'running'
+        return 'queued'
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns whether it did"""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'finished_at': self.finished_at,
+            'error': self.error
+        }
+
+class JobRunner:
+    """Runs slow work off the request thread and keeps the outcome for polling.
+
+    CPU-bound jobs (model fits) go to a process pool so they neither hold the
+    GIL against request threads nor share a core with them; lighter jobs run
+    on a small thread pool. Each user may have at most ``per_user`` unfinished
+    jobs, so one heavy user cannot occupy every worker, and resubmitting a
+    job with the same kind and key while it is unfinished returns that job.
+
+    Jobs live in this process only: with several server processes, poll the
+    process that accepted the job.
+    """
+
+    def __init__(self, workers=None, threads=None, per_user=None, keep=256):
+        self.workers = workers or int(os.environ.get('JOB_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+        self.per_user = per_user or int(os.environ.get('JOB_USER_LIMIT', 2))
+        self.keep = keep
+        self._threads = ThreadPoolExecutor(threads or int(os.environ.get('JOB_THREADS', 4)),
+                                           thread_name_prefix='job')
+        # Created on first use; spawned rather than forked from a threaded server
+        self._processes = None
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, kind, fn, *args, key=None, process=False, on_done=None):
+        """Run fn(*args) in the background and return its Job.
+
+        fn must be a module-level function when process=True. on_done(result)
+        runs in this process after a successful run; if it raises, the job
+        fails with that error.
+        """
+        with self._lock:
+            active = self._active.setdefault(user_id, [])
+            for job in active:
+                if job.kind == kind and job.key == key:
+                    return job
+            if len(active) >= self.per_user:
+                raise JobLimitExceeded(f"User '{user_id}' already has {len(active)} unfinished job(s)")
+            job = Job(user_id, kind, key)
+            active.append(job)
+            self._jobs[job.id] = job
+            self._trim()
+            if process and self._processes is None:
+                self._processes = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            executor = self._processes if process else self._threads
+        try:
+            job._future = executor.submit(fn, *args)
+        except Exception as e:
+            self._finish(job, None, e)
+            raise
+        job._future.add_done_callback(lambda future: self._complete(job, future, on_done, executor))
+        return job
+
+    def _complete(self, job, future, on_done, executor):
+        result, error = None, None
+        try:
+            result = future.result()
+            if on_done is not None:
+                on_done(result)
+        except CancelledError:
+            error = CancelledError('Job was cancelled')
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory); start a fresh pool next time
+            self._discard_processes(executor)
+            error = e
+        except Exception as e:
+            error = e
+        self._finish(job, result, error)
+
+    def _discard_processes(self, executor):
+        with self._lock:
+            if self._processes is not executor:
+                return
+            self._processes = None
+        executor.shutdown(wait=False)
+
+    def _finish(self, job, result, error):
+        with self._lock:
+            job.result = result if error is None else None
+            job.error = None if error is None else (str(error) or type(error).__name__)
+            job.finished_at = time.time()
+            active = self._active.get(job.user_id, [])
+            if job in active:
+                active.remove(job)
+            if not active:
+                self._active.pop(job.user_id, None)
+            if error is None:
+                self._latest[(job.user_id, job.kind)] = job
+        metrics.observe('fma_job_duration_seconds', job.finished_at - job.submitted_at, kind=job.kind)
+        job._done.set()
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond ``keep``; latest results stay"""
+        excess = len(self._jobs) - self.keep
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active(self, user_id, kind):
+        """The user's unfinished job of this kind, or None"""
+        with self._lock:
+            for job in self._active.get(user_id, []):
+                if job.kind == kind:
+                    return job
+        return None
+
+    def latest(self, user_id, kind):
+        """The user's most recent successful job of this kind, or None"""
+        with self._lock:
+            return self._latest.get((user_id, kind))
+
+    def forget(self, user_id):
+        """Drop the last-known results for a user, e.g. after their data is cleared"""
+        with self._lock:
+            for key in [key for key in self._latest if key[0] == user_id]:
+                del self._latest[key]
+
+    def shutdown(self, wait=True):
+        self._threads.shutdown(wait=wait)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)
@@ -0,0 +1,56 @@
+import importlib
+import threading
+
+# Every module handed out by lazy_import, for preload()
+_registry = {}
+_registry_lock = threading.Lock()
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    ``go = lazy_import('plotly.graph_objects')`` at module level costs
+    nothing; the first ``go.Figure`` imports plotly, and later lookups go
+    straight to the real module.
+    """
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            # importlib serializes concurrent first imports of the same module
+            module = self.__dict__['_module'] = importlib.import_module(self.__dict__['_name'])
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+def lazy_import(name):
+    """A LazyModule for ``name``, shared by every caller"""
+    with _registry_lock:
+        module = _registry.get(name)
+        if module is None:
+            module = _registry[name] = LazyModule(name)
+        return module
+
+def preload():
+    """Import every lazily imported module now.
+
+    Call this in a pre-fork server's master process (e.g. gunicorn with
+    --preload, or PRELOAD_MODULES=1) so forked workers share the imported
+    code copy-on-write instead of each importing it on first request.
+    """
+    with _registry_lock:
+        modules = list(_registry.values())
+    for module in modules:
+        module._load()
+    return [module.__dict__['_name'] for module in modules]
@@ -0,0 +1,155 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+class ReadWriteLock:
+    """Readers-writer lock, optionally backed by an flock() on ``lock_path``.
+
+    Any number of threads may hold the read side at once; the write side is
+    exclusive and re-entrant, and a thread holding it may also read. Waiting
+    writers block new readers so writes are not starved. With a lock file,
+    the first reader in this process takes a shared flock and the writer an
+    exclusive one, extending the same guarantees across worker processes.
+    """
+
+    def __init__(self, lock_path=None):
+        self.lock_path = lock_path
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+        self._fd = None
+
+    def _lock_file(self, exclusive):
+        if self.lock_path is None or fcntl is None:
+            return
+        if self._fd is None:
+            self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def _unlock_file(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        held = getattr(self._local, 'reads', 0)
+        with self._cond:
+            if self._writer == me or held:
+                # Nested inside this thread's own write or read section
+                self._local.reads = held + 1
+                if self._writer == me:
+                    self._write_depth += 1
+                else:
+                    self._readers += 1
+                return
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            if self._readers == 0:
+                self._lock_file(exclusive=False)
+            self._readers += 1
+            self._local.reads = 1
+
+    def release_read(self):
+        with self._cond:
+            self._local.reads -= 1
+            if self._writer == threading.get_ident():
+                self._write_depth -= 1
+                return
+            self._readers -= 1
+            if self._readers == 0:
+                self._unlock_file()
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            if getattr(self._local, 'reads', 0):
+                raise RuntimeError('Cannot upgrade a read lock to a write lock')
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+        try:
+            # Outside the condition so local readers queue on it, not on flock
+            self._lock_file(exclusive=True)
+        except BaseException:
+            self.release_write()
+            raise
+
+    def release_write(self):
+        with self._cond:
+            self._write_depth -= 1
+            if self._write_depth:
+                return
+            self._unlock_file()
+            self._writer = None
+            self._cond.notify_all()
+
+    def close(self):
+        """Close the lock file handle; returns False (and keeps it) while the lock is held"""
+        with self._cond:
+            if self._readers or self._writer is not None or self._writers_waiting:
+                return False
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            return True
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield self
+        finally:
+            self.release_write()
+
+class LockTable:
+    """One ReadWriteLock per key, created on first use"""
+
+    def __init__(self, lock_path=None):
+        # Callable mapping a key to its lock file path, or None for in-process locks
+        self.lock_path = lock_path
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = ReadWriteLock(self.lock_path(key) if self.lock_path else None)
+            return lock
+
+    def discard(self, key):
+        """Forget a key's lock and close its file handle, unless it is held.
+
+        For processes that touch many keys once each (batch jobs); a lock
+        discarded while another thread still holds a reference to it no
+        longer excludes that thread.
+        """
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is not None and lock.close():
+                del self._locks[key]
@@ -0,0 +1,333 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import weakref
+import numpy as np
+from modules.instrumentation import timed
+from modules.jobs import JobLimitExceeded
+from modules.lazy import lazy_import
+
+joblib = lazy_import('joblib')
+preprocessing = lazy_import('sklearn.preprocessing')
+
+class ModelNotReady(Exception):
+    """The first model for a user is still being fitted; ``job`` is the fit"""
+
+    def __init__(self, job):
+        super().__init__('The expense model is still being trained; try again shortly')
+        self.job = job
+
+class ServedModel:
+    """One persisted model version as an agent serves it: category encoder
+    and codes, the memory-mapped prediction table, score and version, and
+    the pickled model, loaded on first need.
+
+    ModelRegistry.attach builds a complete ServedModel and swaps it into
+    the agent as one attribute, so a request reading it while a background
+    fit lands sees either the old version or the new one, never a mix.
+    """
+
+    def __init__(self, encoder, prediction_table, score, version, model_path, model=None):
+        self.encoder = encoder
+        self.category_codes = {category: code for code, category in enumerate(encoder.classes_)}
+        self.prediction_table = prediction_table
+        self.score = score
+        self.version = version
+        self.model_path = model_path
+        self._model = model
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = joblib.load(self.model_path, mmap_mode='r')
+        return self._model
+
+class ModelRegistry:
+    """Persisted, versioned expense-prediction models, one per user.
+
+    A trained model is stored with the fingerprint of the expense data it was
+    fitted on. Because every model feature is a small integer, the registry
+    also stores the model's prediction for every (day_of_week, day_of_month,
+    month, is_weekend, category) combination as a .npy table; predictions are
+    served from a memory-mapped view of that table and the pickled model is
+    only loaded for inputs outside the grid.
+    """
+
+    TABLE_SHAPE = (7, 31, 12, 2)
+    # Versions kept behind the newest for agents (possibly in other server
+    # processes) that still serve them and have not re-attached yet
+    KEEP_PREVIOUS = 1
+
+    def __init__(self, model_dir='data/models', retrain_fraction=0.1, min_new_rows=20, runner=None,
+                 model_kind=None, n_jobs=None, max_samples=None, time_budget=None, wait_timeout=None):
+        self.model_dir = model_dir
+        # 'forest' refits a random forest on every retrain; 'incremental' keeps
+        # an SGD model and trains it on the new expenses only
+        self.model_kind = model_kind or os.environ.get('MODEL_KIND', 'forest')
+        # Cores per fit (-1 = all; unset, an even share per JobRunner worker
+        # process, or all cores without a runner), cap on the most recent
+        # expenses fitted on, and seconds after which a forest stops adding trees
+        self.n_jobs = n_jobs or _env_number('MODEL_N_JOBS', int)
+        self.max_samples = max_samples or _env_number('MODEL_MAX_SAMPLES', int)
+        self.time_budget = time_budget or _env_number('MODEL_TIME_BUDGET', float)
+        # JobRunner for background fits; None fits on a plain thread
+        self.runner = runner
+        # Longest a request waits for a user's first model before getting a 202
+        self.wait_timeout = wait_timeout if wait_timeout is not None else float(
+            os.environ.get('MODEL_WAIT_SECONDS', 10))
+        self.retrain_fraction = retrain_fraction
+        self.min_new_rows = min_new_rows
+        os.makedirs(model_dir, exist_ok=True)
+        self._training = set()
+        # user_id -> ServedModels attached in this process and still alive
+        self._served = {}
+        self._lock = threading.Lock()
+
+    def _meta_path(self, user_id):
+        return os.path.join(self.model_dir, f'{user_id}_expense_model.json')
+
+    def _model_path(self, user_id, version):
+        return os.path.join(self.model_dir, f'{user_id}_expense_model.v{version}.joblib')
+
+    def _table_path(self, user_id, version):
+        return os.path.join(self.model_dir, f'{user_id}_expense_predictions.v{version}.npy')
+
+    @staticmethod
+    def fingerprint(aggregates):
+        """Summary of the expense data a model depends on, read from the aggregate cube"""
+        rows = aggregates.count('Expense')
+        categories = sorted(str(category) for category in aggregates.categories('Expense'))
+        amount_sum = round(float(aggregates.total('Expense')), 2)
+        digest = hashlib.sha1(json.dumps([rows, amount_sum, categories]).encode('utf-8')).hexdigest()
+        return {'rows': rows, 'amount_sum': amount_sum, 'categories': categories, 'digest': digest}
+
+    def needs_retrain(self, meta, fingerprint):
+        """Whether the data has drifted enough from what the model was trained on"""
+        if meta is None:
+            return True
+        trained = meta['fingerprint']
+        if trained['digest'] == fingerprint['digest']:
+            return False
+        if not set(fingerprint['categories']) <= set(trained['categories']):
+            return True
+        changed_rows = abs(fingerprint['rows'] - trained['rows'])
+        return changed_rows >= max(self.min_new_rows, self.retrain_fraction * trained['rows'])
+
+    def load_meta(self, user_id):
+        file_path = self._meta_path(user_id)
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as f:
+                return json.load(f)
+        return None
+
+    @timed('model.load')
+    def attach(self, agent, user_id, meta, model=None):
+        """Point an agent at a persisted model version, without loading the
+        pickle unless the fitted ``model`` is passed in"""
+        encoder = preprocessing.LabelEncoder()
+        encoder.classes_ = np.array(meta['categories'], dtype=object)
+        served = ServedModel(
+            encoder,
+            np.load(self._table_path(user_id, meta['version']), mmap_mode='r'),
+            meta['score'],
+            meta['version'],
+            self._model_path(user_id, meta['version']),
+            model
+        )
+        agent.served_model = served
+        with self._lock:
+            self._served.setdefault(user_id, weakref.WeakSet()).add(served)
+        self._prune(user_id, meta['version'])
+
+    @timed('model.train')
+    def train(self, agent, user_id):
+        """Fit a model on the agent's current data and persist it as a new version"""
+        meta, model = self._fit(agent.transactions, user_id)
+        if meta is None:
+            return None
+        self.attach(agent, user_id, meta, model)
+        return meta
+
+    @property
+    def training_options(self):
+        """Constructor arguments that reproduce this registry's training settings"""
+        return {'model_kind': self.model_kind, 'n_jobs': self.fit_cores(),
+                'max_samples': self.max_samples, 'time_budget': self.time_budget}
+
+    def fit_cores(self):
+        """Cores one fit may use. Each of the runner's worker processes gets an
+        even share, so concurrent fits do not oversubscribe the machine"""
+        if self.n_jobs:
+            return self.n_jobs
+        if self.runner is None:
+            return -1
+        return max(1, (os.cpu_count() or 1) // self.runner.workers)
+
+    def can_update(self, meta, fingerprint):
+        """Whether the persisted model can learn the new expenses without a refit"""
+        return (self.model_kind == 'incremental' and meta is not None
+                and meta.get('kind') == 'incremental'
+                and set(fingerprint['categories']) == set(meta['categories'])
+                and fingerprint['rows'] >= meta['fingerprint']['rows'])
+
+    def _fit(self, transactions, user_id):
+        """Fit and persist a new model version; returns (meta, model) or (None, None)"""
+        from modules.financial_agent import FinancialManagementAgent
+        # Fit on a scratch agent so requests keep using the attached model meanwhile
+        trainer = FinancialManagementAgent()
+        trainer.transactions = transactions
+        fingerprint = self.fingerprint(trainer.aggregates)
+        previous = self.load_meta(user_id)
+        if self.can_update(previous, fingerprint):
+            trainer.model = joblib.load(self._model_path(user_id, previous['version']))
+            trainer.encoder.classes_ = np.array(previous['categories'], dtype=object)
+            score = trainer.update_ml_model()
+            if score is None:
+                score = previous['score']
+        else:
+            score = trainer.build_ml_model(kind=self.model_kind, n_jobs=self.fit_cores(),
+                                           max_samples=self.max_samples, time_budget=self.time_budget)
+        if score is None:
+            return None, None
+
+        version = previous['version'] + 1 if previous else 1
+        categories = [str(category) for category in trainer.encoder.classes_]
+
+        # Precompute the model output over the whole feature grid
+        grid = np.indices(self.TABLE_SHAPE + (len(categories),)).reshape(5, -1).T
+        grid[:, 1] += 1
+        grid[:, 2] += 1
+        table = trainer.model.predict(grid).reshape(self.TABLE_SHAPE + (len(categories),))
+
+        joblib.dump(trainer.model, self._model_path(user_id, version))
+        np.save(self._table_path(user_id, version), table)
+        meta = {
+            'version': version,
+            'kind': 'incremental' if hasattr(trainer.model, 'partial_fit') else 'forest',
+            'score': score,
+            'categories': categories,
+            'fingerprint': fingerprint,
+            'trained_at': time.time()
+        }
+        tmp_path = self._meta_path(user_id) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(user_id))
+        # Older versions are pruned when this one is attached (see _prune)
+        return meta, trainer.model
+
+    def train_async(self, agent, user_id):
+        """Retrain in the background unless a training run is already going.
+
+        With a job runner the fit runs in its process pool and the result is
+        attached to the agent when it lands; returns the Job, or None when the
+        user is at their job limit. Without one a thread is started instead.
+        """
+        if self.runner is not None:
+            try:
+                return self.runner.submit(user_id, 'train_model', train_model_job, self.model_dir,
+                                          self.training_options, user_id, agent.transactions, process=True,
+                                          on_done=lambda meta: meta and self.attach(agent, user_id, meta))
+            except JobLimitExceeded:
+                return None
+
+        with self._lock:
+            if user_id in self._training:
+                return None
+            self._training.add(user_id)
+
+        def run():
+            try:
+                self.train(agent, user_id)
+            finally:
+                with self._lock:
+                    self._training.discard(user_id)
+
+        thread = threading.Thread(target=run, name=f'train-{user_id}', daemon=True)
+        thread.start()
+        return thread
+
+    def ensure_model(self, agent, user_id, wait=False):
+        """Attach the latest usable model to an agent and return its score.
+
+        Retraining happens in the background when the data has drifted. With
+        wait=True a request for a user that has no model at all waits up to
+        ``wait_timeout`` seconds for the fit, then raises ModelNotReady (or
+        JobLimitExceeded when no fit could be started).
+        """
+        # Skip the fingerprint while the agent's transactions are unchanged
+        if agent.model_state == agent.revision:
+            return agent.model_score
+
+        fingerprint = self.fingerprint(agent.aggregates)
+        meta = self.load_meta(user_id)
+        if meta is not None and agent.model_version != meta['version']:
+            self.attach(agent, user_id, meta)
+
+        if self.needs_retrain(meta, fingerprint):
+            if meta is None and wait:
+                self._await_first_model(agent, user_id)
+            elif self.train_async(agent, user_id) is None or agent.served_model is None:
+                # Nothing was submitted (job limit), or no model is served until
+                # the fit lands: check again on the next call, not the next write
+                return agent.model_score
+        agent.model_state = agent.revision
+        return agent.model_score
+
+    def _await_first_model(self, agent, user_id):
+        """Fit an agent's first model, waiting for a background fit at most
+        ``wait_timeout`` seconds"""
+        if self.runner is None:
+            self.train(agent, user_id)
+            return
+        # Shares a background fit that is already running, if any
+        job = self.train_async(agent, user_id)
+        if job is None:
+            raise JobLimitExceeded(f"User '{user_id}' already has {self.runner.per_user} unfinished job(s)")
+        if not job.wait(self.wait_timeout):
+            raise ModelNotReady(job)
+        if job.error is not None:
+            raise RuntimeError(f'Model training failed: {job.error}')
+        if job.result is not None and agent.model_version != job.result['version']:
+            self.attach(agent, user_id, job.result)
+
+    def _versions(self, user_id):
+        """Persisted model versions of a user, oldest first"""
+        pattern = re.compile(re.escape(f'{user_id}_expense_') + r'(?:model|predictions)\.v(\d+)\.')
+        versions = {int(match.group(1)) for match in map(pattern.match, os.listdir(self.model_dir)) if match}
+        return sorted(versions)
+
+    def _prune(self, user_id, current):
+        """Remove versions more than KEEP_PREVIOUS behind ``current`` that no
+        model attached in this process still serves (their pickle loads lazily)"""
+        with self._lock:
+            in_use = {served.version for served in self._served.get(user_id, ())}
+        for version in self._versions(user_id):
+            if version < current - self.KEEP_PREVIOUS and version not in in_use:
+                self._remove_version(user_id, version)
+
+    def _remove_version(self, user_id, version):
+        for file_path in (self._model_path(user_id, version), self._table_path(user_id, version)):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def clear(self, user_id):
+        """Remove every persisted model version for a user"""
+        with self._lock:
+            self._served.pop(user_id, None)
+        prefixes = (f'{user_id}_expense_model.', f'{user_id}_expense_predictions.')
+        for name in os.listdir(self.model_dir):
+            if name.startswith(prefixes):
+                os.remove(os.path.join(self.model_dir, name))
+
+def _env_number(name, kind):
+    value = os.environ.get(name)
+    return kind(value) if value else None
+
+def train_model_job(model_dir, options, user_id, transactions):
+    """Fit and persist a model in a JobRunner worker process; returns its meta"""
+    meta, _ = ModelRegistry(model_dir, **options)._fit(transactions, user_id)
+    return meta
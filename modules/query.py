@@ -0,0 +1,253 @@
+import re
+import base64
+import json
+import numpy as np
+import pandas as pd
+
+class SortedIndex:
+    """Row positions of a transactions frame ordered by (key, row position).
+
+    Equal keys keep row order, which makes (key, row) a unique, stable
+    position to resume from; cursor pagination and range selection are
+    binary searches rather than scans over the whole history.
+    """
+
+    def __init__(self, keys):
+        keys = np.asarray(keys)
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.order)
+
+    def extend(self, new_keys, first_row):
+        """Insert keys of rows appended at positions first_row, first_row + 1, ..."""
+        new_keys = np.asarray(new_keys, dtype=self.keys.dtype)
+        rows = np.arange(first_row, first_row + len(new_keys))
+        new_order = np.argsort(new_keys, kind='stable')
+        new_keys, rows = new_keys[new_order], rows[new_order]
+        # side='right' keeps newer rows after older rows with the same key
+        slots = np.searchsorted(self.keys, new_keys, side='right')
+        self.keys = np.insert(self.keys, slots, new_keys)
+        self.order = np.insert(self.order, slots, rows)
+
+    def bounds(self, low=None, high=None):
+        """Index range [start, stop) of keys within [low, high]"""
+        start = 0 if low is None else int(np.searchsorted(self.keys, low, side='left'))
+        stop = len(self.keys) if high is None else int(np.searchsorted(self.keys, high, side='right'))
+        return start, stop
+
+    def resume(self, key, row, descending):
+        """Index to continue from after the item (key, row)"""
+        left, right = self.bounds(key, key)
+        ties = self.order[left:right]
+        # Rows with equal keys are in ascending row order (see extend)
+        if descending:
+            return left + int(np.searchsorted(ties, row, side='left'))
+        return left + int(np.searchsorted(ties, row, side='right'))
+
+def encode_cursor(source, key, row):
+    """Opaque cursor for the item (key, row) of a page read from ``source``.
+
+    Sources position rows differently ('memory': nanosecond date or amount
+    key and frame row; 'sqlite': ISO date or amount and row id), so the
+    source is part of the cursor and checked when it is decoded.
+    """
+    payload = json.dumps([source, key, row]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+def decode_cursor(cursor, source):
+    """(key, row) of a cursor issued by ``source``; ValueError otherwise"""
+    try:
+        issuer, key, row = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        row = int(row)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if issuer != source:
+        raise ValueError('Cursor was issued by a different transaction source; start again from the first page')
+    return key, row
+
+class DateWindow:
+    """Inclusive range of transaction dates, either end open.
+
+    Either explicit dates (date_from / date_to, YYYY-MM-DD) or a rolling
+    period ending today:
+      '30d', '8w'   the last N days or weeks, today included
+      '3m', '1y'    this calendar month and the N - 1 (or 12N - 1) before it
+      'mtd', 'ytd'  since the start of this month or year
+      'all'         every transaction
+    """
+
+    PERIOD_PATTERN = re.compile(r'^(\d{1,4})([dwmy])$')
+
+    def __init__(self, date_from=None, date_to=None):
+        # Stored dates carry no time of day, so both bounds are whole days
+        self.date_from = None if date_from is None else pd.Timestamp(date_from).normalize()
+        self.date_to = None if date_to is None else pd.Timestamp(date_to).normalize()
+        if self.date_from is not None and self.date_to is not None and self.date_from > self.date_to:
+            raise ValueError('date_from must not be after date_to')
+
+    @classmethod
+    def rolling(cls, period, today=None):
+        """The window for a rolling period name, ending today"""
+        today = pd.Timestamp.today().normalize() if today is None else pd.Timestamp(today).normalize()
+        if period == 'all':
+            return cls()
+        if period == 'mtd':
+            return cls(today.to_period('M').start_time, today)
+        if period == 'ytd':
+            return cls(today.to_period('Y').start_time, today)
+        match = cls.PERIOD_PATTERN.match(period or '')
+        if not match or int(match.group(1)) == 0:
+            raise ValueError(f"Unknown period '{period}'; use e.g. 30d, 8w, 3m, 1y, mtd, ytd or all")
+        count, unit = int(match.group(1)), match.group(2)
+        if unit in ('d', 'w'):
+            days = count * (7 if unit == 'w' else 1)
+            return cls(today - pd.Timedelta(days=days - 1), today)
+        months = count * (12 if unit == 'y' else 1)
+        return cls((today.to_period('M') - (months - 1)).start_time, today)
+
+    @classmethod
+    def from_args(cls, args, default=None, today=None):
+        """Window from request arguments 'period' or 'date_from' / 'date_to',
+        else the ``default`` period (all history when None)"""
+        period = args.get('period') or None
+        date_from = args.get('date_from') or None
+        date_to = args.get('date_to') or None
+        if period is not None and (date_from is not None or date_to is not None):
+            raise ValueError('Give either period or date_from/date_to, not both')
+        if period is None and date_from is None and date_to is None:
+            return cls() if default is None else cls.rolling(default, today)
+        if period is not None:
+            return cls.rolling(period, today)
+        try:
+            return cls(date_from, date_to)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Invalid date: {e}')
+
+    @property
+    def is_open(self):
+        """Whether the window covers all history"""
+        return self.date_from is None and self.date_to is None
+
+    @property
+    def bounds(self):
+        return self.date_from, self.date_to
+
+    def key(self):
+        """Hashable form for cache keys and ETags"""
+        return tuple(None if value is None else value.strftime('%Y-%m-%d') for value in self.bounds)
+
+class TransactionQuery:
+    """Filtered, sorted, cursor-paginated reads over an agent's transactions"""
+
+    SORTS = {
+        'date_desc': ('date', True),
+        'date_asc': ('date', False),
+        'amount_desc': ('amount', True),
+        'amount_asc': ('amount', False)
+    }
+    MAX_LIMIT = 500
+
+    def __init__(self, date_from=None, date_to=None, categories=None, transaction_type=None,
+                 min_amount=None, max_amount=None, sort='date_desc', limit=50, cursor=None):
+        if sort not in self.SORTS:
+            raise ValueError(f"Unknown sort '{sort}'")
+        # Stored dates carry no time of day, so both bounds are inclusive days
+        self.date_from = pd.Timestamp(date_from) if date_from else None
+        self.date_to = pd.Timestamp(date_to) if date_to else None
+        self.categories = set(categories) if categories else None
+        self.transaction_type = transaction_type or None
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+        self.sort = sort
+        self.limit = max(1, min(int(limit), self.MAX_LIMIT))
+        self.cursor = cursor
+
+    @classmethod
+    def from_args(cls, args):
+        """Build a query from request arguments"""
+        def number(name):
+            value = args.get(name)
+            return float(value) if value not in (None, '') else None
+
+        categories = [c for c in args.get('category', '').split(',') if c] if args.get('category') else None
+        window = DateWindow.from_args(args)
+        return cls(
+            date_from=window.date_from,
+            date_to=window.date_to,
+            categories=categories,
+            transaction_type=args.get('type') or None,
+            min_amount=number('min_amount'),
+            max_amount=number('max_amount'),
+            sort=args.get('sort', 'date_desc'),
+            limit=args.get('limit', 50),
+            cursor=args.get('cursor') or None
+        )
+
+    def _mask(self, block):
+        mask = np.ones(len(block), dtype=bool)
+        if self.categories is not None:
+            mask &= block['Category'].isin(self.categories).to_numpy()
+        if self.transaction_type is not None:
+            mask &= (block['Type'] == self.transaction_type).to_numpy()
+        if self.min_amount is not None:
+            mask &= (block['Amount'] >= self.min_amount).to_numpy()
+        if self.max_amount is not None:
+            mask &= (block['Amount'] <= self.max_amount).to_numpy()
+        if self.sort.startswith('amount'):
+            # Date bounds only narrow the index range when sorting by date
+            if self.date_from is not None:
+                mask &= (block['Date'] >= self.date_from).to_numpy()
+            if self.date_to is not None:
+                mask &= (block['Date'] <= self.date_to).to_numpy()
+        return mask
+
+    def run(self, transactions, date_index, amount_index):
+        """Return (page DataFrame, next cursor or None)"""
+        key_name, descending = self.SORTS[self.sort]
+        if key_name == 'date':
+            index = date_index
+            low = None if self.date_from is None else self.date_from.value
+            high = None if self.date_to is None else self.date_to.value
+        else:
+            index = amount_index
+            low, high = self.min_amount, self.max_amount
+        start, stop = index.bounds(low, high)
+        if self.cursor:
+            key, row = decode_cursor(self.cursor, 'memory')
+            position = index.resume(key, row, descending)
+            if descending:
+                stop = min(stop, position)
+            else:
+                start = max(start, position)
+
+        # Walk the index range in blocks until a page of matching rows is found
+        picked = []
+        block_size = self.limit * 2
+        while start < stop and len(picked) < self.limit:
+            if descending:
+                block_positions = np.arange(stop - 1, max(start, stop - block_size) - 1, -1)
+                stop = max(start, stop - block_size)
+            else:
+                block_positions = np.arange(start, min(stop, start + block_size))
+                start = min(stop, start + block_size)
+            rows = index.order[block_positions]
+            block = transactions.iloc[rows]
+            matches = rows[self._mask(block)]
+            room = self.limit - len(picked)
+            picked.extend(matches[:room].tolist())
+            if len(matches) > room:
+                break
+            block_size = min(block_size * 2, 65536)
+
+        page = transactions.iloc[picked]
+        next_cursor = None
+        if len(picked) == self.limit:
+            tail = picked[-1]
+            if key_name == 'date':
+                key = int(transactions['Date'].iloc[tail].value)
+            else:
+                key = float(transactions['Amount'].iloc[tail])
+            next_cursor = encode_cursor('memory', key, int(tail))
+        return page, next_cursor
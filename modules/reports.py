@@ -0,0 +1,143 @@
+import io
+import csv
+import json
+import pandas as pd
+from markupsafe import escape
+
+class ReportGenerator:
+    """Financial report over a date range, produced section by section.
+
+    Everything the report needs (the AnalyticsResult for the range and the
+    forecast settings) is captured when the generator is created, so the
+    agent's lock can be released before rendering starts. Each section is
+    computed when the consumer asks for it and is bounded by months x
+    categories, so a multi-year report streams one section at a time.
+    """
+
+    FORMATS = {
+        'text': ('text/plain', 'txt'),
+        'csv': ('text/csv', 'csv'),
+        'json': ('application/json', 'json'),
+        'html': ('text/html', 'html')
+    }
+    CSV_COLUMNS = ['section', 'period', 'category', 'amount', 'budget', 'percentage', 'note']
+    FORECAST_MONTHS = 3
+
+    def __init__(self, agent, date_from=None, date_to=None):
+        self.date_from = None if date_from is None else pd.Timestamp(date_from)
+        self.date_to = None if date_to is None else pd.Timestamp(date_to)
+        self.analytics = agent.analytics(self.date_from, self.date_to)
+        self.forecaster = agent.forecaster
+
+    def period_label(self, months):
+        """'2024-01-01 to 2024-06-30' for an explicit range, else the months covered"""
+        if self.date_from is not None or self.date_to is not None:
+            start = 'start' if self.date_from is None else self.date_from.strftime('%Y-%m-%d')
+            end = 'today' if self.date_to is None else self.date_to.strftime('%Y-%m-%d')
+            return f"{start} to {end}"
+        return f"{months[0]} to {months[-1]}"
+
+    def sections(self):
+        """Yield (key, title, data) per section, computing each on demand.
+
+        data is a DataFrame for 'expenses' and 'forecast', a list of lines for
+        'insights' and a list of per-category dicts for 'budget'.
+        """
+        expenses = self.analytics.category_matrix
+        if not expenses.empty:
+            label = self.period_label([str(month) for month in expenses.index])
+            yield 'expenses', f"EXPENSE CATEGORIZATION ({label})", expenses
+
+            state = self.forecaster.fit(expenses)
+            forecast = self.forecaster.forecast(state, self.FORECAST_MONTHS).mean
+            yield 'forecast', f"BUDGET FORECAST (Next {self.FORECAST_MONTHS} Months)", forecast
+
+        yield 'insights', "SAVINGS INSIGHTS", self.analytics.insights().split('\n')
+
+        if self.analytics.expense_count > 0:
+            # limit is the monthly budget times the months the report spans
+            budget = [{key: row[key] for key in ('category', 'budget', 'limit', 'spent', 'percentage', 'status')}
+                      for row in self.analytics.budget if row['spent'] > 0]
+            months = self.analytics.months
+            yield 'budget', f"BUDGET RECOMMENDATIONS ({months} month{'s' if months != 1 else ''})", budget
+
+    def render(self, output_format='text'):
+        """Yield the report as string chunks, about one per section"""
+        if output_format not in self.FORMATS:
+            raise ValueError(f"Unknown report format '{output_format}'")
+        return getattr(self, f'_render_{output_format}')()
+
+    def _render_text(self):
+        yield "FINANCIAL MANAGEMENT REPORT\n" + "=" * 50 + "\n\n"
+        for key, title, data in self.sections():
+            if key in ('expenses', 'forecast'):
+                yield f"{title}:\n{data.to_string()}\n\n"
+            elif key == 'insights':
+                yield f"{title}:\n" + "\n".join(data) + "\n\n"
+            else:
+                lines = [f"{title}:\n"]
+                for row in data:
+                    lines.append(f"{row['category']}: Budget ₹{row['limit']:,.2f}, "
+                                 f"Spent ₹{row['spent']:,.2f} ({row['percentage']:.1f}%)\n")
+                    if row['status'] == 'exceeded':
+                        lines.append(f"  - You've exceeded your budget by ₹{row['spent'] - row['limit']:,.2f}\n")
+                    elif row['status'] == 'close':
+                        lines.append("  - You're close to your budget limit\n")
+                    else:
+                        lines.append("  - You're within your budget\n")
+                yield ''.join(lines) + "\n"
+
+    def _render_csv(self):
+        def chunk(rows):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            return buffer.getvalue()
+
+        yield chunk([self.CSV_COLUMNS])
+        for key, _, data in self.sections():
+            if key in ('expenses', 'forecast'):
+                yield chunk([key, str(month), category, round(float(amount), 2), '', '', '']
+                            for month, row in data.iterrows() for category, amount in row.items())
+            elif key == 'insights':
+                yield chunk(['insights', '', '', '', '', '', line] for line in data)
+            else:
+                yield chunk(['budget', '', row['category'], round(float(row['spent']), 2), row['limit'],
+                             round(row['percentage'], 1), row['status']] for row in data)
+
+    def _render_json(self):
+        yield '{"date_from": %s, "date_to": %s, "sections": [' % (
+            json.dumps(None if self.date_from is None else self.date_from.strftime('%Y-%m-%d')),
+            json.dumps(None if self.date_to is None else self.date_to.strftime('%Y-%m-%d')))
+        for position, (key, title, data) in enumerate(self.sections()):
+            if key in ('expenses', 'forecast'):
+                data = {str(month): {str(category): round(float(amount), 2) for category, amount in row.items()}
+                        for month, row in data.iterrows()}
+            elif key == 'budget':
+                data = [dict(row, spent=round(float(row['spent']), 2), percentage=round(row['percentage'], 1))
+                        for row in data]
+            yield (',' if position else '') + json.dumps({'key': key, 'title': title, 'data': data})
+        yield ']}'
+
+    def _render_html(self):
+        yield ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>Financial Report</title>'
+               '<style>body{font-family:sans-serif}table{border-collapse:collapse}'
+               'td,th{border:1px solid #ccc;padding:2px 6px;text-align:right}</style></head>'
+               '<body><h1>Financial Management Report</h1>')
+        for key, title, data in self.sections():
+            parts = [f'<h2>{escape(title.title())}</h2>']
+            if key in ('expenses', 'forecast'):
+                parts.append('<table><tr><th>Month</th>' + ''.join(f'<th>{escape(column)}</th>' for column in data.columns) + '</tr>')
+                for month, row in data.iterrows():
+                    parts.append(f'<tr><th>{escape(month)}</th>' + ''.join(f'<td>{amount:,.2f}</td>' for amount in row) + '</tr>')
+                parts.append('</table>')
+            elif key == 'insights':
+                parts.append('<ul>' + ''.join(f'<li>{escape(line)}</li>' for line in data) + '</ul>')
+            else:
+                parts.append('<table><tr><th>Category</th><th>Budget</th><th>Spent</th><th>%</th><th>Status</th></tr>')
+                for row in data:
+                    parts.append(f"<tr><th>{escape(row['category'])}</th><td>{row['limit']:,.2f}</td>"
+                                 f"<td>{row['spent']:,.2f}</td><td>{row['percentage']:.1f}</td>"
+                                 f"<td>{escape(row['status'])}</td></tr>")
+                parts.append('</table>')
+            yield ''.join(parts)
+        yield '</body></html>'
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+# (min amount, max amount) and description pool per category, Indian context
+EXPENSE_PROFILES = {
+    'Food & Dining': ((100, 1500), ['Restaurant', 'Zomato Order', 'Swiggy Order', 'Grocery', 'Street Food', 'Cafe']),
+    'Transportation': ((50, 1000), ['Petrol', 'Auto Rickshaw', 'Metro', 'Bus', 'Ola', 'Uber', 'Train']),
+    'Entertainment': ((200, 3000), ['Movie Tickets', 'Netflix', 'Amazon Prime', 'Concert', 'Amusement Park']),
+    'Utilities': ((500, 5000), ['Electricity Bill', 'Water Bill', 'Internet Bill', 'Mobile Recharge', 'Gas Cylinder']),
+    'Shopping': ((300, 8000), ['Clothes', 'Electronics', 'Amazon', 'Flipkart', 'Myntra', 'Local Market']),
+    'Healthcare': ((200, 5000), ['Doctor Visit', 'Medicines', 'Hospital', 'Pharmacy', 'Health Checkup']),
+    'Rent': ((8000, 15000), ['House Rent', 'Maintenance']),
+    'Education': ((1000, 10000), ['School Fees', 'Books', 'Tuition', 'Online Course']),
+    'Personal Care': ((100, 2000), ['Salon', 'Spa', 'Gym', 'Yoga Class']),
+    'Investments': ((1000, 10000), ['Mutual Funds', 'Stocks', 'Fixed Deposit', 'PPF']),
+    'Other': ((50, 2000), ['Gift', 'Donation', 'Miscellaneous'])
+}
+
+INCOME_PROFILES = {
+    'Salary': ((40000, 80000), ['Monthly Salary', 'Paycheck']),
+    'Freelance': ((5000, 30000), ['Freelance Project', 'Consulting']),
+    'Investments': ((1000, 10000), ['Dividends', 'Interest', 'Capital Gains']),
+    'Business': ((10000, 50000), ['Business Revenue', 'Client Payment']),
+    'Other Income': ((1000, 10000), ['Bonus', 'Cashback', 'Rewards'])
+}
+
+# Used for user-defined categories that have no profile above
+DEFAULT_PROFILE = ((50, 2000), ['Miscellaneous'])
+
+def _draw(rng, rows, categories, profiles, category_codes, description_codes):
+    """Draw category codes, amounts and description codes for one transaction type"""
+    picked = rng.integers(0, len(categories), rows)
+    lows = np.array([profiles.get(category, DEFAULT_PROFILE)[0][0] for category in categories], dtype='float64')
+    highs = np.array([profiles.get(category, DEFAULT_PROFILE)[0][1] for category in categories], dtype='float64')
+    amounts = np.round(rng.uniform(lows[picked], highs[picked]), 2)
+
+    # Flatten every category's description pool so one draw covers all rows
+    pools = [profiles.get(category, DEFAULT_PROFILE)[1] for category in categories]
+    counts = np.array([len(pool) for pool in pools])
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    flat_codes = np.array([description_codes[description] for pool in pools for description in pool])
+    choice = offsets[picked] + (rng.random(rows) * counts[picked]).astype(np.int64)
+
+    return category_codes[picked], amounts, flat_codes[choice]
+
+def generate_transactions(rows=100, months=3, seed=None, expense_share=0.8,
+                          expense_categories=None, income_categories=None, end_date=None):
+    """Generate sample transactions in the canonical schema in one vectorized pass.
+
+    Dates are spread uniformly over the ``months`` (30-day) window ending at
+    ``end_date`` (today by default); ``expense_share`` of the rows are
+    expenses. Pass ``seed`` for reproducible data.
+    """
+    rng = np.random.default_rng(seed)
+    expense_categories = list(expense_categories or EXPENSE_PROFILES)
+    income_categories = list(income_categories or INCOME_PROFILES)
+    expense_rows = int(round(rows * expense_share))
+    income_rows = rows - expense_rows
+
+    all_categories = list(dict.fromkeys(expense_categories + income_categories))
+    category_index = {category: code for code, category in enumerate(all_categories)}
+    descriptions = list(dict.fromkeys(
+        description
+        for categories, profiles in ((expense_categories, EXPENSE_PROFILES), (income_categories, INCOME_PROFILES))
+        for category in categories
+        for description in profiles.get(category, DEFAULT_PROFILE)[1]
+    ))
+    description_codes = {description: code for code, description in enumerate(descriptions)}
+
+    expense = _draw(rng, expense_rows, expense_categories, EXPENSE_PROFILES,
+                    np.array([category_index[c] for c in expense_categories]), description_codes)
+    income = _draw(rng, income_rows, income_categories, INCOME_PROFILES,
+                   np.array([category_index[c] for c in income_categories]), description_codes)
+
+    end_date = pd.Timestamp(end_date or datetime.now()).normalize()
+    start_date = end_date - timedelta(days=30 * months)
+    day_offsets = rng.integers(0, 30 * months, rows).astype('timedelta64[D]')
+    dates = pd.Series(np.datetime64(start_date, 'D') + day_offsets).astype('datetime64[ns]')
+
+    return pd.DataFrame({
+        'Date': dates,
+        'Description': pd.Categorical.from_codes(np.concatenate((expense[2], income[2])), descriptions),
+        'Amount': np.concatenate((expense[1], income[1])),
+        'Category': pd.Categorical.from_codes(np.concatenate((expense[0], income[0])), all_categories),
+        'Type': pd.Categorical.from_codes(
+            np.repeat(np.array([0, 1], dtype=np.int8), [expense_rows, income_rows]), ['Expense', 'Income']),
+        'Month': dates.dt.to_period('M')
+    })
@@ -0,0 +1,67 @@
+import pandas as pd
+
+# Columns persisted by DataStorage; 'Month' is derived (only feather base files store it)
+TRANSACTION_COLUMNS = ['Date', 'Description', 'Amount', 'Category', 'Type']
+
+def is_canonical(transactions_df):
+    """Whether a frame already follows the canonical in-memory schema"""
+    return (
+        'Month' in transactions_df.columns
+        and transactions_df['Date'].dtype == 'datetime64[ns]'
+        and isinstance(transactions_df['Category'].dtype, pd.CategoricalDtype)
+        and isinstance(transactions_df['Type'].dtype, pd.CategoricalDtype)
+        and transactions_df['Amount'].dtype == 'float64'
+    )
+
+def normalize_transactions(transactions_df):
+    """Return transactions in the canonical schema.
+
+    Date is datetime64[ns], Category and Type are pandas Categoricals,
+    Amount is float64 and Month holds the precomputed monthly Period, so
+    analytics never have to re-parse or re-convert columns.
+    """
+    if is_canonical(transactions_df):
+        return transactions_df
+    dates = pd.to_datetime(transactions_df['Date']).astype('datetime64[ns]')
+    return pd.DataFrame({
+        'Date': dates,
+        'Description': transactions_df['Description'],
+        'Amount': transactions_df['Amount'].astype('float64'),
+        'Category': transactions_df['Category'].astype('category'),
+        'Type': transactions_df['Type'].astype('category'),
+        'Month': dates.dt.to_period('M')
+    }).reset_index(drop=True)
+
+_EMPTY_TRANSACTIONS = None
+
+def empty_transactions():
+    """An empty frame in the canonical schema"""
+    global _EMPTY_TRANSACTIONS
+    if _EMPTY_TRANSACTIONS is None:
+        _EMPTY_TRANSACTIONS = normalize_transactions(pd.DataFrame({
+            'Date': pd.Series(dtype='datetime64[ns]'),
+            'Description': pd.Series(dtype=object),
+            'Amount': pd.Series(dtype='float64'),
+            'Category': pd.Series(dtype=object),
+            'Type': pd.Series(dtype=object)
+        }))
+    # Built once; every agent starts from a copy (batch jobs create one per user)
+    return _EMPTY_TRANSACTIONS.copy()
+
+def append_transactions(transactions_df, new_df):
+    """Concatenate canonical frames without degrading categoricals to object"""
+    new_df = normalize_transactions(new_df)
+    if transactions_df.empty:
+        return new_df
+    if new_df.empty:
+        return transactions_df
+    columns = {}
+    for column in ('Category', 'Type'):
+        existing = transactions_df[column].cat.categories
+        missing = new_df[column].cat.categories.difference(existing)
+        if len(missing):
+            # Only a previously unseen category pays for widening the dtype
+            transactions_df = transactions_df.assign(**{column: transactions_df[column].cat.add_categories(missing)})
+        columns[column] = new_df[column].cat.set_categories(transactions_df[column].cat.categories)
+    new_df = new_df.assign(**columns)
+    return pd.concat([transactions_df, new_df], ignore_index=True)
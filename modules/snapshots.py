@@ -0,0 +1,183 @@
+import os
+import time
+import pickle
+import threading
+from modules.jobs import JobLimitExceeded
+
+class SnapshotStore:
+    """Per-user precomputed results, pickled to disk so every server process
+    can serve them, with the last snapshot read or written kept in memory.
+
+    A snapshot is a dict holding at least 'version' (the data version it was
+    computed from) and 'computed_at' (time.time() when computation started).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def _path(self, user_id):
+        return os.path.join(self.directory, f'{user_id}_snapshot.pkl')
+
+    def get(self, user_id, version=None):
+        """The user's snapshot, re-read from disk when the one in memory does
+        not match ``version`` (another process may have computed it)"""
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+        if snapshot is not None and (version is None or snapshot['version'] == version):
+            return snapshot
+        try:
+            with open(self._path(user_id), 'rb') as f:
+                stored = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return snapshot
+        with self._lock:
+            current = self._snapshots.get(user_id)
+            if current is None or stored['computed_at'] > current['computed_at']:
+                self._snapshots[user_id] = current = stored
+        return current
+
+    def put(self, user_id, snapshot):
+        """Store a snapshot unless a newer computation has already been stored"""
+        with self._lock:
+            current = self._snapshots.get(user_id)
+            if current is not None and current['computed_at'] > snapshot['computed_at']:
+                return False
+            self._snapshots[user_id] = snapshot
+            tmp_path = f'{self._path(user_id)}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(user_id))
+        return True
+
+    def discard(self, user_id):
+        with self._lock:
+            self._snapshots.pop(user_id, None)
+            if os.path.exists(self._path(user_id)):
+                os.remove(self._path(user_id))
+
+    def users(self):
+        suffix = '_snapshot.pkl'
+        return [name[:-len(suffix)] for name in os.listdir(self.directory) if name.endswith(suffix)]
+
+class SnapshotScheduler:
+    """Keeps every user's snapshot in step with their data.
+
+    ``notify(user_id)`` after a write schedules a refresh once no further
+    write has arrived for ``settle_seconds``; every ``interval`` seconds the
+    snapshots on disk are also checked against the current data version,
+    which catches writes made by other processes. Refreshes run as
+    'snapshot' jobs on the JobRunner, so they share its per-user limits.
+
+    ``version(user_id)`` must be cheap and must not load the user's data
+    (the sweep calls it for every user with a snapshot); it returns None
+    when nothing is stored for the user.
+
+    ``fresh`` returns a snapshot that matches the data version, or one that
+    is at most ``max_staleness`` seconds old. When it returns None, callers
+    may serve the outdated snapshot while ``refresh`` recomputes it.
+    """
+
+    def __init__(self, store, compute, version, runner, settle_seconds=None, interval=None, max_staleness=None):
+        self.store = store
+        # compute(user_id) -> snapshot dict; version(user_id) -> current data version
+        self.compute = compute
+        self.version = version
+        self.runner = runner
+        self.settle_seconds = settle_seconds if settle_seconds is not None else float(
+            os.environ.get('SNAPSHOT_SETTLE_SECONDS', 2))
+        self.interval = interval if interval is not None else float(
+            os.environ.get('SNAPSHOT_INTERVAL_SECONDS', 300))
+        self.max_staleness = max_staleness if max_staleness is not None else float(
+            os.environ.get('SNAPSHOT_MAX_STALENESS_SECONDS', 0))
+        self._dirty = {}
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def fresh(self, user_id, version):
+        snapshot = self.store.get(user_id, version)
+        if snapshot is None:
+            return None
+        if snapshot['version'] == version or time.time() - snapshot['computed_at'] <= self.max_staleness:
+            return snapshot
+        return None
+
+    def notify(self, user_id):
+        """Record a write; the snapshot is refreshed once writes settle"""
+        with self._lock:
+            self._dirty[user_id] = time.monotonic()
+            self._start()
+        self._wake.set()
+
+    def refresh(self, user_id, version=None):
+        """Recompute a user's snapshot in the background; returns the Job or None.
+
+        Keyed by data version, so a refresh already running for the same
+        version is shared and one for an older version is not.
+        """
+        if version is None:
+            version = self.version(user_id)
+        try:
+            return self.runner.submit(user_id, 'snapshot', self._refresh, user_id, key=version)
+        except JobLimitExceeded:
+            return None
+
+    def _refresh(self, user_id):
+        snapshot = self.compute(user_id)
+        self.store.put(user_id, snapshot)
+        return snapshot['version']
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='snapshot-scheduler', daemon=True)
+            self._thread.start()
+
+    def start(self):
+        with self._lock:
+            self._start()
+
+    def _run(self):
+        next_sweep = time.monotonic() + self.interval
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                due = [user_id for user_id, written in self._dirty.items() if now - written >= self.settle_seconds]
+                pending = [written + self.settle_seconds for user_id, written in self._dirty.items()
+                           if user_id not in due]
+            for user_id in due:
+                try:
+                    job = self.refresh(user_id)
+                except Exception:
+                    job = None
+                    with self._lock:
+                        self._dirty.pop(user_id, None)
+                if job is not None:
+                    with self._lock:
+                        if self._dirty.get(user_id, now) <= now:
+                            self._dirty.pop(user_id, None)
+            if self.interval > 0 and now >= next_sweep:
+                self._sweep()
+                next_sweep = now + self.interval
+            wake_at = min(pending + ([next_sweep] if self.interval > 0 else []) + [now + 60])
+            if due:
+                # Users left at their job limit are retried shortly
+                wake_at = min(wake_at, now + self.settle_seconds)
+            self._wake.wait(max(0.0, wake_at - time.monotonic()))
+            self._wake.clear()
+
+    def _sweep(self):
+        for user_id in self.store.users():
+            try:
+                version = self.version(user_id)
+                if version is None:
+                    # Cleared since; nothing to compute from
+                    continue
+                snapshot = self.store.get(user_id, version)
+                if snapshot is None or snapshot['version'] != version:
+                    self.refresh(user_id, version)
+            except Exception:
+                # One user's failure must not stop the scheduler
+                continue
@@ -0,0 +1,388 @@
+import os
+import json
+import queue
+import sqlite3
+import threading
+import uuid
+import pandas as pd
+from contextlib import contextmanager
+from modules.schema import TRANSACTION_COLUMNS, normalize_transactions
+from modules.aggregates import MonthlyAggregates
+from modules.query import encode_cursor, decode_cursor
+from modules.instrumentation import timed
+from modules.locking import LockTable
+from modules.storage import DataStorage, DEFAULT_BUDGETS, DEFAULT_INCOME_SOURCES, DEFAULT_ALERT_THRESHOLDS
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions (user_id, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_category_type ON transactions (user_id, category, type);
+-- Covers the monthly aggregate GROUP BY in index order, without touching the table
+CREATE INDEX IF NOT EXISTS idx_transactions_user_month ON transactions (user_id, substr(date, 1, 7), category, type, amount);
+CREATE TABLE IF NOT EXISTS staged_transactions (
+    import_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_staged_transactions_import ON staged_transactions (import_id);
+CREATE TABLE IF NOT EXISTS settings (
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, kind)
+);
+CREATE TABLE IF NOT EXISTS versions (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+'''
+
+# Statements are constant strings so each connection's statement cache keeps
+# them prepared; only the bound parameters change between calls
+INSERT_TRANSACTION = ('INSERT INTO transactions (user_id, date, description, amount, category, type) '
+                      'VALUES (?, ?, ?, ?, ?, ?)')
+INSERT_STAGED = ('INSERT INTO staged_transactions (import_id, date, description, amount, category, type) '
+                 'VALUES (?, ?, ?, ?, ?, ?)')
+BUMP_VERSION = ('INSERT INTO versions (user_id, version) VALUES (?, 1) '
+                'ON CONFLICT (user_id) DO UPDATE SET version = version + 1')
+SELECT_USERS = 'SELECT user_id FROM transactions UNION SELECT user_id FROM settings ORDER BY user_id'
+SELECT_STAGED = ('SELECT date, description, amount, category, type FROM staged_transactions '
+                 'WHERE import_id = ? ORDER BY rowid')
+SELECT_TRANSACTIONS = 'SELECT date, description, amount, category, type FROM transactions WHERE user_id = ?'
+MONTHLY_AGGREGATES = ('SELECT substr(date, 1, 7), category, type, SUM(amount), COUNT(*) '
+                      'FROM transactions WHERE user_id = ? GROUP BY substr(date, 1, 7), category, type')
+MONTHLY_AGGREGATES_BETWEEN = ('SELECT substr(date, 1, 7), category, type, SUM(amount), COUNT(*) '
+                              'FROM transactions WHERE user_id = ? AND date >= ? AND date <= ? '
+                              'GROUP BY substr(date, 1, 7), category, type')
+
+class ConnectionPool:
+    """A bounded pool of SQLite connections in WAL mode, shared by threads.
+
+    WAL lets readers proceed while a writer commits; connections are opened
+    in autocommit mode and writes use explicit BEGIN IMMEDIATE transactions.
+    """
+
+    def __init__(self, path, size=8, timeout=30.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                     check_same_thread=False, cached_statements=256)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            connection = self._connect() if create else self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+def _rows(transactions_df, key):
+    """Parameter tuples for inserting a transactions frame; key is the first column"""
+    dates = pd.to_datetime(transactions_df['Date']).dt.strftime('%Y-%m-%d')
+    return zip(
+        [key] * len(transactions_df),
+        dates.tolist(),
+        transactions_df['Description'].astype(object).where(transactions_df['Description'].notna(), None).tolist(),
+        transactions_df['Amount'].astype('float64').tolist(),
+        transactions_df['Category'].astype(str).tolist(),
+        transactions_df['Type'].astype(str).tolist()
+    )
+
+def _frame(rows):
+    """Canonical transactions frame from (date, description, amount, category, type) rows"""
+    return normalize_transactions(pd.DataFrame.from_records(rows, columns=TRANSACTION_COLUMNS))
+
+class SQLiteStorage:
+    """Transaction, budget and income storage for all users in one SQLite file.
+
+    Offers the DataStorage interface plus pushed-down reads: the aggregate
+    cube is computed with a GROUP BY, transactions can be loaded for a date
+    window only, and transaction pages are served straight from the
+    (user_id, date) index. Writes take the same per-user readers-writer lock
+    as DataStorage so callers can group them with in-memory changes.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, data_dir='data', file_name='financial.db', pool_size=8):
+        self.data_dir = data_dir
+        os.makedirs(os.path.join(data_dir, 'locks'), exist_ok=True)
+        self.path = os.path.join(data_dir, file_name)
+        self.pool = ConnectionPool(self.path, size=pool_size)
+        self._locks = LockTable(lambda user_id: os.path.join(self.data_dir, 'locks', f'{user_id}.lock'))
+        with self.pool.connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def lock(self, user_id='default'):
+        """Readers-writer lock guarding a user's data in this and other processes"""
+        return self._locks[user_id]
+
+    def users(self):
+        """Ids of every user with transactions or settings in the database"""
+        with self.pool.connection() as connection:
+            rows = connection.execute(SELECT_USERS).fetchall()
+        return [user_id for user_id, in rows]
+
+    def forget(self, user_id):
+        """Close this process's lock file handle for a user it is done with"""
+        self._locks.discard(user_id)
+
+    @timed('storage.save')
+    def save_transactions(self, transactions_df, user_id='default'):
+        """Replace all of a user's transactions"""
+        with self.lock(user_id).write(), self.pool.transaction() as connection:
+            connection.execute('DELETE FROM transactions WHERE user_id = ?', (user_id,))
+            connection.executemany(INSERT_TRANSACTION, _rows(transactions_df, user_id))
+            connection.execute(BUMP_VERSION, (user_id,))
+
+    @timed('storage.append')
+    def append_transaction(self, transaction, user_id='default'):
+        """Insert a single transaction"""
+        with self.lock(user_id).write(), self.pool.transaction() as connection:
+            connection.execute(INSERT_TRANSACTION, (
+                user_id, pd.Timestamp(transaction['Date']).strftime('%Y-%m-%d'), transaction['Description'],
+                float(transaction['Amount']), transaction['Category'], transaction['Type']))
+            connection.execute(BUMP_VERSION, (user_id,))
+
+    def stage_import(self, user_id='default'):
+        """Start a bulk import; rows are staged until commit_import"""
+        return f'{user_id}:{uuid.uuid4().hex}'
+
+    def write_staged(self, staging_id, transactions_df):
+        with self.pool.transaction() as connection:
+            connection.executemany(INSERT_STAGED, _rows(transactions_df, staging_id))
+
+    def read_staged(self, staging_id):
+        """The rows staged so far for an import, as a canonical frame"""
+        with self.pool.connection() as connection:
+            rows = connection.execute(SELECT_STAGED, (staging_id,)).fetchall()
+        return _frame(rows)
+
+    def discard_import(self, staging_id):
+        with self.pool.transaction() as connection:
+            connection.execute('DELETE FROM staged_transactions WHERE import_id = ?', (staging_id,))
+
+    @timed('storage.commit_import')
+    def commit_import(self, staging_id, user_id='default'):
+        """Move every staged row into the user's transactions in one transaction"""
+        with self.lock(user_id).write(), self.pool.transaction() as connection:
+            connection.execute(
+                'INSERT INTO transactions (user_id, date, description, amount, category, type) '
+                'SELECT ?, date, description, amount, category, type FROM staged_transactions '
+                'WHERE import_id = ? ORDER BY rowid', (user_id, staging_id))
+            connection.execute('DELETE FROM staged_transactions WHERE import_id = ?', (staging_id,))
+            connection.execute(BUMP_VERSION, (user_id,))
+        return None
+
+    @staticmethod
+    def _select_between(user_id, date_from=None, date_to=None):
+        """SELECT_TRANSACTIONS restricted to [date_from, date_to], in insertion order"""
+        sql, params = SELECT_TRANSACTIONS, [user_id]
+        if date_from is not None:
+            sql += ' AND date >= ?'
+            params.append(pd.Timestamp(date_from).strftime('%Y-%m-%d'))
+        if date_to is not None:
+            sql += ' AND date <= ?'
+            params.append(pd.Timestamp(date_to).strftime('%Y-%m-%d'))
+        # Insertion order, like the CSV log
+        return sql + ' ORDER BY id', params
+
+    @timed('storage.load')
+    def load_transactions(self, user_id='default', date_from=None, date_to=None):
+        """Load a user's transactions, optionally only those in [date_from, date_to]"""
+        sql, params = self._select_between(user_id, date_from, date_to)
+        with self.lock(user_id).read(), self.pool.connection() as connection:
+            rows = connection.execute(sql, params).fetchall()
+        return _frame(rows)
+
+    @timed('storage.aggregate')
+    def monthly_aggregates(self, user_id='default', date_from=None, date_to=None):
+        """The (month x category x type) cube computed inside SQLite,
+        optionally over transactions dated within [date_from, date_to]"""
+        sql, params = MONTHLY_AGGREGATES, [user_id]
+        if date_from is not None or date_to is not None:
+            sql, params = MONTHLY_AGGREGATES_BETWEEN, [user_id, '0000-00-00', '9999-99-99']
+            if date_from is not None:
+                params[1] = pd.Timestamp(date_from).strftime('%Y-%m-%d')
+            if date_to is not None:
+                params[2] = pd.Timestamp(date_to).strftime('%Y-%m-%d')
+        with self.lock(user_id).read(), self.pool.connection() as connection:
+            rows = connection.execute(sql, params).fetchall()
+        return MonthlyAggregates.from_rows(rows)
+
+    @timed('storage.query')
+    def query_transactions(self, user_id, query):
+        """Run a TransactionQuery as an indexed SQL query; returns (page, next cursor).
+
+        Cursors hold the last (key, id) of a page, so the next page is an
+        index range scan from that position rather than an OFFSET.
+        """
+        key_name, descending = query.SORTS[query.sort]
+        column = 'date' if key_name == 'date' else 'amount'
+        order = 'DESC' if descending else 'ASC'
+        sql = 'SELECT id, date, description, amount, category, type FROM transactions WHERE user_id = ?'
+        params = [user_id]
+        if query.date_from is not None:
+            sql += ' AND date >= ?'
+            params.append(query.date_from.strftime('%Y-%m-%d'))
+        if query.date_to is not None:
+            sql += ' AND date <= ?'
+            params.append(query.date_to.strftime('%Y-%m-%d'))
+        if query.categories is not None:
+            sql += f" AND category IN ({', '.join('?' * len(query.categories))})"
+            params.extend(sorted(query.categories))
+        if query.transaction_type is not None:
+            sql += ' AND type = ?'
+            params.append(query.transaction_type)
+        if query.min_amount is not None:
+            sql += ' AND amount >= ?'
+            params.append(query.min_amount)
+        if query.max_amount is not None:
+            sql += ' AND amount <= ?'
+            params.append(query.max_amount)
+        if query.cursor:
+            key, row = decode_cursor(query.cursor, 'sqlite')
+            sql += f" AND ({column}, id) {'<' if descending else '>'} (?, ?)"
+            params.extend([key, row])
+        sql += f' ORDER BY {column} {order}, id {order} LIMIT ?'
+        params.append(query.limit)
+
+        with self.lock(user_id).read(), self.pool.connection() as connection:
+            rows = connection.execute(sql, params).fetchall()
+        page = _frame([row[1:] for row in rows])
+        next_cursor = None
+        if len(rows) == query.limit:
+            last = rows[-1]
+            next_cursor = encode_cursor('sqlite', last[1] if column == 'date' else last[3], last[0])
+        return page, next_cursor
+
+    def count_transactions(self, user_id='default'):
+        with self.pool.connection() as connection:
+            return connection.execute('SELECT COUNT(*) FROM transactions WHERE user_id = ?',
+                                      (user_id,)).fetchone()[0]
+
+    def export_transactions_csv(self, file_obj, user_id='default', date_from=None, date_to=None,
+                                chunk_rows=50000):
+        """Stream a user's transactions (optionally only those dated within
+        [date_from, date_to]) as CSV without loading them all at once"""
+        sql, params = self._select_between(user_id, date_from, date_to)
+        with self.lock(user_id).read(), self.pool.connection() as connection:
+            cursor = connection.execute(sql, params)
+            header = True
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if rows or header:
+                    pd.DataFrame.from_records(rows, columns=TRANSACTION_COLUMNS).to_csv(
+                        file_obj, index=False, header=header)
+                header = False
+                if not rows:
+                    break
+
+    def signature(self, user_id='default'):
+        """Data version of a user, bumped by every write"""
+        with self.pool.connection() as connection:
+            row = connection.execute('SELECT version FROM versions WHERE user_id = ?', (user_id,)).fetchone()
+        return (row[0] if row else 0,)
+
+    def clear_user_data(self, user_id='default'):
+        """Remove every row belonging to a user"""
+        with self.lock(user_id).write(), self.pool.transaction() as connection:
+            connection.execute('DELETE FROM transactions WHERE user_id = ?', (user_id,))
+            connection.execute('DELETE FROM settings WHERE user_id = ?', (user_id,))
+            connection.execute('DELETE FROM staged_transactions WHERE import_id LIKE ?', (f'{user_id}:%',))
+            connection.execute(BUMP_VERSION, (user_id,))
+
+    def _save_setting(self, user_id, kind, data):
+        with self.lock(user_id).write(), self.pool.transaction() as connection:
+            connection.execute('INSERT INTO settings (user_id, kind, data) VALUES (?, ?, ?) '
+                               'ON CONFLICT (user_id, kind) DO UPDATE SET data = excluded.data',
+                               (user_id, kind, json.dumps(data)))
+            connection.execute(BUMP_VERSION, (user_id,))
+
+    def _load_setting(self, user_id, kind, default):
+        with self.pool.connection() as connection:
+            row = connection.execute('SELECT data FROM settings WHERE user_id = ? AND kind = ?',
+                                     (user_id, kind)).fetchone()
+        return json.loads(row[0]) if row else default.copy()
+
+    def save_budgets(self, budget_categories, user_id='default'):
+        self._save_setting(user_id, 'budgets', budget_categories)
+
+    def load_budgets(self, user_id='default'):
+        return self._load_setting(user_id, 'budgets', DEFAULT_BUDGETS)
+
+    def save_income_sources(self, income_sources, user_id='default'):
+        self._save_setting(user_id, 'income', income_sources)
+
+    def load_income_sources(self, user_id='default'):
+        return self._load_setting(user_id, 'income', DEFAULT_INCOME_SOURCES)
+
+    def save_alert_thresholds(self, thresholds, user_id='default'):
+        self._save_setting(user_id, 'alerts', thresholds)
+
+    def load_alert_thresholds(self, user_id='default'):
+        return self._load_setting(user_id, 'alerts', DEFAULT_ALERT_THRESHOLDS)
+
+def migrate_to_sqlite(data_dir='data', source='csv'):
+    """Copy every user's transactions, budgets and income sources from the
+    file layout into the SQLite database. Users that already have rows in
+    the database are skipped, so an interrupted migration can be re-run;
+    the source files are left in place."""
+    source_storage = DataStorage(data_dir, backend=source)
+    target_storage = SQLiteStorage(data_dir)
+    migrated = []
+    for user_id in source_storage.users():
+        if target_storage.count_transactions(user_id):
+            continue
+        target_storage.save_transactions(source_storage.load_transactions(user_id), user_id)
+        target_storage.save_budgets(source_storage.load_budgets(user_id), user_id)
+        target_storage.save_income_sources(source_storage.load_income_sources(user_id), user_id)
+        target_storage.save_alert_thresholds(source_storage.load_alert_thresholds(user_id), user_id)
+        migrated.append(user_id)
+    target_storage.pool.close()
+    return migrated
@@ -1,31 +1,556 @@
+import io
 import pandas as pd
+import numpy as np
 import json
 import os
+import re
+import csv
+import threading
+import time
+import uuid
 from datetime import datetime
+from modules.schema import TRANSACTION_COLUMNS, normalize_transactions, empty_transactions
+from modules.instrumentation import timed
+from modules.locking import LockTable
+
+# User ids become part of file names, so only a safe subset is accepted
+USER_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+def is_valid_user_id(user_id):
+    return isinstance(user_id, str) and USER_ID_PATTERN.match(user_id) is not None
+
+# Budgets and income sources of a user who has not saved any yet
+DEFAULT_BUDGETS = {
+    'Food & Dining': 5000, 
+    'Transportation': 3000, 
+    'Entertainment': 2000, 
+    'Utilities': 2500, 
+    'Shopping': 3000, 
+    'Healthcare': 1500, 
+    'Rent': 10000,
+    'Education': 4000,
+    'Personal Care': 1500,
+    'Investments': 5000,
+    'Other': 2000
+}
+
+DEFAULT_INCOME_SOURCES = {
+    'Salary': 50000, 
+    'Freelance': 15000, 
+    'Investments': 5000,
+    'Business': 20000,
+    'Other Income': 5000
+}
+
+# Budget alert levels, in percent of a category's monthly budget
+DEFAULT_ALERT_THRESHOLDS = [80, 100]
+
+def typed_transactions(transactions_df):
+    """Coerce a transactions frame to typed columns: datetime64 dates,
+    categorical Category/Type and float amounts"""
+    return pd.DataFrame({
+        'Date': pd.to_datetime(transactions_df['Date']),
+        'Description': transactions_df['Description'],
+        'Amount': transactions_df['Amount'].astype('float64'),
+        'Category': transactions_df['Category'].astype('category'),
+        'Type': transactions_df['Type'].astype('category')
+    })
+
+def rows_between(transactions_df, date_from=None, date_to=None):
+    """Rows of a transactions frame dated within [date_from, date_to]
+    (Timestamps, either end open when None)"""
+    if date_from is None and date_to is None:
+        return transactions_df
+    dates = pd.to_datetime(transactions_df['Date'])
+    mask = np.ones(len(transactions_df), dtype=bool)
+    if date_from is not None:
+        mask &= (dates >= date_from).to_numpy()
+    if date_to is not None:
+        mask &= (dates <= date_to).to_numpy()
+    return transactions_df[mask].reset_index(drop=True)
+
+def date_span(transactions_df):
+    """[first, last] transaction date as ISO strings, or None when empty"""
+    if len(transactions_df) == 0:
+        return None
+    dates = pd.to_datetime(transactions_df['Date'])
+    return [dates.min().strftime('%Y-%m-%d'), dates.max().strftime('%Y-%m-%d')]
+
+class CSVBackend:
+    """Plain CSV base files; untyped, kept for compatibility and import/export"""
+    name = 'csv'
+    extension = 'csv'
+    typed = False
+
+    def read(self, file_path, date_from=None, date_to=None):
+        return rows_between(pd.read_csv(file_path), date_from, date_to)
+
+    def write(self, transactions_df, file_path):
+        transactions_df.to_csv(file_path, index=False, columns=TRANSACTION_COLUMNS)
+
+class FeatherBackend:
+    """Typed columnar base files in the Arrow IPC (Feather v2) format.
+
+    Files are written uncompressed so that reads can memory-map them and
+    hand numeric and date columns to pandas without copying. They hold the
+    canonical schema, derived Month included, so a loaded base needs no
+    normalize_transactions pass.
+    """
+    name = 'feather'
+    extension = 'feather'
+    typed = True
+
+    def __init__(self):
+        try:
+            import pyarrow
+            import pyarrow.compute
+            from pyarrow import feather
+        except ImportError:
+            raise ImportError("The feather storage backend requires pyarrow (pip install pyarrow)")
+        self._pyarrow = pyarrow
+        self._feather = feather
+
+    def read(self, file_path, date_from=None, date_to=None):
+        table = self._feather.read_table(file_path, memory_map=True)
+        if date_from is not None or date_to is not None:
+            # Filter in Arrow so only the window is converted to pandas
+            dates = table.column('Date')
+            compute = self._pyarrow.compute
+            mask = None
+            for bound, compare in ((date_from, compute.greater_equal), (date_to, compute.less_equal)):
+                if bound is not None:
+                    condition = compare(dates, self._pyarrow.scalar(bound.to_pydatetime(), type=dates.type))
+                    mask = condition if mask is None else compute.and_(mask, condition)
+            table = table.filter(mask)
+        return table.to_pandas(split_blocks=True)
+
+    def write(self, transactions_df, file_path):
+        self._feather.write_feather(normalize_transactions(transactions_df), file_path,
+                                    compression='uncompressed')
+
+STORAGE_BACKENDS = {
+    'csv': CSVBackend,
+    'feather': FeatherBackend
+}
 
 class DataStorage:
-    def __init__(self, data_dir='data'):
+    # Pending log size (bytes) after which a background compaction is started
+    COMPACTION_THRESHOLD = 1024 * 1024
+    # A directory listing is reused only once the directory's mtime is this
+    # old, so a change within the same (coarse) timestamp tick is never missed
+    LISTING_SETTLE_NS = 2 * 10**9
+
+    def __init__(self, data_dir='data', compaction_threshold=None, backend='csv'):
+        if backend not in STORAGE_BACKENDS:
+            raise ValueError(f"Unknown storage backend '{backend}'")
         self.data_dir = data_dir
-        os.makedirs(data_dir, exist_ok=True)
-    
+        self.backend = STORAGE_BACKENDS[backend]()
+        self.compaction_threshold = compaction_threshold or self.COMPACTION_THRESHOLD
+        os.makedirs(os.path.join(data_dir, 'locks'), exist_ok=True)
+        # Per-user readers-writer locks, shared across worker processes via flock
+        self._locks = LockTable(lambda user_id: os.path.join(self.data_dir, 'locks', f'{user_id}.lock'))
+        self._locks_guard = threading.Lock()
+        self._active_segment = {}
+        self._compacting = set()
+        # (directory mtime, segments by user, temp bases by user); see _scan
+        self._listing = None
+
+    # ------------------------------------------------------------------
+    # Transaction log layout
+    #
+    #   {user}_transactions.{csv|feather}    compacted base file (per backend)
+    #   {user}_transactions.{seq}.log        append-only segments (CSV rows, no header)
+    #   {user}_transactions.manifest.json    {"compacted_through": seq, "sealed_through": seq}
+    #   {user}_transactions.csv.{seq}.tmp    base being written by a compaction
+    #   {user}_transactions.import-{id}.part bulk import staged before commit
+    #
+    # A compaction writes the merged base to a seq-tagged temp file, records
+    # the seq in the manifest and only then renames the temp file over the
+    # base. Whatever point a crash happens at, recovery either discards the
+    # temp file (manifest not yet updated) or rolls the rename forward, and
+    # segments at or below ``compacted_through`` are never read twice.
+    #
+    # Every process appends to its own active segment. Sealing a segment
+    # records it in ``sealed_through``; a process whose active segment has
+    # been sealed or compacted by another process moves on to a new one
+    # before its next append, so sealed segments never change again.
+    # All of this happens under the user's write lock; reads share it.
+    # ------------------------------------------------------------------
+
+    def lock(self, user_id='default'):
+        """Readers-writer lock guarding a user's files in this and other processes"""
+        return self._locks[user_id]
+
+    def users(self):
+        """Ids of every user with transactions, budgets or income sources on disk"""
+        pattern = re.compile(r'^([A-Za-z0-9][A-Za-z0-9_-]*?)_(?:transactions\.|budgets\.json$|income\.json$)')
+        return sorted({match.group(1) for match in map(pattern.match, os.listdir(self.data_dir)) if match})
+
+    def forget(self, user_id):
+        """Drop what this process keeps per user (lock file handle, active
+        segment) once it is done with them, e.g. in a batch over all users"""
+        self._active_segment.pop(user_id, None)
+        self._locks.discard(user_id)
+
+    def _transactions_path(self, user_id):
+        return os.path.join(self.data_dir, f'{user_id}_transactions.{self.backend.extension}')
+
+    def _segment_path(self, user_id, seq):
+        return os.path.join(self.data_dir, f'{user_id}_transactions.{seq:08d}.log')
+
+    def _manifest_path(self, user_id):
+        return os.path.join(self.data_dir, f'{user_id}_transactions.manifest.json')
+
+    def _base_tmp_path(self, user_id, seq):
+        return f'{self._transactions_path(user_id)}.{seq:08d}.tmp'
+
+    def _scan(self):
+        """Log segment and temp base seqs of every user, from one listing of
+        the data directory.
+
+        The listing is shared by all users' lookups, so touching many users
+        costs one directory read instead of one per lookup, and is reused
+        while the directory's mtime is unchanged (creating, renaming or
+        removing any file changes it).
+        """
+        mtime = os.stat(self.data_dir).st_mtime_ns
+        listing = self._listing
+        if listing is not None and listing[0] == mtime:
+            return listing[1], listing[2]
+        started = time.time_ns()
+        extension = re.escape(self.backend.extension)
+        pattern = re.compile(r'^(.+)_transactions\.(?:(\d{8})\.log|' + extension + r'\.(\d{8})\.tmp)$')
+        segments, temp_bases = {}, {}
+        for name in os.listdir(self.data_dir):
+            match = pattern.match(name)
+            if match:
+                user_id, segment, temp_base = match.groups()
+                if segment is not None:
+                    segments.setdefault(user_id, []).append(int(segment))
+                else:
+                    temp_bases.setdefault(user_id, []).append(int(temp_base))
+        for seqs in segments.values():
+            seqs.sort()
+        if started - mtime >= self.LISTING_SETTLE_NS:
+            self._listing = (mtime, segments, temp_bases)
+        return segments, temp_bases
+
+    def _list_segments(self, user_id):
+        """Return sorted sequence numbers of the log segments on disk"""
+        return list(self._scan()[0].get(user_id, ()))
+
+    def _read_manifest(self, user_id):
+        file_path = self._manifest_path(user_id)
+        manifest = {'compacted_through': 0, 'sealed_through': 0}
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as f:
+                manifest.update(json.load(f))
+        return manifest
+
+    def _write_manifest(self, user_id, manifest):
+        self._write_json(self._manifest_path(user_id), manifest)
+
+    @staticmethod
+    def _write_json(file_path, data):
+        """Write JSON to a temp file and rename it into place, so readers only
+        ever see the old or the new content"""
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+
+    @staticmethod
+    def _stamp_mtime(file_path):
+        """Set a full-resolution mtime; filesystem timestamps are often coarser
+        than back-to-back writes, which would leave signature() unchanged"""
+        now = time.time_ns()
+        os.utime(file_path, ns=(now, now))
+
+    def _touch_manifest(self, user_id):
+        """Bump the manifest mtime so other processes notice a new log row"""
+        file_path = self._manifest_path(user_id)
+        if not os.path.exists(file_path):
+            self._write_manifest(user_id, self._read_manifest(user_id))
+        self._stamp_mtime(file_path)
+
+    def _recover(self, user_id):
+        """Finish or discard an interrupted compaction and drop merged segments"""
+        compacted_through = self._read_manifest(user_id)['compacted_through']
+        for seq in self._scan()[1].get(user_id, ()):
+            tmp_path = self._base_tmp_path(user_id, seq)
+            if seq == compacted_through:
+                os.replace(tmp_path, self._transactions_path(user_id))
+            elif seq < compacted_through:
+                os.remove(tmp_path)
+            # Newer temp files may belong to a compaction still running in
+            # another process; they are dropped once a later one publishes
+        for seq in self._list_segments(user_id):
+            if seq <= compacted_through:
+                os.remove(self._segment_path(user_id, seq))
+        return compacted_through
+
+    def _current_segment(self, user_id):
+        """Sequence number of the segment new rows are appended to (write lock held)"""
+        if user_id not in self._active_segment:
+            self._recover(user_id)
+        manifest = self._read_manifest(user_id)
+        floor = max(manifest['compacted_through'], manifest['sealed_through'])
+        active = self._active_segment.get(user_id)
+        if active is None or active <= floor:
+            seqs = self._list_segments(user_id)
+            # Never append behind a possibly torn tail left by a previous process,
+            # nor to a segment another process has sealed
+            active = self._active_segment[user_id] = max(seqs[-1] + 1 if seqs else 0, floor + 1)
+        return active
+
+    def _rotate_segment(self, user_id):
+        """Seal the active segment; returns the seq of the sealed segment"""
+        sealed = self._current_segment(user_id)
+        self._active_segment[user_id] = sealed + 1
+        manifest = self._read_manifest(user_id)
+        if manifest['sealed_through'] < sealed:
+            manifest['sealed_through'] = sealed
+            self._write_manifest(user_id, manifest)
+        return sealed
+
+    def _read_segments(self, user_id, through_seq=None):
+        frames = []
+        for seq in self._list_segments(user_id):
+            if through_seq is not None and seq > through_seq:
+                continue
+            file_path = self._segment_path(user_id, seq)
+            rows = self._complete_rows(file_path) if os.path.getsize(file_path) > 0 else None
+            if rows is not None:
+                frames.append(pd.read_csv(rows, header=None, names=TRANSACTION_COLUMNS, on_bad_lines='skip'))
+        return frames
+
+    @staticmethod
+    def _complete_rows(file_path):
+        """A segment's path, or its rows up to the last newline when a crash
+        mid-append left a torn row at the tail (every complete row ends in
+        one); None when no row is complete"""
+        with open(file_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'\n':
+                return file_path
+            f.seek(0)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        return io.BytesIO(data[:end]) if end else None
+
+    def _write_base_tmp(self, user_id, transactions_df, through_seq):
+        tmp_path = self._base_tmp_path(user_id, through_seq)
+        self.backend.write(transactions_df, tmp_path)
+        fd = os.open(tmp_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return tmp_path
+
+    def _publish_base(self, user_id, tmp_path, through_seq, dates=None):
+        """Make a written temp base current; segments <= through_seq become obsolete.
+        dates is the base's [first, last] date (see date_span), recorded so
+        windowed loads can skip a base that cannot hold matching rows."""
+        manifest = self._read_manifest(user_id)
+        manifest['compacted_through'] = through_seq
+        manifest['base_dates'] = dates
+        self._write_manifest(user_id, manifest)
+        os.replace(tmp_path, self._transactions_path(user_id))
+        self._stamp_mtime(self._transactions_path(user_id))
+        for seq in self._list_segments(user_id):
+            if seq <= through_seq:
+                os.remove(self._segment_path(user_id, seq))
+
+    @timed('storage.save')
     def save_transactions(self, transactions_df, user_id='default'):
         """Save transactions to CSV file"""
-        file_path = os.path.join(self.data_dir, f'{user_id}_transactions.csv')
-        transactions_df.to_csv(file_path, index=False)
-    
-    def load_transactions(self, user_id='default'):
-        """Load transactions from CSV file"""
-        file_path = os.path.join(self.data_dir, f'{user_id}_transactions.csv')
-        if os.path.exists(file_path):
-            return pd.read_csv(file_path)
-        else:
-            return pd.DataFrame(columns=['Date', 'Description', 'Amount', 'Category', 'Type'])
-    
+        with self.lock(user_id).write():
+            # A full save supersedes everything logged so far
+            sealed = self._rotate_segment(user_id)
+            tmp_path = self._write_base_tmp(user_id, transactions_df, sealed)
+            self._publish_base(user_id, tmp_path, sealed, date_span(transactions_df))
+
+    @timed('storage.append')
+    def append_transaction(self, transaction, user_id='default'):
+        """Append a single transaction to the log without rewriting history"""
+        with self.lock(user_id).write():
+            file_path = self._segment_path(user_id, self._current_segment(user_id))
+            with open(file_path, 'a', newline='') as f:
+                csv.writer(f).writerow([transaction[column] for column in TRANSACTION_COLUMNS])
+                f.flush()
+                os.fsync(f.fileno())
+            log_size = os.path.getsize(file_path)
+            self._touch_manifest(user_id)
+        if log_size >= self.compaction_threshold:
+            self.compact_transactions_async(user_id)
+
+    def stage_import(self, user_id='default'):
+        """Create an empty staging file for a bulk import and return its path"""
+        file_path = os.path.join(self.data_dir, f'{user_id}_transactions.import-{uuid.uuid4().hex}.part')
+        open(file_path, 'w').close()
+        return file_path
+
+    def write_staged(self, staging_path, transactions_df):
+        """Append a validated batch to a staging file in log-segment format"""
+        with open(staging_path, 'a', newline='') as f:
+            transactions_df.to_csv(f, index=False, header=False, columns=TRANSACTION_COLUMNS,
+                                   date_format='%Y-%m-%d')
+
+    def read_staged(self, staging_path):
+        """The rows staged so far for an import, as a canonical frame"""
+        if os.path.getsize(staging_path) == 0:
+            return empty_transactions()
+        return normalize_transactions(pd.read_csv(staging_path, header=None, names=TRANSACTION_COLUMNS))
+
+    def discard_import(self, staging_path):
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+
+    @timed('storage.commit_import')
+    def commit_import(self, staging_path, user_id='default'):
+        """Atomically publish a staging file as a new log segment; returns its seq"""
+        with open(staging_path, 'r+') as f:
+            os.fsync(f.fileno())
+        with self.lock(user_id).write():
+            # The import lands after every row appended so far, by any process
+            sealed = self._rotate_segment(user_id)
+            seq = max([sealed] + self._list_segments(user_id)) + 1
+            self._active_segment[user_id] = seq + 1
+            os.replace(staging_path, self._segment_path(user_id, seq))
+            self._touch_manifest(user_id)
+        if os.path.getsize(self._segment_path(user_id, seq)) >= self.compaction_threshold:
+            self.compact_transactions_async(user_id)
+        return seq
+
+    @timed('storage.compact')
+    def compact_transactions(self, user_id='default'):
+        """Merge pending log segments into the base CSV file"""
+        with self.lock(user_id).write():
+            sealed = self._rotate_segment(user_id)
+            compacted_through = self._read_manifest(user_id)['compacted_through']
+        # Segments up to `sealed` no longer change, so merging can run unlocked
+        file_path = self._transactions_path(user_id)
+        try:
+            frames = [self.backend.read(file_path)] if os.path.exists(file_path) else []
+            frames.extend(self._read_segments(user_id, through_seq=sealed))
+        except FileNotFoundError:
+            # A concurrent full save already folded these segments in
+            return
+        merged = self._combine(frames)
+        tmp_path = self._write_base_tmp(user_id, merged, sealed)
+        with self.lock(user_id).write():
+            # Another save or compaction may have published a base while this
+            # one was merging, so the merge could miss or repeat rows
+            if self._read_manifest(user_id)['compacted_through'] == compacted_through:
+                self._publish_base(user_id, tmp_path, sealed, date_span(merged))
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def compact_transactions_async(self, user_id='default'):
+        """Start a background compaction unless one is already running"""
+        with self._locks_guard:
+            if user_id in self._compacting:
+                return None
+            self._compacting.add(user_id)
+
+        def run():
+            try:
+                self.compact_transactions(user_id)
+            finally:
+                with self._locks_guard:
+                    self._compacting.discard(user_id)
+
+        thread = threading.Thread(target=run, name=f'compact-{user_id}', daemon=True)
+        thread.start()
+        return thread
+
+    @timed('storage.load')
+    def load_transactions(self, user_id='default', date_from=None, date_to=None):
+        """Load transactions, optionally only those dated within [date_from, date_to].
+
+        A windowed load skips the base file when its recorded date range
+        does not overlap the window and filters the rows it does read (in
+        Arrow, before conversion, for the feather backend).
+        """
+        date_from = None if date_from is None else pd.Timestamp(date_from).normalize()
+        date_to = None if date_to is None else pd.Timestamp(date_to).normalize()
+        lock = self.lock(user_id)
+        if user_id not in self._active_segment:
+            # First touch in this process: finish any interrupted compaction
+            with lock.write():
+                self._current_segment(user_id)
+        with lock.read():
+            file_path = self._transactions_path(user_id)
+            frames = []
+            if os.path.exists(file_path) and self._base_overlaps(user_id, date_from, date_to):
+                frames.append(self.backend.read(file_path, date_from, date_to))
+            frames.extend(rows_between(frame, date_from, date_to) for frame in self._read_segments(user_id))
+        return self._combine(frames)
+
+    def _base_overlaps(self, user_id, date_from, date_to):
+        """Whether the base file may hold rows within [date_from, date_to]"""
+        if date_from is None and date_to is None:
+            return True
+        dates = self._read_manifest(user_id).get('base_dates')
+        if not dates:
+            # Written before date ranges were recorded
+            return True
+        first, last = pd.Timestamp(dates[0]), pd.Timestamp(dates[1])
+        return (date_from is None or last >= date_from) and (date_to is None or first <= date_to)
+
+    def _combine(self, frames):
+        """Concatenate base and segment frames, re-typing for typed backends"""
+        if not frames:
+            return pd.DataFrame(columns=TRANSACTION_COLUMNS)
+        combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        if self.backend.typed and not isinstance(combined['Category'].dtype, pd.CategoricalDtype):
+            # Log segments are CSV text, so typed columns degrade to object on concat
+            combined = typed_transactions(combined)
+        return combined
+
+    def export_transactions_csv(self, file_obj, user_id='default', date_from=None, date_to=None):
+        """Write a user's transactions (base and pending log), optionally only
+        those dated within [date_from, date_to], as CSV"""
+        transactions = self.load_transactions(user_id, date_from, date_to)
+        transactions.to_csv(file_obj, index=False, columns=TRANSACTION_COLUMNS, date_format='%Y-%m-%d')
+
+    def signature(self, user_id='default'):
+        """Cheap fingerprint (mtime, size) of a user's files to detect outside changes"""
+        paths = [
+            self._transactions_path(user_id),
+            self._manifest_path(user_id),
+            os.path.join(self.data_dir, f'{user_id}_budgets.json'),
+            os.path.join(self.data_dir, f'{user_id}_income.json'),
+            os.path.join(self.data_dir, f'{user_id}_alerts.json')
+        ]
+        entries = []
+        for file_path in paths:
+            try:
+                stat = os.stat(file_path)
+                entries.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                entries.append(None)
+        return tuple(entries)
+
+    def clear_user_data(self, user_id='default'):
+        """Remove every data file belonging to a user"""
+        with self.lock(user_id).write():
+            prefixes = (f'{user_id}_transactions.', f'{user_id}_budgets.', f'{user_id}_income.',
+                        f'{user_id}_alerts.')
+            for name in os.listdir(self.data_dir):
+                if name.startswith(prefixes):
+                    os.remove(os.path.join(self.data_dir, name))
+            self._active_segment.pop(user_id, None)
+
     def save_budgets(self, budget_categories, user_id='default'):
         """Save budget categories to JSON file"""
         file_path = os.path.join(self.data_dir, f'{user_id}_budgets.json')
-        with open(file_path, 'w') as f:
-            json.dump(budget_categories, f)
+        with self.lock(user_id).write():
+            self._write_json(file_path, budget_categories)
+            self._stamp_mtime(file_path)
     
     def load_budgets(self, user_id='default'):
         """Load budget categories from JSON file"""
@@ -34,25 +559,14 @@ class DataStorage:
             with open(file_path, 'r') as f:
                 return json.load(f)
         else:
-            return {
-                'Food & Dining': 5000, 
-                'Transportation': 3000, 
-                'Entertainment': 2000, 
-                'Utilities': 2500, 
-                'Shopping': 3000, 
-                'Healthcare': 1500, 
-                'Rent': 10000,
-                'Education': 4000,
-                'Personal Care': 1500,
-                'Investments': 5000,
-                'Other': 2000
-            }
+            return dict(DEFAULT_BUDGETS)
     
     def save_income_sources(self, income_sources, user_id='default'):
         """Save income sources to JSON file"""
         file_path = os.path.join(self.data_dir, f'{user_id}_income.json')
-        with open(file_path, 'w') as f:
-            json.dump(income_sources, f)
+        with self.lock(user_id).write():
+            self._write_json(file_path, income_sources)
+            self._stamp_mtime(file_path)
     
     def load_income_sources(self, user_id='default'):
         """Load income sources from JSON file"""
@@ -61,10 +575,44 @@ class DataStorage:
             with open(file_path, 'r') as f:
                 return json.load(f)
         else:
-            return {
-                'Salary': 50000, 
-                'Freelance': 15000, 
-                'Investments': 5000,
-                'Business': 20000,
-                'Other Income': 5000
-            }
\ No newline at end of file
+            return dict(DEFAULT_INCOME_SOURCES)
+    
+    def save_alert_thresholds(self, thresholds, user_id='default'):
+        """Save budget alert levels (percent of budget) to JSON file"""
+        file_path = os.path.join(self.data_dir, f'{user_id}_alerts.json')
+        with self.lock(user_id).write():
+            self._write_json(file_path, thresholds)
+            self._stamp_mtime(file_path)
+    
+    def load_alert_thresholds(self, user_id='default'):
+        """Load budget alert levels from JSON file"""
+        file_path = os.path.join(self.data_dir, f'{user_id}_alerts.json')
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as f:
+                return json.load(f)
+        else:
+            return list(DEFAULT_ALERT_THRESHOLDS)
+
+def migrate_transactions(data_dir='data', source='csv', target='feather'):
+    """One-shot conversion of every user's transactions between backends.
+
+    Pending log segments are folded into the new base file. Users that
+    already have a base file in the target format are skipped, so an
+    interrupted migration can simply be re-run.
+    """
+    source_storage = DataStorage(data_dir, backend=source)
+    target_storage = DataStorage(data_dir, backend=target)
+    pattern = re.compile(r'(.+)_transactions\.' + re.escape(source_storage.backend.extension) + '$')
+    migrated = []
+    for name in sorted(os.listdir(data_dir)):
+        match = pattern.match(name)
+        if not match:
+            continue
+        user_id = match.group(1)
+        if os.path.exists(target_storage._transactions_path(user_id)):
+            continue
+        transactions = source_storage.load_transactions(user_id)
+        target_storage.save_transactions(transactions, user_id)
+        os.remove(source_storage._transactions_path(user_id))
+        migrated.append(user_id)
+    return migrated
\ No newline at end of file
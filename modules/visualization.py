@@ -1,15 +1,60 @@
-import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
 import json
+import threading
+from collections import OrderedDict
+from modules.aggregates import MonthlyAggregates
+from modules.analytics import AnalyticsEngine
+from modules.instrumentation import span
+from modules.lazy import lazy_import
+
+# Plotly loads on the first chart render, not at application start
+go = lazy_import('plotly.graph_objects')
 
 class ChartGenerator:
+    # Rendered outputs keyed by (chart, cache_key, output); cache_key should
+    # identify the data version and any chart parameters
+    CACHE_SIZE = 256
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    
     @staticmethod
-    def create_expense_pie_chart(expense_data):
+    def _render(chart, build_figure, output, cache_key):
+        """Build a figure and serialize it as an HTML fragment or compact JSON,
+        reusing a previous result for the same cache_key"""
+        key = (chart, cache_key, output)
+        if cache_key is not None:
+            with ChartGenerator._cache_lock:
+                if key in ChartGenerator._cache:
+                    ChartGenerator._cache.move_to_end(key)
+                    return ChartGenerator._cache[key]
+        
+        with span(f'chart.{chart}'):
+            fig = build_figure()
+            if fig is None:
+                rendered = None
+            elif output == 'json':
+                # Figure data and layout only, for client-side Plotly.react
+                rendered = fig.to_json()
+            else:
+                rendered = fig.to_html(full_html=False)
+        
+        if cache_key is not None:
+            with ChartGenerator._cache_lock:
+                ChartGenerator._cache[key] = rendered
+                while len(ChartGenerator._cache) > ChartGenerator.CACHE_SIZE:
+                    ChartGenerator._cache.popitem(last=False)
+        return rendered
+    
+    @staticmethod
+    def create_expense_pie_chart(expense_data, output='html', cache_key=None):
         """Create a pie chart for expense distribution"""
         if not expense_data:
             return None
-            
+        return ChartGenerator._render('expense_pie', lambda: ChartGenerator._expense_pie_figure(expense_data),
+                                      output, cache_key)
+    
+    @staticmethod
+    def _expense_pie_figure(expense_data):
         try:
             # Get the last month's data
             if isinstance(expense_data, dict):
@@ -31,30 +76,32 @@ class ChartGenerator:
                 title='Expense Distribution',
                 height=400
             )
-            return fig.to_html(full_html=False)
+            return fig
         except Exception as e:
             print(f"Error creating pie chart: {e}")
             return None
     
     @staticmethod
-    def create_monthly_trends_chart(transactions_df):
-        """Create monthly income, expenses, and savings chart"""
+    def create_monthly_trends_chart(monthly_data, output='html', cache_key=None):
+        """Create monthly income, expenses, and savings chart from an AnalyticsResult,
+        a MonthlyAggregates cube or a transactions DataFrame (aggregated first)"""
+        return ChartGenerator._render('monthly_trends', lambda: ChartGenerator._monthly_trends_figure(monthly_data),
+                                      output, cache_key)
+    
+    @staticmethod
+    def _monthly_trends_figure(monthly_data):
         try:
-            expenses = transactions_df[transactions_df['Type'] == 'Expense']
-            income = transactions_df[transactions_df['Type'] == 'Income']
+            if isinstance(monthly_data, pd.DataFrame):
+                monthly_data = MonthlyAggregates.from_transactions(monthly_data)
+            if isinstance(monthly_data, MonthlyAggregates):
+                monthly_data = AnalyticsEngine.compute(monthly_data)
             
-            if expenses.empty or income.empty:
+            if not monthly_data.has_savings_data:
                 return None
-                
-            expenses['Date'] = pd.to_datetime(expenses['Date'])
-            income['Date'] = pd.to_datetime(income['Date'])
-            
-            expenses['Month'] = expenses['Date'].dt.to_period('M')
-            income['Month'] = income['Date'].dt.to_period('M')
             
-            monthly_expenses = expenses.groupby('Month')['Amount'].sum()
-            monthly_income = income.groupby('Month')['Amount'].sum()
-            monthly_savings = monthly_income - monthly_expenses
+            monthly_expenses = monthly_data.monthly_expenses
+            monthly_income = monthly_data.monthly_income
+            monthly_savings = monthly_data.monthly_savings
             
             # Convert Period index to string for JSON serialization
             months = [str(m) for m in monthly_income.index]
@@ -87,17 +134,21 @@ class ChartGenerator:
                 height=400
             )
             
-            return fig.to_html(full_html=False)
+            return fig
         except Exception as e:
             print(f"Error creating trends chart: {e}")
             return None
     
     @staticmethod
-    def create_forecast_chart(forecast_data):
+    def create_forecast_chart(forecast_data, output='html', cache_key=None):
         """Create a bar chart for budget forecast"""
         if not forecast_data:
             return None
-            
+        return ChartGenerator._render('forecast', lambda: ChartGenerator._forecast_figure(forecast_data),
+                                      output, cache_key)
+    
+    @staticmethod
+    def _forecast_figure(forecast_data):
         try:
             months = list(forecast_data.keys())
             categories_data = {}
@@ -126,7 +177,7 @@ class ChartGenerator:
                 height=400
             )
             
-            return fig.to_html(full_html=False)
+            return fig
         except Exception as e:
             print(f"Error creating forecast chart: {e}")
             return None
\ No newline at end of file
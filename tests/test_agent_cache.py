@@ -0,0 +1,84 @@
+from modules.agent_cache import AgentCache
+from modules.financial_agent import FinancialManagementAgent
+from modules.sample_data import generate_transactions
+from modules.storage import DataStorage
+from modules.sqlite_storage import SQLiteStorage
+
+def loader_for(storage):
+    def load(user_id):
+        agent = FinancialManagementAgent()
+        agent.transactions = storage.load_transactions(user_id)
+        agent.budget_categories = storage.load_budgets(user_id)
+        return agent
+    return load
+
+def worker_caches(tmp_path, user_id='alice'):
+    """Two caches over separate storage objects on one directory, as in two
+    worker processes, both warm and never revalidating on their own"""
+    seed = DataStorage(str(tmp_path))
+    seed.save_transactions(generate_transactions(rows=40, months=2, seed=5), user_id)
+    caches = []
+    for _ in range(2):
+        storage = DataStorage(str(tmp_path))
+        cache = AgentCache(storage, revalidate_interval=3600)
+        cache.get(user_id, loader_for(storage))
+        caches.append(cache)
+    return caches
+
+def update_budget(cache, user_id, category, amount):
+    with cache.write(user_id, loader_for(cache.storage)) as agent:
+        agent.budget_categories[category] = amount
+        cache.storage.save_budgets(agent.budget_categories, user_id)
+
+def test_writes_from_two_workers_are_not_lost(tmp_path):
+    first, second = worker_caches(tmp_path)
+    update_budget(first, 'alice', 'Food & Dining', 111.0)
+    # The second worker's cached agent predates the first write
+    update_budget(second, 'alice', 'Shopping', 222.0)
+    update_budget(first, 'alice', 'Utilities', 333.0)
+    budgets = DataStorage(str(tmp_path)).load_budgets('alice')
+    assert budgets['Food & Dining'] == 111.0
+    assert budgets['Shopping'] == 222.0
+    assert budgets['Utilities'] == 333.0
+
+def test_write_sees_rows_added_by_another_worker(tmp_path):
+    first, second = worker_caches(tmp_path)
+    with first.write('alice', loader_for(first.storage)) as agent:
+        row = {'Date': '2026-03-01', 'Description': 'Rent', 'Amount': 9000.0,
+               'Category': 'Housing', 'Type': 'Expense'}
+        agent.add_transaction(*row.values())
+        first.storage.append_transaction(row, 'alice')
+    with second.write('alice', loader_for(second.storage)) as agent:
+        assert len(agent.transactions) == 41
+
+def test_lazy_row_load_is_measured_and_evicts(tmp_path):
+    storage = SQLiteStorage(str(tmp_path))
+    for user_id in ('alice', 'bob'):
+        storage.save_transactions(generate_transactions(rows=5000, months=12, seed=6), user_id)
+    def load(user_id):
+        agent = FinancialManagementAgent()
+        agent.use_store(storage, user_id)
+        return agent
+    cache = AgentCache(storage, max_bytes=10 ** 9)
+    cache.get('bob', load)
+    with cache.read('alice', load) as agent:
+        # Rows are not loaded yet, so the entry starts out small
+        assert cache.stats()['bytes'] < 10000
+        cache.max_bytes = 100000
+        agent.transactions
+    # Loading the rows brought the cache over budget; the older entry went
+    assert cache.stats()['bytes'] > 100000
+    assert cache.stats()['entries'] == 1
+
+def test_writes_are_measured(tmp_path):
+    first, _ = worker_caches(tmp_path)
+    before = first.stats()['bytes']
+    with first.write('alice', loader_for(first.storage)) as agent:
+        agent.add_transactions(generate_transactions(rows=2000, months=2, seed=7))
+    assert first.stats()['bytes'] > before + 2000 * 16
+    with first.write('alice', loader_for(first.storage)) as agent:
+        for day in range(1, 21):
+            agent.add_transaction(f'2026-04-{day:02d}', 'Coffee', 4.5, 'Food & Dining', 'Expense')
+    # Buffered inserts count without merging the buffer
+    assert agent.loaded_state()[1] == 20
+    assert first.stats()['bytes'] > before + 2020 * 16
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import threading
+import pytest
+from modules.alerts import AlertFeed, BudgetAlertMonitor, crossed_thresholds
+from modules.financial_agent import FinancialManagementAgent
+
+def test_crossed_thresholds():
+    assert crossed_thresholds(3000, 4100, 5000, [100, 80]) == [80]
+    assert crossed_thresholds(3000, 6000, 5000, [80, 100]) == [80, 100]
+    # Already past a level, or no budget: nothing new
+    assert crossed_thresholds(4100, 4500, 5000, [80, 100]) == []
+    assert crossed_thresholds(0, 100, 0, [80, 100]) == []
+
+def test_feed_ids_increase_across_users_and_resume():
+    feed = AlertFeed(history=2)
+    start = feed.last_id
+    feed.publish('alice', [{'n': 1}, {'n': 2}])
+    feed.publish('bob', [{'n': 3}])
+    feed.publish('alice', [{'n': 4}])
+    assert feed.last_id == start + 4
+    # Only the newest alerts are kept per user
+    assert [alert['n'] for alert in feed.since('alice')] == [2, 4]
+    assert [alert['n'] for alert in feed.since('alice', start + 2)] == [4]
+    feed.forget('alice')
+    assert feed.since('alice') == [] and len(feed.since('bob')) == 1
+
+def test_wait_wakes_on_publish_and_times_out():
+    feed = AlertFeed()
+    last_id = feed.last_id
+    assert feed.wait('alice', last_id, timeout=0.05) == []
+    timer = threading.Timer(0.1, feed.publish, ['alice', [{'n': 1}]])
+    timer.start()
+    assert [alert['n'] for alert in feed.wait('alice', last_id, timeout=10)] == [1]
+    timer.join()
+
+def test_monitor_alerts_once_per_threshold():
+    agent = FinancialManagementAgent()
+    agent.budget_categories = {'Shopping': 1000}
+    monitor = BudgetAlertMonitor(AlertFeed())
+    raised = []
+    for day, amount in ((1, 500), (2, 400), (3, 50), (4, 200)):
+        date = f'2026-03-{day:02d}'
+        agent.add_transaction(date, 'Shop', amount, 'Shopping', 'Expense')
+        raised.append([alert['threshold'] for alert in
+                       monitor.check('alice', agent, date, amount, 'Shopping', 'Expense')])
+    assert raised == [[], [80], [], [100]]
+    assert monitor.check('alice', agent, '2026-03-05', 10, 'Salary', 'Income') == []
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    # app.py keeps its data in ./data, so import it from a scratch directory
+    previous_cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    sys.modules.pop('app', None)
+    try:
+        import app
+        yield app
+        app.job_runner.shutdown()
+    finally:
+        sys.modules.pop('app', None)
+        os.chdir(previous_cwd)
+
+@pytest.fixture
+def client(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'ALERT_STREAM_SECONDS', 0.6)
+    monkeypatch.setattr(app_module, 'ALERT_KEEPALIVE_SECONDS', 0.2)
+    client = app_module.app.test_client()
+    client.post('/switch_user', json={'user_id': 'stream-user'})
+    client.post('/update_budgets', json={'Shopping': 1000})
+    yield client
+    client.post('/clear_data')
+
+def events(body):
+    """Parsed SSE events (comments dropped) as dicts of field -> value"""
+    parsed = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if not line.startswith(':'))
+        if fields:
+            parsed.append(fields)
+    return parsed
+
+def spend(client, day, amount):
+    response = client.post('/add_transaction', json={
+        'date': f'2026-03-{day:02d}', 'description': 'Shop', 'amount': amount,
+        'category': 'Shopping', 'type': 'Expense'})
+    return response.get_json()['alerts']
+
+def test_stream_starts_with_ready_and_ends_after_its_lifetime(client):
+    response = client.get('/alerts/stream')
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    first = events(body)[0]
+    assert first['event'] == 'ready' and first['retry'] == '5000'
+    assert first['id'] == first['data']
+    assert ': keepalive' in body
+
+def test_stream_delivers_alerts_raised_while_open(client):
+    response = client.get('/alerts/stream', buffered=False)
+    chunks = iter(response.response)
+    ready = events(next(chunks).decode())[0]
+    assert spend(client, 1, 900)[0]['threshold'] == 80
+    body = b''.join(chunks).decode()
+    response.close()
+    alerts = [event for event in events(body) if event.get('event') == 'budget_alert']
+    assert len(alerts) == 1 and int(alerts[0]['id']) > int(ready['id'])
+    assert json.loads(alerts[0]['data'])['threshold'] == 80
+
+def test_reconnect_with_last_event_id_replays_missed_alerts(client):
+    ready = events(client.get('/alerts/stream').get_data(as_text=True))[0]
+    # Raised while no stream was open
+    spend(client, 1, 850)
+    spend(client, 2, 200)
+    body = client.get('/alerts/stream', headers={'Last-Event-ID': ready['id']}).get_data(as_text=True)
+    alerts = [event for event in events(body) if event.get('event') == 'budget_alert']
+    assert [json.loads(alert['data'])['threshold'] for alert in alerts] == [80, 100]
+    # The same missed alerts through the polling endpoint
+    polled = client.get(f"/alerts?since={ready['id']}").get_json()['alerts']
+    assert [alert['id'] for alert in polled] == [int(alert['id']) for alert in alerts]
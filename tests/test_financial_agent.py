@@ -0,0 +1,56 @@
+import pandas as pd
+from modules.financial_agent import FinancialManagementAgent
+from modules.query import TransactionQuery, SortedIndex
+from modules.sample_data import generate_transactions
+
+def loaded_agent(rows=500):
+    agent = FinancialManagementAgent()
+    agent.transactions = generate_transactions(rows=rows, months=6, seed=2)
+    # Derived structures exist, as on a warm cached agent
+    agent.aggregates, agent.date_index
+    return agent
+
+def test_added_rows_are_buffered_until_read():
+    agent = loaded_agent()
+    frame = agent.loaded_transactions
+    agent.add_transaction('2026-01-15', 'Groceries', 420.0, 'Food & Dining', 'Expense')
+    agent.add_transaction('2026-01-16', 'Salary', 50000, 'Salary', 'Income')
+    # The insert neither copied the frame nor rebuilt the index
+    assert agent._transactions is frame and len(agent._tail) == 2
+    assert agent.aggregates.amount(pd.Period('2026-01', 'M'), 'Food & Dining', 'Expense') >= 420.0
+    assert len(agent.transactions) == 502 and not agent._tail
+    assert agent.transactions['Description'].iloc[-2:].tolist() == ['Groceries', 'Salary']
+
+def test_buffered_rows_match_a_full_rebuild():
+    agent = loaded_agent()
+    for day in range(1, 29):
+        agent.add_transaction(f'2025-12-{day:02d}', f'row {day}', day * 10.0, 'Shopping', 'Expense')
+    rebuilt = FinancialManagementAgent()
+    rebuilt.transactions = agent.transactions.copy()
+    pd.testing.assert_frame_equal(agent.categorize_expenses(), rebuilt.categorize_expenses())
+    query = TransactionQuery(date_from='2025-12-10', date_to='2025-12-20', limit=500, sort='date_asc')
+    page, _ = agent.query_transactions(query)
+    expected, _ = rebuilt.query_transactions(query)
+    assert page['Description'].tolist() == expected['Description'].tolist()
+    amount_page, _ = agent.query_transactions(TransactionQuery(sort='amount_desc', limit=5))
+    assert amount_page['Amount'].tolist() == sorted(agent.transactions['Amount'], reverse=True)[:5]
+
+def test_buffer_merges_past_threshold():
+    agent = loaded_agent(rows=100)
+    for i in range(agent.TAIL_MIN_ROWS):
+        agent.add_transaction('2026-02-01', f'row {i}', 1.0, 'Other', 'Expense')
+    assert not agent._tail and len(agent._transactions) == 100 + agent.TAIL_MIN_ROWS
+
+def test_amount_index_is_extended_not_rebuilt():
+    agent = loaded_agent()
+    index = agent.amount_index
+    agent.add_transaction('2026-01-15', 'Laptop', 99999.0, 'Shopping', 'Expense')
+    agent.add_transactions(generate_transactions(rows=50, months=1, seed=8))
+    assert agent.amount_index is index
+    expected = SortedIndex(agent.transactions['Amount'].to_numpy())
+    assert (index.order == expected.order).all() and (index.keys == expected.keys).all()
+    page, cursor = agent.query_transactions(TransactionQuery(sort='amount_desc', limit=3))
+    assert page['Description'].iloc[0] == 'Laptop'
+    rest, _ = agent.query_transactions(TransactionQuery(sort='amount_desc', limit=100, cursor=cursor))
+    amounts = sorted(agent.transactions['Amount'], reverse=True)[:103]
+    assert page['Amount'].tolist() + rest['Amount'].tolist() == amounts
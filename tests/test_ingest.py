@@ -0,0 +1,59 @@
+import io
+import pytest
+from modules.ingest import TransactionImporter
+from modules.storage import DataStorage, DEFAULT_BUDGETS, DEFAULT_INCOME_SOURCES
+from modules.sqlite_storage import SQLiteStorage
+
+CSV = '''date,description,amount,category,type
+2026-01-05,Groceries,"1,250.50",food & dining,expense
+05/01/2026,Salary,50000,salary,credit
+not a date,Broken,10,Shopping,Expense
+2026-01-07,Refund,-300,,
+'''
+
+JSONL = '''{"date": "2026-02-01", "amount": 120, "category": "Shopping", "type": "Expense"}
+{"date": "2026-02-02", "amount":
+[1, 2, 3]
+
+{"date": "2026-02-03", "amount": "80", "category": "Transportation", "type": "debit"}
+'''
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def storage(request, tmp_path):
+    return DataStorage(str(tmp_path)) if request.param == 'csv' else SQLiteStorage(str(tmp_path))
+
+def importer_for(storage, chunk_rows=None):
+    return TransactionImporter(storage, DEFAULT_BUDGETS, DEFAULT_INCOME_SOURCES, chunk_rows=chunk_rows)
+
+def test_csv_rows_are_validated_and_committed(storage):
+    result = importer_for(storage).import_csv(io.BytesIO(CSV.encode()), 'alice')
+    assert (result['imported'], result['rejected']) == (3, 1)
+    assert result['errors'] == [{'row': 3, 'error': 'invalid date'}]
+    rows = storage.load_transactions('alice')
+    assert sorted(rows['Amount'].tolist()) == [300.0, 1250.5, 50000.0]
+    # A negative amount with no type is an expense, filed under the fallback category
+    refund = rows[rows['Description'] == 'Refund'].iloc[0]
+    assert (refund['Type'], refund['Category']) == ('Expense', 'Other')
+
+def test_malformed_json_lines_are_rejected_not_fatal(storage):
+    result = importer_for(storage, chunk_rows=2).import_jsonl(io.StringIO(JSONL), 'alice')
+    assert (result['imported'], result['rejected']) == (2, 2)
+    assert result['errors'] == [{'row': 2, 'error': 'malformed JSON line'},
+                                {'row': 3, 'error': 'malformed JSON line'}]
+    assert len(storage.load_transactions('alice')) == 2
+
+def test_failed_import_lands_nothing(storage):
+    def fail(batch):
+        raise RuntimeError('client went away')
+    with pytest.raises(RuntimeError):
+        importer_for(storage).import_csv(io.BytesIO(CSV.encode()), 'alice', on_batch=fail)
+    assert len(storage.load_transactions('alice')) == 0
+
+def test_staged_rows_are_read_back_before_commit(storage):
+    staged = {}
+    def commit(staging_path):
+        staged['rows'] = storage.read_staged(staging_path)
+        return storage.commit_import(staging_path, 'alice')
+    importer_for(storage, chunk_rows=1).import_csv(io.BytesIO(CSV.encode()), 'alice', commit=commit)
+    assert staged['rows']['Description'].tolist() == ['Groceries', 'Salary', 'Refund']
+    assert staged['rows']['Amount'].tolist() == [1250.5, 50000.0, 300.0]
@@ -0,0 +1,69 @@
+import os
+import threading
+import pytest
+from modules.jobs import JobRunner, JobLimitExceeded
+
+@pytest.fixture
+def runner():
+    runner = JobRunner(workers=1, threads=4, per_user=2, keep=4)
+    yield runner
+    runner.shutdown()
+
+def blocked(runner, user_id, kind, key=None):
+    """Submit a job that runs until the returned event is set"""
+    release = threading.Event()
+    return runner.submit(user_id, kind, release.wait, 10, key=key), release
+
+def test_per_user_limit(runner):
+    first, release_first = blocked(runner, 'alice', 'report', key=1)
+    second, release_second = blocked(runner, 'alice', 'report', key=2)
+    with pytest.raises(JobLimitExceeded):
+        runner.submit('alice', 'report', sum, [1, 2], key=3)
+    # Other users are not held back by alice's jobs
+    assert runner.submit('bob', 'report', sum, [1, 2]).wait(5)
+    release_first.set()
+    assert first.wait(5) and first.status == 'done'
+    assert runner.submit('alice', 'report', sum, [1, 2], key=3).wait(5)
+    release_second.set()
+    assert second.wait(5)
+
+def test_equal_submissions_share_one_job(runner):
+    job, release = blocked(runner, 'alice', 'snapshot', key='v1')
+    assert runner.submit('alice', 'snapshot', sum, [1], key='v1') is job
+    assert runner.active('alice', 'snapshot') is job
+    other = runner.submit('alice', 'snapshot', sum, [1], key='v2')
+    assert other is not job and other.wait(5)
+    release.set()
+    assert job.wait(5)
+    # Finished jobs are not shared; the same key runs again
+    assert runner.submit('alice', 'snapshot', sum, [1], key='v1') is not job
+
+def test_failures_and_callbacks(runner):
+    failed = runner.submit('alice', 'report', int, 'not a number')
+    assert failed.wait(5) and failed.status == 'failed' and 'invalid literal' in failed.error
+    results = []
+    done = runner.submit('alice', 'report', sum, [1, 2], on_done=results.append)
+    assert done.wait(5) and done.result == 3 and results == [3]
+    assert runner.latest('alice', 'report') is done
+    def reject(result):
+        raise ValueError('rejected')
+    rejected = runner.submit('alice', 'report', sum, [1], on_done=reject)
+    assert rejected.wait(5) and rejected.error == 'rejected' and rejected.result is None
+    # The last successful run stays the latest
+    assert runner.latest('alice', 'report') is done
+    runner.forget('alice')
+    assert runner.latest('alice', 'report') is None
+
+def test_finished_jobs_are_trimmed_but_latest_kept(runner):
+    jobs = []
+    for i in range(8):
+        jobs.append(runner.submit('alice', 'report', sum, [i], key=i))
+        jobs[-1].wait(5)
+    runner.submit('alice', 'report', sum, [9], key=9).wait(5)
+    assert runner.get(jobs[0].id) is None
+    assert runner.latest('alice', 'report').result == 9
+
+def test_process_jobs_run_in_another_process(runner):
+    job = runner.submit('alice', 'train_model', os.getpid, process=True)
+    assert job.wait(120) and job.error is None
+    assert job.result != os.getpid()
@@ -0,0 +1,74 @@
+import os
+import time
+import threading
+import multiprocessing
+import pytest
+from modules.locking import ReadWriteLock, LockTable
+
+def test_readers_share_and_writers_exclude():
+    lock = ReadWriteLock()
+    inside, most_readers, writer_saw = [], [0], []
+    guard = threading.Lock()
+
+    def read():
+        with lock.read():
+            with guard:
+                inside.append(1)
+                most_readers[0] = max(most_readers[0], len(inside))
+            time.sleep(0.05)
+            with guard:
+                inside.pop()
+
+    def write():
+        with lock.write():
+            writer_saw.append(len(inside))
+
+    threads = [threading.Thread(target=read) for _ in range(4)] + [threading.Thread(target=write)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert most_readers[0] > 1 and writer_saw == [0]
+
+def test_writer_reenters_and_reads_but_readers_cannot_upgrade():
+    lock = ReadWriteLock()
+    with lock.write():
+        with lock.write(), lock.read():
+            pass
+    with lock.read():
+        with pytest.raises(RuntimeError):
+            lock.acquire_write()
+    # Fully released: another thread can write
+    done = threading.Event()
+    threading.Thread(target=lambda: (lock.acquire_write(), lock.release_write(), done.set())).start()
+    assert done.wait(5)
+
+def test_discard_keeps_held_locks():
+    table = LockTable()
+    lock = table['u']
+    with lock.write():
+        table.discard('u')
+        assert table['u'] is lock
+    table.discard('u')
+    assert table['u'] is not lock
+
+def hold_write(lock_path, marker):
+    with ReadWriteLock(lock_path).write():
+        open(marker, 'w').close()
+        time.sleep(1)
+        with open(marker, 'w') as f:
+            f.write('released')
+
+def test_write_lock_excludes_other_processes(tmp_path):
+    lock_path, marker = str(tmp_path / 'u.lock'), str(tmp_path / 'marker')
+    worker = multiprocessing.get_context('spawn').Process(target=hold_write, args=(lock_path, marker))
+    worker.start()
+    deadline = time.monotonic() + 60
+    while not os.path.exists(marker) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Blocks until the other process is done with its write section
+    with ReadWriteLock(lock_path).read():
+        with open(marker) as f:
+            assert f.read() == 'released'
+    worker.join(30)
+    assert worker.exitcode == 0
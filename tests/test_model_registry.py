@@ -0,0 +1,115 @@
+import gc
+import threading
+import pytest
+from modules.financial_agent import FinancialManagementAgent
+from modules.jobs import JobRunner, JobLimitExceeded
+from modules.model_registry import ModelRegistry, ModelNotReady
+from modules.sample_data import generate_transactions
+
+def trained(tmp_path, name, categories, seed):
+    agent = FinancialManagementAgent()
+    agent.transactions = generate_transactions(rows=300, months=6, seed=seed, expense_categories=categories,
+                                               income_categories=['Salary'])
+    registry = ModelRegistry(str(tmp_path / name), model_kind='incremental')
+    meta = registry.train(agent, 'u')
+    return registry, agent, meta
+
+def test_attach_swaps_the_whole_model(tmp_path):
+    registry, agent, meta = trained(tmp_path, 'a', ['Rent', 'Shopping'], seed=1)
+    served = agent.served_model
+    assert agent.model_version == meta['version'] and agent.model_score == meta['score']
+    assert set(served.category_codes) == {'Rent', 'Shopping'}
+    other_registry, _, other_meta = trained(tmp_path, 'b', ['Rent', 'Shopping', 'Utilities', 'Transportation'], seed=2)
+    other_registry.attach(agent, 'u', other_meta)
+    # The old version is left intact for readers still holding it
+    assert agent.served_model is not served
+    assert set(served.category_codes) == {'Rent', 'Shopping'}
+    assert served.prediction_table.shape[-1] == 2
+    assert isinstance(agent.predict_expense(1, 15, 3, 0, 'Utilities'), float)
+
+def test_predictions_stay_consistent_while_versions_land(tmp_path):
+    registry, agent, meta = trained(tmp_path, 'a', ['Rent', 'Shopping'], seed=1)
+    other_registry, _, other_meta = trained(tmp_path, 'b', ['Utilities', 'Transportation', 'Rent'], seed=2)
+    errors, stop = [], threading.Event()
+
+    def predict():
+        while not stop.is_set():
+            for category in ('Rent', 'Shopping', 'Utilities', 'Transportation'):
+                try:
+                    result = agent.predict_expense(2, 10, 5, 0, category)
+                    assert result == "Category not recognized" or isinstance(result, float)
+                    agent.predict_expenses('2026-01-01', '2026-01-07', [category])
+                except ValueError:
+                    pass
+                except Exception as e:
+                    errors.append(e)
+
+    readers = [threading.Thread(target=predict) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(200):
+        if i % 2:
+            registry.attach(agent, 'u', meta)
+        else:
+            other_registry.attach(agent, 'u', other_meta)
+    stop.set()
+    for reader in readers:
+        reader.join()
+    assert not errors
+
+def test_versions_are_kept_while_served(tmp_path):
+    registry, agent, meta = trained(tmp_path, 'a', ['Rent', 'Shopping'], seed=1)
+    # Another cached agent still serves version 1 and has not loaded its pickle
+    other = FinancialManagementAgent()
+    registry.attach(other, 'u', meta)
+    for _ in range(3):
+        registry.train(agent, 'u')
+    assert registry._versions('u') == [1, 3, 4]
+    assert isinstance(other.predict_expense(1, 40, 3, 0, 'Rent'), float)
+    del other
+    gc.collect()
+    registry.train(agent, 'u')
+    assert registry._versions('u') == [4, 5]
+
+def test_first_model_wait_is_bounded(tmp_path):
+    runner = JobRunner(workers=1, threads=1)
+    try:
+        registry = ModelRegistry(str(tmp_path), runner=runner, model_kind='incremental', wait_timeout=0)
+        agent = FinancialManagementAgent()
+        agent.transactions = generate_transactions(rows=300, months=6, seed=3)
+        with pytest.raises(ModelNotReady) as raised:
+            registry.ensure_model(agent, 'u', wait=True)
+        assert agent.model_state is None
+        assert raised.value.job.wait(120) and raised.value.job.error is None
+        # The finished fit was attached; the next call finds it
+        score = registry.ensure_model(agent, 'u', wait=True)
+        assert score is not None and score == agent.model_score
+    finally:
+        runner.shutdown()
+
+def test_job_limit_leaves_the_agent_due_for_training(tmp_path):
+    runner = JobRunner(workers=1, threads=1, per_user=1)
+    release = threading.Event()
+    try:
+        runner.submit('u', 'report', release.wait)
+        registry = ModelRegistry(str(tmp_path), runner=runner)
+        agent = FinancialManagementAgent()
+        agent.transactions = generate_transactions(rows=100, months=3, seed=4)
+        assert registry.ensure_model(agent, 'u') is None
+        assert agent.model_state is None
+        with pytest.raises(JobLimitExceeded):
+            registry.ensure_model(agent, 'u', wait=True)
+    finally:
+        release.set()
+        runner.shutdown()
+
+def test_pool_fits_share_the_cores(tmp_path, monkeypatch):
+    monkeypatch.delenv('MODEL_N_JOBS', raising=False)
+    monkeypatch.setattr('os.cpu_count', lambda: 8)
+    runner = JobRunner(workers=3, threads=1)
+    try:
+        assert ModelRegistry(str(tmp_path), runner=runner).training_options['n_jobs'] == 2
+        assert ModelRegistry(str(tmp_path), runner=runner, n_jobs=4).training_options['n_jobs'] == 4
+        assert ModelRegistry(str(tmp_path)).fit_cores() == -1
+    finally:
+        runner.shutdown()
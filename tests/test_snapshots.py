@@ -0,0 +1,35 @@
+import time
+from modules.jobs import JobRunner
+from modules.snapshots import SnapshotStore, SnapshotScheduler
+
+def scheduler_for(tmp_path, versions, computed):
+    def compute(user_id):
+        computed.append(user_id)
+        return {'version': versions[user_id], 'computed_at': time.time()}
+    store = SnapshotStore(str(tmp_path))
+    runner = JobRunner(workers=1, threads=1)
+    return store, runner, SnapshotScheduler(store, compute, versions.get, runner, interval=0)
+
+def test_sweep_refreshes_only_outdated_users_with_data(tmp_path):
+    versions = {'current': 'v1', 'outdated': 'v2', 'cleared': None}
+    computed = []
+    store, runner, scheduler = scheduler_for(tmp_path, versions, computed)
+    for user_id in versions:
+        store.put(user_id, {'version': 'v1', 'computed_at': time.time()})
+    scheduler._sweep()
+    runner.shutdown()
+    # A user whose data was cleared is not recomputed (which would reload it)
+    assert computed == ['outdated']
+    assert store.get('outdated')['version'] == 'v2'
+
+def test_outdated_snapshot_stays_readable_while_refreshing(tmp_path):
+    versions = {'alice': 'v2'}
+    computed = []
+    store, runner, scheduler = scheduler_for(tmp_path, versions, computed)
+    store.put('alice', {'version': 'v1', 'computed_at': time.time()})
+    assert scheduler.fresh('alice', 'v2') is None
+    assert store.get('alice')['version'] == 'v1'
+    job = scheduler.refresh('alice', 'v2')
+    job.wait(5)
+    runner.shutdown()
+    assert computed == ['alice'] and scheduler.fresh('alice', 'v2')['version'] == 'v2'
@@ -0,0 +1,132 @@
+import io
+import pandas as pd
+import pytest
+from modules.aggregates import MonthlyAggregates
+from modules.query import TransactionQuery
+from modules.sample_data import generate_transactions
+from modules.sqlite_storage import SQLiteStorage, migrate_to_sqlite
+from modules.storage import DataStorage, DEFAULT_BUDGETS
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path), pool_size=2)
+    yield storage
+    storage.pool.close()
+
+@pytest.fixture
+def sample():
+    return generate_transactions(rows=300, months=6, seed=3)
+
+def rows(frame):
+    return list(zip(pd.to_datetime(frame['Date']), frame['Description'].astype(str),
+                    frame['Amount'], frame['Category'].astype(str), frame['Type'].astype(str)))
+
+def cells(aggregates):
+    return {key: (round(amount, 2), count) for key, (amount, count) in aggregates._cells.items()}
+
+def test_saved_and_appended_rows_load_in_insertion_order(storage, sample):
+    storage.save_transactions(sample, 'alice')
+    row = {'Date': '2026-10-20', 'Description': 'Rent', 'Amount': 9000.0,
+           'Category': 'Housing', 'Type': 'Expense'}
+    storage.append_transaction(row, 'alice')
+    loaded = storage.load_transactions('alice')
+    assert rows(loaded) == rows(sample) + [(pd.Timestamp('2026-10-20'), 'Rent', 9000.0, 'Housing', 'Expense')]
+    # Users do not see each other's rows; saving replaces
+    assert storage.load_transactions('bob').empty
+    storage.save_transactions(sample.head(10), 'alice')
+    assert storage.count_transactions('alice') == 10
+
+def test_windowed_loads_and_aggregates_match_pandas(storage, sample):
+    storage.save_transactions(sample, 'alice')
+    dates = pd.to_datetime(sample['Date'])
+    first, last = dates.min() + pd.Timedelta(days=20), dates.max() - pd.Timedelta(days=20)
+    window = sample[(dates >= first) & (dates <= last)]
+    assert rows(storage.load_transactions('alice', first, last)) == rows(window)
+    assert cells(storage.monthly_aggregates('alice')) == cells(MonthlyAggregates.from_transactions(sample))
+    assert cells(storage.monthly_aggregates('alice', date_from=first, date_to=last)) == \
+        cells(MonthlyAggregates.from_transactions(window))
+
+@pytest.mark.parametrize('sort', sorted(TransactionQuery.SORTS))
+def test_pages_cover_every_row_once_in_order(storage, sample, sort):
+    storage.save_transactions(sample, 'alice')
+    seen, cursor = [], None
+    while True:
+        page, cursor = storage.query_transactions('alice', TransactionQuery(limit=40, sort=sort, cursor=cursor))
+        seen.extend(rows(page))
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(rows(sample))
+    key, descending = TransactionQuery.SORTS[sort]
+    keys = [row[0] if key == 'date' else row[2] for row in seen]
+    assert keys == sorted(keys, reverse=descending)
+
+def test_filtered_query(storage, sample):
+    storage.save_transactions(sample, 'alice')
+    query = TransactionQuery(categories=['Shopping', 'Healthcare'], transaction_type='Expense',
+                             min_amount=100, max_amount=2000, limit=500)
+    page, cursor = storage.query_transactions('alice', query)
+    expected = sample[sample['Category'].isin(['Shopping', 'Healthcare']) & (sample['Type'] == 'Expense')
+                      & sample['Amount'].between(100, 2000)]
+    assert cursor is None and sorted(rows(page)) == sorted(rows(expected))
+
+def test_every_write_bumps_the_signature(storage, sample):
+    versions = [storage.signature('alice')]
+    writes = [
+        lambda: storage.save_transactions(sample, 'alice'),
+        lambda: storage.append_transaction(sample.iloc[0].to_dict(), 'alice'),
+        lambda: storage.save_budgets({'Shopping': 100.0}, 'alice'),
+        lambda: storage.clear_user_data('alice')
+    ]
+    for write in writes:
+        write()
+        versions.append(storage.signature('alice'))
+    assert len(set(versions)) == len(versions)
+    assert storage.signature('bob') == (0,)
+
+def test_staged_import_lands_only_on_commit(storage, sample):
+    storage.save_transactions(sample.head(5), 'alice')
+    staging_id = storage.stage_import('alice')
+    storage.write_staged(staging_id, sample.iloc[5:8])
+    storage.write_staged(staging_id, sample.iloc[8:10])
+    assert storage.count_transactions('alice') == 5
+    assert rows(storage.read_staged(staging_id)) == rows(sample.iloc[5:10])
+    storage.commit_import(staging_id, 'alice')
+    assert rows(storage.load_transactions('alice')) == rows(sample.head(10))
+    assert storage.read_staged(staging_id).empty
+
+    discarded = storage.stage_import('alice')
+    storage.write_staged(discarded, sample.iloc[10:20])
+    storage.discard_import(discarded)
+    storage.commit_import(discarded, 'alice')
+    assert storage.count_transactions('alice') == 10
+
+def test_settings_clear_and_export(storage, sample):
+    assert storage.load_budgets('alice') == DEFAULT_BUDGETS
+    storage.save_budgets({'Shopping': 100.0}, 'alice')
+    storage.save_alert_thresholds([50, 100], 'alice')
+    storage.save_transactions(sample, 'alice')
+    assert storage.load_budgets('alice') == {'Shopping': 100.0}
+    assert storage.load_alert_thresholds('alice') == [50, 100]
+    assert storage.users() == ['alice']
+
+    exported = io.StringIO()
+    storage.export_transactions_csv(exported, 'alice', chunk_rows=64)
+    exported.seek(0)
+    assert len(pd.read_csv(exported)) == len(sample)
+
+    storage.clear_user_data('alice')
+    assert storage.load_transactions('alice').empty
+    assert storage.load_budgets('alice') == DEFAULT_BUDGETS
+    assert storage.users() == []
+
+def test_migration_copies_users_once(tmp_path, sample):
+    source = DataStorage(str(tmp_path))
+    source.save_transactions(sample, 'alice')
+    source.save_budgets({'Shopping': 100.0}, 'alice')
+    assert migrate_to_sqlite(str(tmp_path)) == ['alice']
+    # A re-run skips users already in the database
+    assert migrate_to_sqlite(str(tmp_path)) == []
+    target = SQLiteStorage(str(tmp_path))
+    assert rows(target.load_transactions('alice')) == rows(sample)
+    assert target.load_budgets('alice') == {'Shopping': 100.0}
+    target.pool.close()
@@ -0,0 +1,179 @@
+import os
+import multiprocessing
+import pandas as pd
+import pytest
+import modules.schema as schema
+from modules.financial_agent import FinancialManagementAgent
+from modules.sample_data import generate_transactions
+from modules.storage import DataStorage
+
+pytest.importorskip('pyarrow')
+
+def counting_rebuilds(monkeypatch):
+    """Count frames normalize_transactions had to rebuild (not already canonical)"""
+    rebuilt = []
+    is_canonical = schema.is_canonical
+    def checked(df):
+        canonical = is_canonical(df)
+        if not canonical:
+            rebuilt.append(len(df))
+        return canonical
+    monkeypatch.setattr(schema, 'is_canonical', checked)
+    return rebuilt
+
+def test_feather_base_loads_without_normalizing(tmp_path, monkeypatch):
+    storage = DataStorage(str(tmp_path), backend='feather')
+    generated = generate_transactions(rows=300, months=6, seed=3, end_date='2025-06-30')
+    storage.save_transactions(generated, 'alice')
+    agent = FinancialManagementAgent()
+    rebuilt = counting_rebuilds(monkeypatch)
+    loaded = storage.load_transactions('alice')
+    agent.transactions = loaded
+    # The base file holds the canonical schema, Month included, so the
+    # agent keeps the memory-mapped frame as is
+    assert agent.transactions is loaded and not rebuilt
+    dates = generated['Date'].sort_values(ignore_index=True)
+    date_from, date_to = dates[100].normalize(), dates[199].normalize()
+    window = storage.load_transactions('alice', date_from, date_to)
+    assert len(window) >= 100 and schema.is_canonical(window) and not rebuilt
+    assert window['Date'].between(date_from, date_to).all()
+    assert (window['Month'] == window['Date'].dt.to_period('M')).all()
+
+def test_feather_base_with_pending_log_is_normalized(tmp_path):
+    storage = DataStorage(str(tmp_path), backend='feather')
+    storage.save_transactions(generate_transactions(rows=50, months=2, seed=4), 'bob')
+    storage.append_transaction({'Date': '2026-02-01', 'Description': 'Rent', 'Amount': 9000.0,
+                                'Category': 'Housing', 'Type': 'Expense'}, 'bob')
+    agent = FinancialManagementAgent()
+    agent.transactions = storage.load_transactions('bob')
+    assert schema.is_canonical(agent.transactions) and len(agent.transactions) == 51
+    assert agent.transactions['Month'].iloc[-1] == pd.Period('2026-02', 'M')
+
+class Crash(Exception):
+    """Stands in for the process dying at this point"""
+
+def row(i):
+    return {'Date': f'2026-01-{i % 28 + 1:02d}', 'Description': f'row {i}', 'Amount': float(i),
+            'Category': 'Shopping', 'Type': 'Expense'}
+
+def logged_storage(tmp_path, backend='csv'):
+    """A base of rows 0-9 with rows 10-19 appended to the log"""
+    storage = DataStorage(str(tmp_path), backend=backend)
+    storage.save_transactions(pd.DataFrame([row(i) for i in range(10)]), 'u')
+    for i in range(10, 20):
+        storage.append_transaction(row(i), 'u')
+    return storage
+
+def descriptions(storage, user_id='u'):
+    return sorted(storage.load_transactions(user_id)['Description'], key=lambda text: int(text.split()[1]))
+
+def expected(count):
+    return [f'row {i}' for i in range(count)]
+
+def crash_when(monkeypatch, target, name, matches=lambda *args: True):
+    original = getattr(target, name)
+    def crashing(*args, **kwargs):
+        if matches(*args):
+            raise Crash(name)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(target, name, crashing)
+
+@pytest.mark.parametrize('backend', ['csv', 'feather'])
+@pytest.mark.parametrize('step', ['merge', 'publish', 'rename', 'cleanup'])
+def test_crash_at_each_compaction_step_loses_and_repeats_nothing(tmp_path, monkeypatch, backend, step):
+    storage = logged_storage(tmp_path, backend)
+    base_path = storage._transactions_path('u')
+    with monkeypatch.context() as patch:
+        if step == 'merge':
+            # Segments sealed, temp base not written yet
+            crash_when(patch, storage, '_write_base_tmp')
+        elif step == 'publish':
+            # Temp base written, manifest not updated
+            crash_when(patch, storage, '_publish_base')
+        elif step == 'rename':
+            # Manifest updated, temp base not renamed over the base
+            crash_when(patch, os, 'replace', lambda src, dst: dst == base_path)
+        else:
+            # Base published, merged segments not removed yet
+            crash_when(patch, os, 'remove', lambda path: path.endswith('.log'))
+        with pytest.raises(Crash):
+            storage.compact_transactions('u')
+    # A new process finds the files as the crash left them
+    restarted = DataStorage(str(tmp_path), backend=backend)
+    assert descriptions(restarted) == expected(20)
+    restarted.append_transaction(row(20), 'u')
+    restarted.compact_transactions('u')
+    assert descriptions(DataStorage(str(tmp_path), backend=backend)) == expected(21)
+    leftovers = [name for name in os.listdir(tmp_path) if name.endswith(('.tmp', '.log'))]
+    # Only an unpublished temp base may linger, until the next process starts
+    assert all(name.endswith('.tmp') for name in leftovers) and (step == 'publish' or not leftovers)
+
+def test_interrupted_temp_base_is_discarded_once_superseded(tmp_path, monkeypatch):
+    storage = logged_storage(tmp_path)
+    with monkeypatch.context() as patch:
+        crash_when(patch, storage, '_publish_base')
+        with pytest.raises(Crash):
+            storage.compact_transactions('u')
+    restarted = DataStorage(str(tmp_path))
+    restarted.compact_transactions('u')
+    # The next process to start recovers the superseded temp base away
+    assert descriptions(DataStorage(str(tmp_path))) == expected(20)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+def test_torn_row_from_a_crashed_append_is_skipped(tmp_path):
+    storage = logged_storage(tmp_path)
+    segment = storage._segment_path('u', storage._current_segment('u'))
+    with open(segment, 'a') as f:
+        f.write('2026-01-05,row 99,12')
+    restarted = DataStorage(str(tmp_path))
+    assert descriptions(restarted) == expected(20)
+    # New rows go to a fresh segment, never after the torn one
+    restarted.append_transaction(row(20), 'u')
+    assert descriptions(DataStorage(str(tmp_path))) == expected(21)
+
+def test_appends_during_a_compaction_in_another_process_are_kept(tmp_path):
+    writer = logged_storage(tmp_path)
+    compactor = DataStorage(str(tmp_path))
+    read_segments = compactor._read_segments
+    def read_while_appending(user_id, through_seq=None):
+        # The other process appends while the merge runs unlocked
+        frames = read_segments(user_id, through_seq)
+        writer.append_transaction(row(20), 'u')
+        return frames
+    compactor._read_segments = read_while_appending
+    compactor.compact_transactions('u')
+    del compactor._read_segments
+    writer.append_transaction(row(21), 'u')
+    for storage in (writer, compactor, DataStorage(str(tmp_path))):
+        assert descriptions(storage) == expected(22)
+
+def append_rows(data_dir, first, count):
+    storage = DataStorage(data_dir, compaction_threshold=2000)
+    for i in range(first, first + count):
+        storage.append_transaction(row(i), 'u')
+        if i % 25 == 0:
+            storage.compact_transactions('u')
+
+def test_two_processes_appending_and_compacting(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=append_rows, args=(str(tmp_path), first, 100)) for first in (0, 100)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(120)
+        assert worker.exitcode == 0
+    assert descriptions(DataStorage(str(tmp_path))) == expected(200)
+
+def test_segment_sealed_by_another_process_is_never_appended_to(tmp_path):
+    first = logged_storage(tmp_path)
+    active = first._current_segment('u')
+    second = DataStorage(str(tmp_path))
+    staging_path = second.stage_import('u')
+    second.write_staged(staging_path, pd.DataFrame([row(20)]))
+    imported = second.commit_import(staging_path, 'u')
+    sealed = open(first._segment_path('u', active), 'rb').read()
+    first.append_transaction(row(21), 'u')
+    # The import sealed the first process's segment; it moved past both
+    assert open(first._segment_path('u', active), 'rb').read() == sealed
+    assert first._current_segment('u') > imported
+    assert descriptions(DataStorage(str(tmp_path))) == expected(22)
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+from modules.financial_agent import FinancialManagementAgent
+from modules.query import TransactionQuery
+from modules.sample_data import generate_transactions
+from modules.sqlite_storage import SQLiteStorage
+
+def store_agent(tmp_path, rows=120):
+    storage = SQLiteStorage(str(tmp_path), pool_size=1)
+    storage.save_transactions(generate_transactions(rows=rows, months=3, seed=1), 'u')
+    agent = FinancialManagementAgent()
+    agent.use_store(storage, 'u')
+    return storage, agent
+
+def rows(page):
+    return list(zip(pd.to_datetime(page['Date']), page['Description'], page['Amount']))
+
+def test_store_pages_continue_after_rows_are_loaded(tmp_path):
+    _, agent = store_agent(tmp_path)
+    expected, _ = agent.query_transactions(TransactionQuery(limit=100))
+    first, cursor = agent.query_transactions(TransactionQuery(limit=50))
+    # Model training, for one, loads every row into the cached agent
+    assert len(agent.transactions) == 120
+    second, _ = agent.query_transactions(TransactionQuery(limit=50, cursor=cursor))
+    assert rows(first) + rows(second) == rows(expected)
+
+def test_cursor_from_another_source_is_rejected(tmp_path):
+    storage, agent = store_agent(tmp_path)
+    _, store_cursor = agent.query_transactions(TransactionQuery(limit=50))
+    memory = FinancialManagementAgent()
+    memory.transactions = storage.load_transactions('u')
+    _, memory_cursor = memory.query_transactions(TransactionQuery(limit=50))
+    with pytest.raises(ValueError):
+        memory.query_transactions(TransactionQuery(cursor=store_cursor))
+    with pytest.raises(ValueError):
+        agent.query_transactions(TransactionQuery(cursor=memory_cursor))
+
+def test_memory_pages_cover_every_row_once(tmp_path):
+    storage, _ = store_agent(tmp_path)
+    agent = FinancialManagementAgent()
+    agent.transactions = storage.load_transactions('u')
+    seen, cursor = [], None
+    while True:
+        page, cursor = agent.query_transactions(TransactionQuery(limit=25, sort='amount_asc', cursor=cursor))
+        seen.extend(page.index)
+        if cursor is None:
+            break
+    assert sorted(seen) == list(range(120))